@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from resilience import CircuitBreaker
+from ratelimit import AdaptiveRateLimiter
+
+# 延迟样本不足时使用的对冲等待时间（秒）
+DEFAULT_HEDGE_DELAY = 1.0
+# 计算延迟分位数至少需要的样本数
+MIN_LATENCY_SAMPLES = 10
+# 成功率的指数滑动平均系数
+SUCCESS_ALPHA = 0.2
+# 失败惩罚的恢复半衰期（秒）：分不到请求的上游也能逐渐恢复健康分
+RECOVERY_HALF_LIFE = 10.0
+# 健康分低于该值的上游只在没有其他可用上游时使用
+MIN_HEALTH = 0.3
+
+
+def build_headers(base_url: str, api_key: str = "") -> Optional[Dict[str, str]]:
+    """按上游类型构造请求头：lifuai 代理使用 Bearer，官方 API 另外带 x-api-key"""
+    if "lifuai" not in base_url and "api.semanticscholar.org" not in base_url:
+        return None
+    headers = {'Content-Type': 'application/json'}
+    if api_key:
+        headers['Authorization'] = f'Bearer {api_key}'
+        # 对于官方 semantic scholar，有时使用的是 x-api-key
+        if "semanticscholar.org" in base_url:
+            headers['x-api-key'] = api_key
+    return headers
+
+
+class Backend:
+    """
+    一个上游 API 端点：独立的请求头、熔断器与限流器，并统计最近的延迟与成功率
+    健康分 = 成功率滑动平均 / (1 + 中位延迟)，熔断打开的上游不参与选择
+    """
+
+    def __init__(self, base_url: str, api_key: str = "", name: str = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None, latency_window: int = 256):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.name = name or urlparse(self.base_url).hostname or self.base_url
+        self.headers = build_headers(self.base_url, api_key)
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.rate_limiter = rate_limiter
+        self._success_rate = 1.0
+        self._updated_at = time.monotonic()
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def url(self, endpoint: str) -> str:
+        return f"{self.base_url}/{endpoint.lstrip('/')}"
+
+    def record(self, ok: bool, latency: float = None):
+        """记录一次请求结果；只有成功请求的延迟进入分位数窗口"""
+        with self._lock:
+            rate = self._recovered_rate()
+            self._success_rate = rate + SUCCESS_ALPHA * ((1.0 if ok else 0.0) - rate)
+            if ok and latency is not None:
+                self._latencies.append(latency)
+
+    def _recovered_rate(self) -> float:
+        now = time.monotonic()
+        factor = 0.5 ** ((now - self._updated_at) / RECOVERY_HALF_LIFE)
+        self._success_rate = 1.0 - (1.0 - self._success_rate) * factor
+        self._updated_at = now
+        return self._success_rate
+
+    @property
+    def success_rate(self) -> float:
+        """成功率的滑动平均，失败惩罚随时间衰减"""
+        with self._lock:
+            return self._recovered_rate()
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """最近成功请求延迟的 q 分位数（0~1），样本不足时返回 None"""
+        with self._lock:
+            if len(self._latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_delay(self, percentile: float, floor: float = 0.0) -> float:
+        """等待多久仍未响应就向下一个上游发出对冲请求"""
+        value = self.latency_percentile(percentile)
+        return max(floor, DEFAULT_HEDGE_DELAY if value is None else value)
+
+    @property
+    def available(self) -> bool:
+        """熔断器是否可能放行请求（不占用半开状态的探测名额）"""
+        return self.circuit_breaker.ready
+
+    @property
+    def health(self) -> float:
+        median = self.latency_percentile(0.5) or 0.0
+        return self.success_rate / (1.0 + median)
+
+    def stats(self) -> Dict:
+        p50, p95 = self.latency_percentile(0.5), self.latency_percentile(0.95)
+        return {
+            'name': self.name,
+            'base_url': self.base_url,
+            'circuit_breaker': self.circuit_breaker.state,
+            'success_rate': round(self.success_rate, 3),
+            'health': round(self.health, 3),
+            'p50': round(p50, 4) if p50 is not None else None,
+            'p95': round(p95, 4) if p95 is not None else None,
+            'rate_limit': round(self.rate_limiter.rate, 3) if self.rate_limiter is not None else None,
+        }
+
+
+def rank_backends(backends: List[Backend]) -> List[Backend]:
+    """
+    按健康分从高到低排列当前可用的上游；健康分相同时保持配置顺序
+    所有可用上游都不健康时仍然返回它们，避免完全无法请求
+    """
+    candidates = [b for b in backends if b.available]
+    healthy = [b for b in candidates if b.health >= MIN_HEALTH] or candidates
+    return sorted(healthy, key=lambda b: -b.health)
+
+
+def parse_backends(spec: str, default_key: str = "") -> List[Tuple[str, str]]:
+    """
+    解析 SCHOLAR_BACKENDS："url[|key],url[|key],..."，返回 [(url, key), ...]
+    未指定 key 的条目使用 default_key
+    """
+    result = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, key = item.partition('|')
+        result.append((url.strip(), key.strip() if key else default_key))
+    return result
+
+
+class Attempt:
+    """向某个上游发出的一次请求的结果；result 为 None 表示失败"""
+    __slots__ = ('backend', 'result', 'reason', 'retry_after', 'permanent', 'retryable')
+
+    def __init__(self, backend: Backend, result: Optional[Dict] = None, reason: str = '',
+                 retry_after: Optional[float] = None, permanent: bool = False, retryable: bool = True):
+        self.backend = backend
+        self.result = result
+        self.reason = reason
+        self.retry_after = retry_after
+        # 永久错误（400/404 等）换哪个上游都不会成功
+        self.permanent = permanent
+        # 为 False 时不再退避重试（例如限流排队超出截止时间），但仍可换其他上游
+        self.retryable = retryable and not permanent
+
+    @property
+    def ok(self) -> bool:
+        return self.result is not None
+
+
+async def hedged(backends: List[Backend], send: Callable[[Backend], Awaitable[Attempt]],
+                 percentile: float = 0.9, min_delay: float = 0.0, max_hedges: int = 1,
+                 on_hedge: Callable[[Backend, str], None] = None) -> Attempt:
+    """
+    对冲请求：先向 backends[0] 发出，超过其延迟分位数仍未响应时再向下一个上游发出同样的请求，
+    最先成功的响应胜出，其余请求被取消；已发出的请求全部失败时立即换下一个上游
+    永久错误直接返回；全部失败时优先返回可重试的失败
+    """
+    waiting = list(backends[1:1 + max_hedges])
+    last = backends[0]
+    tasks = {asyncio.ensure_future(send(last)): last}
+    failures: List[Attempt] = []
+    try:
+        while tasks:
+            timeout = last.hedge_delay(percentile, min_delay) if waiting else None
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                del tasks[task]
+                attempt = task.result()
+                if attempt.ok or attempt.permanent:
+                    return attempt
+                failures.append(attempt)
+            if waiting and (not done or not tasks):
+                last = waiting.pop(0)
+                if on_hedge is not None:
+                    on_hedge(last, 'slow' if not done else 'failover')
+                tasks[asyncio.ensure_future(send(last))] = last
+        retryable = [attempt for attempt in failures if attempt.retryable]
+        return (retryable or failures)[0]
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,70 @@
+"""
+本地引用图基准：构建合成的 CSR 引用图，测量合并、相关论文查询与增量写入的耗时
+
+用法:
+    python benchmarks/graph_bench.py
+    python benchmarks/graph_bench.py --papers 1000000 --edges 20000000 --queries 100
+"""
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from citation_graph import CitationGraph  # noqa: E402
+
+
+def paper_id(i: int) -> str:
+    return hashlib.sha1(str(i).encode()).hexdigest()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地引用图基准")
+    parser.add_argument('--papers', type=int, default=100000, help="论文数")
+    parser.add_argument('--edges', type=int, default=2000000, help="引用边数（去重前）")
+    parser.add_argument('--queries', type=int, default=50, help="相关论文查询次数")
+    parser.add_argument('--adds', type=int, default=2000, help="增量写入的论文数（每篇 30 条参考文献）")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(1)
+    ids = np.array([paper_id(i) for i in range(args.papers)], dtype='S40')
+    # 被引次数服从幂律：少数论文被大量引用
+    src = rng.integers(0, args.papers, args.edges)
+    dst = np.minimum(rng.zipf(1.5, args.edges) - 1, args.papers - 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        graph = CitationGraph(directory, flush_edges=args.edges)
+        start = time.perf_counter()
+        graph.merge(ids[src], ids[dst])
+        print(f"merge: {time.perf_counter() - start:.2f}s")
+        graph = CitationGraph(directory)
+        print(graph.stats())
+
+        for method in ('cocitation', 'coupling', 'combined'):
+            timings = []
+            for i in rng.integers(0, args.papers, args.queries).tolist():
+                start = time.perf_counter()
+                graph.related(paper_id(i), k=10, method=method)
+                timings.append(time.perf_counter() - start)
+            print(f"related ({method}): median {statistics.median(timings) * 1000:.2f}ms, "
+                  f"max {max(timings) * 1000:.2f}ms")
+
+        start = time.perf_counter()
+        for i in range(args.adds):
+            references = [{'paperId': paper_id(j)} for j in rng.integers(0, args.papers, 30).tolist()]
+            graph.add_edges(paper_id(args.papers + i), references)
+        print(f"add_edges: {(time.perf_counter() - start) / args.adds * 1e6:.1f}us per paper")
+        start = time.perf_counter()
+        graph.close()
+        print(f"flush: {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
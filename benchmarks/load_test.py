@@ -0,0 +1,257 @@
+"""
+MCP 服务压测：多个并发 SSE 客户端依次压测各个工具，报告延迟分位数、吞吐量与上游调用次数
+
+默认会启动 mock_s2.py 作为上游，并以 SSE 方式启动 shcolar_server（关闭本地缓存与限流，测量真实的上游路径）；
+--backends N 会启动 N 个模拟上游并通过 SCHOLAR_BACKENDS 配置给服务，用于观察对冲请求对长尾延迟的改善；
+--workers N 通过 workers.py 启动 N 个 SSE worker（端口依次递增），客户端轮流连接各个 worker；
+也可以用 --server-url 压测已经在运行的服务（此时 --mock-url 用于读取上游调用统计，可省略）。
+
+用法:
+    python benchmarks/load_test.py --clients 20 --requests 200
+    python benchmarks/load_test.py --latency 0.1 --error-rate 0.02 --throttle-rate 0.05 --output bench_output.txt
+    python benchmarks/load_test.py --tail-rate 0.05 --tail-latency 2 --backends 2
+    python benchmarks/load_test.py --workers 4 --clients 40 --requests 2000
+    python benchmarks/load_test.py --server-url http://localhost:8000/sse --mock-url http://localhost:9100
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+from mcp.client.session import ClientSession
+from mcp.client.sse import sse_client
+
+from mock_s2 import WORDS, paper_id_of
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOLS = ('search_academic_papers', 'get_paper_details', 'get_paper_references_analysis')
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法求分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def free_port_range(count: int) -> int:
+    """找到 count 个连续的空闲端口，返回第一个"""
+    while True:
+        base = free_port()
+        try:
+            for port in range(base, base + count):
+                with socket.socket() as sock:
+                    sock.bind(('127.0.0.1', port))
+            return base
+        except OSError:
+            continue
+
+
+async def wait_for_port(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"端口 {port} 在 {timeout} 秒内没有就绪")
+
+
+def make_arguments(tool: str, distinct: int, seed: int) -> Callable[[int], Dict[str, Any]]:
+    """第 i 个请求的工具参数；参数在 distinct 个取值中循环，用来控制重复请求的比例"""
+    rng = random.Random(seed)
+    titles = [' '.join(rng.choice(WORDS) for _ in range(6)) + f' {n}' for n in range(distinct)]
+    paper_ids = [paper_id_of(rng.randint(1, 100000)) for _ in range(distinct)]
+
+    def arguments(i: int) -> Dict[str, Any]:
+        if tool == 'search_academic_papers':
+            return {'query': titles[i % distinct], 'limit': 5}
+        if tool == 'get_paper_details':
+            return {'paper_id': paper_ids[i % distinct]}
+        return {'title': titles[i % distinct]}
+
+    return arguments
+
+
+async def run_phase(server_urls: List[str], tool: str, arguments: Callable[[int], Dict[str, Any]], clients: int,
+                    requests: int) -> Dict[str, Any]:
+    """clients 个 SSE 会话（轮流连接各个服务地址）并发地共同完成 requests 次工具调用"""
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def client(server_url: str):
+        nonlocal errors, next_index
+        async with sse_client(server_url, timeout=30, sse_read_timeout=300) as (read_stream, write_stream):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                while next_index < requests:
+                    index = next_index
+                    next_index += 1
+                    start = time.perf_counter()
+                    try:
+                        result = await session.call_tool(tool, arguments=arguments(index))
+                        # mcp 1.x 为 isError，2.x 为 is_error
+                        failed = bool(getattr(result, 'is_error', getattr(result, 'isError', False)))
+                    except Exception:
+                        failed = True
+                    latencies.append(time.perf_counter() - start)
+                    errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(server_urls[i % len(server_urls)]) for i in range(clients)])
+    elapsed = time.perf_counter() - start
+    return {
+        'tool': tool,
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def format_report(results: List[Dict[str, Any]], config: Dict[str, Any]) -> str:
+    lines = [
+        "配置: " + ', '.join(f'{key}={value}' for key, value in config.items()),
+        f"{'tool':<32}{'req':>6}{'err':>6}{'rps':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}"
+        f"{'upstream':>10}{'per req':>9}",
+    ]
+    for r in results:
+        upstream = r.get('upstream') or {}
+        total = upstream.get('total')
+        per_request = f"{total / r['requests']:.2f}" if total is not None and r['requests'] else '-'
+        lines.append(
+            f"{r['tool']:<32}{r['requests']:>6}{r['errors']:>6}{r['throughput']:>9.1f}{r['p50_ms']:>10.1f}"
+            f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{total if total is not None else '-':>10}{per_request:>9}"
+        )
+        if upstream.get('calls'):
+            detail = ', '.join(f'{k}={v}' for k, v in sorted(upstream['calls'].items()))
+            injected = ', '.join(f'{k}={v}' for k, v in sorted((upstream.get('injected') or {}).items()))
+            lines.append(f"{'':<4}上游: {detail}" + (f"；注入: {injected}" if injected else ''))
+    return '\n'.join(lines)
+
+
+def merge_stats(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并多个模拟上游的调用统计"""
+    calls, injected = {}, {}
+    for item in stats:
+        for key, value in item.get('calls', {}).items():
+            calls[key] = calls.get(key, 0) + value
+        for key, value in item.get('injected', {}).items():
+            injected[key] = injected.get(key, 0) + value
+    return {'calls': calls, 'total': sum(calls.values()), 'injected': injected}
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    processes: List[subprocess.Popen] = []
+    server_urls = [args.server_url] if args.server_url else []
+    mock_urls = [args.mock_url] if args.mock_url else []
+    try:
+        if not server_urls:
+            workers = max(1, args.workers)
+            mock_ports, server_port = [free_port() for _ in range(max(1, args.backends))], free_port_range(workers)
+            mock_urls = [f'http://127.0.0.1:{port}' for port in mock_ports]
+            for i, port in enumerate(mock_ports):
+                processes.append(subprocess.Popen([
+                    sys.executable, os.path.join(ROOT, 'benchmarks', 'mock_s2.py'), '--port', str(port),
+                    '--latency', str(args.latency), '--jitter', str(args.jitter), '--error-rate', str(args.error_rate),
+                    '--throttle-rate', str(args.throttle_rate), '--tail-rate', str(args.tail_rate),
+                    '--tail-latency', str(args.tail_latency), '--seed', str(args.seed + i),
+                ]))
+            env = dict(os.environ, SCHOLAR_BASE_URL=mock_urls[0], SCHOLAR_API_KEY='',
+                       SCHOLAR_BACKENDS=','.join(mock_urls) if len(mock_urls) > 1 else '',
+                       SCHOLAR_RATE_LIMIT=str(args.rate_limit), FASTMCP_SHOW_SERVER_BANNER='false')
+            if not args.cache:
+                env.update(SCHOLAR_CACHE_PATH='', SCHOLAR_TITLE_INDEX='')
+            command = [sys.executable, '-c',
+                       "import shcolar_server as s; "
+                       f"s.mcp.run(transport='sse', host='127.0.0.1', port={server_port}, show_banner=False)"]
+            if workers > 1:
+                command = [sys.executable, os.path.join(ROOT, 'workers.py'), '--workers', str(workers),
+                           '--transport', 'sse', '--host', '127.0.0.1', '--port', str(server_port)]
+            processes.append(subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL if args.quiet else None,
+                stderr=subprocess.DEVNULL if args.quiet else None))
+            for port in mock_ports:
+                await wait_for_port(port)
+            for port in range(server_port, server_port + workers):
+                await wait_for_port(port)
+            server_urls = [f'http://127.0.0.1:{port}/sse' for port in range(server_port, server_port + workers)]
+
+        results = []
+        async with httpx.AsyncClient(timeout=10) as http:
+            for tool in args.tools:
+                for mock_url in mock_urls:
+                    await http.post(f'{mock_url}/_reset')
+                result = await run_phase(server_urls, tool, make_arguments(tool, args.distinct, args.seed),
+                                         args.clients, args.requests)
+                if mock_urls:
+                    result['upstream'] = merge_stats([(await http.get(f'{url}/_stats')).json() for url in mock_urls])
+                results.append(result)
+                print(f"{tool}: {result['requests']} 次调用完成，用时 {result['elapsed']:.1f}s", file=sys.stderr)
+        return results
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scholar MCP 服务压测")
+    parser.add_argument('--server-url', default='', help="已运行服务的 SSE 地址，默认自动启动服务与模拟上游")
+    parser.add_argument('--mock-url', default='', help="模拟上游地址，用于读取调用统计")
+    parser.add_argument('--tools', nargs='+', default=list(TOOLS), choices=TOOLS, help="要压测的工具")
+    parser.add_argument('--clients', type=int, default=10, help="并发 SSE 客户端数")
+    parser.add_argument('--requests', type=int, default=100, help="每个工具的调用次数")
+    parser.add_argument('--distinct', type=int, default=50, help="不同参数的个数（越小重复请求越多）")
+    parser.add_argument('--latency', type=float, default=0.05, help="模拟上游的基础延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.02, help="模拟上游的延迟抖动（秒）")
+    parser.add_argument('--tail-rate', type=float, default=0.0, help="模拟上游出现慢响应的概率")
+    parser.add_argument('--tail-latency', type=float, default=1.0, help="慢响应额外增加的延迟（秒）")
+    parser.add_argument('--workers', type=int, default=1, help="服务端 worker 进程数（通过 workers.py 启动）")
+    parser.add_argument('--backends', type=int, default=1, help="模拟上游的个数（大于 1 时启用对冲请求）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="模拟上游返回 500 的概率")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="模拟上游返回 429 的概率")
+    parser.add_argument('--rate-limit', type=float, default=0, help="服务端限流（每秒请求数，0 为关闭）")
+    parser.add_argument('--cache', action='store_true', help="启用服务端本地缓存与标题索引")
+    parser.add_argument('--seed', type=int, default=1, help="随机种子")
+    parser.add_argument('--output', default='', help="把报告同时写入文件")
+    parser.add_argument('--json', action='store_true', help="输出 JSON 而不是表格")
+    parser.add_argument('--quiet', action='store_true', help="不显示服务端日志")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    config = {key: getattr(args, key) for key in ('clients', 'requests', 'distinct', 'latency', 'jitter',
+                                                  'tail_rate', 'tail_latency', 'backends', 'workers', 'error_rate',
+                                                  'throttle_rate', 'rate_limit', 'cache')}
+    report = json.dumps({'config': config, 'results': results}, ensure_ascii=False, indent=2) if args.json \
+        else format_report(results, config)
+    print(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    return 1 if any(r['errors'] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+热点函数的微基准：bibtex_to_gbt7714（冷启动与命中缓存）、markdown_postprocess 与 process_markdown
+
+用法:
+    python benchmarks/micro.py
+    python benchmarks/micro.py --number 2000 --repeat 7
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils  # noqa: E402
+
+WORDS = 'deep learning attention transformer graph neural network pose estimation human vision'.split()
+
+
+def make_bibtex(n: int, seed: int = 1):
+    rng = random.Random(seed)
+    entries = []
+    for i in range(n):
+        authors = ' and '.join(f'Surname{rng.randint(1, 999)}, Given{i} M.' for _ in range(rng.randint(1, 6)))
+        title = ' '.join(rng.choice(WORDS) for _ in range(8)).capitalize()
+        if i % 2:
+            entries.append(f"@article{{key{i},\n  author = {{{authors}}},\n  title = {{{{{title}}}}},\n"
+                           f"  journal = {{Journal of {rng.choice(WORDS).capitalize()}}},\n  volume = {{{i % 40}}},\n"
+                           f"  number = {{{i % 12}}},\n  pages = {{{i}--{i + 12}}},\n  year = {{{2000 + i % 24}}}\n}}")
+        else:
+            entries.append(f"@inproceedings{{key{i},\n  author = {{{authors}}},\n  title = \"{title}\",\n"
+                           f"  booktitle = {{Proceedings of {rng.choice(WORDS).capitalize()}}},\n"
+                           f"  pages = {{{i}--{i + 8}}},\n  year = {2000 + i % 24},\n  month = jan\n}}")
+    return entries
+
+
+def make_markdown(paragraphs: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(paragraphs):
+        text = ' '.join(rng.choice(WORDS) for _ in range(60))
+        blocks.append(f"## Section {i}\n\n{text} with inline \\(x_{i}^2 + y\\) and \\(\\alpha_{{{i}}}\\).\n\n"
+                      f"\\[\n\\sum_{{k=1}}^{{{i + 2}}} k = \\frac{{n(n+1)}}{{2}}\n\\]\n\n"
+                      f"| a | b |\n|---|---|\n| {i} | {i * 2} |\n\n"
+                      f"\\begin{{equation}}\nE = mc^{i}\n\\end{{equation}}\n")
+    return '\n'.join(blocks)
+
+
+def bench(name: str, func, number: int, repeat: int):
+    timings = [t / number for t in timeit.repeat(func, number=number, repeat=repeat)]
+    best, median = min(timings), statistics.median(timings)
+    print(f"{name:<40}{best * 1e6:>12.1f}{median * 1e6:>12.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="utils 热点函数微基准")
+    parser.add_argument('--number', type=int, default=1000, help="每轮调用次数")
+    parser.add_argument('--repeat', type=int, default=5, help="轮数")
+    args = parser.parse_args(argv)
+
+    entries = make_bibtex(args.number)
+    markdown = make_markdown(50)
+    print(f"{'benchmark':<40}{'best(us)':>12}{'median(us)':>12}")
+
+    state = {'i': 0}
+
+    def cold():
+        # 每次换一个条目并清空缓存，测量解析与格式化本身
+        utils._GBT7714_CACHE.clear()
+        utils.bibtex_to_gbt7714(entries[state['i'] % len(entries)])
+        state['i'] += 1
+
+    bench('bibtex_to_gbt7714 (cold)', cold, args.number, args.repeat)
+    utils.bibtex_to_gbt7714(entries[0])
+    bench('bibtex_to_gbt7714 (cached)', lambda: utils.bibtex_to_gbt7714(entries[0]), args.number, args.repeat)
+    bench('parse_bibtex', lambda: utils.parse_bibtex(entries[1]), args.number, args.repeat)
+    small = max(1, args.number // 50)
+    bench(f'markdown_postprocess ({len(markdown)} chars)', lambda: utils.markdown_postprocess(markdown),
+          small, args.repeat)
+    bench(f'process_markdown ({len(markdown)} chars)', lambda: utils.process_markdown(markdown), small, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
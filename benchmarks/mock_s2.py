@@ -0,0 +1,248 @@
+"""
+本地模拟的 Semantic Scholar Graph API，用于压测与回归测试
+
+实现 search、paper/{id}、paper/{id}/references、paper/{id}/citations 与 paper/batch 接口，
+数据由 ID 确定性生成；可配置延迟、长尾延迟、错误率与 429 注入，并按接口统计调用次数。
+
+用法:
+    python benchmarks/mock_s2.py --port 9100 --latency 0.05 --jitter 0.02 --error-rate 0.01 --throttle-rate 0.02
+    python benchmarks/mock_s2.py --port 9101 --tail-rate 0.05 --tail-latency 2
+
+统计接口:
+    GET  /_stats   返回各接口的调用次数、注入的错误数与 429 数
+    POST /_reset   清零统计
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+WORDS = ('deep learning attention transformer graph neural network pose estimation human vision language model '
+         'retrieval self supervised contrastive diffusion generative robust efficient sparse benchmark').split()
+DEFAULT_FIELDS = 'title'
+
+
+def paper_id_of(corpus_id: int) -> str:
+    return hashlib.sha1(str(corpus_id).encode('ascii')).hexdigest()
+
+
+class MockData:
+    """确定性的论文数据：corpusId 为 1..size，paperId 为其 sha1"""
+
+    def __init__(self, size: int = 100000, references: int = 40):
+        self.size = size
+        self.references = references
+        self._by_paper_id: Dict[str, int] = {}
+
+    def corpus_id(self, paper_id: str) -> Optional[int]:
+        prefix, _, value = paper_id.partition(':')
+        if value:
+            if prefix.upper() == 'CORPUSID' and value.isdigit():
+                return int(value) if 0 < int(value) <= self.size else None
+            if prefix.upper() == 'DOI':
+                match = re.fullmatch(r'10\.5555/mock\.(\d+)', value, re.IGNORECASE)
+                return int(match.group(1)) if match and 0 < int(match.group(1)) <= self.size else None
+            return None
+        if not self._by_paper_id:
+            self._by_paper_id = {paper_id_of(i): i for i in range(1, self.size + 1)}
+        return self._by_paper_id.get(paper_id)
+
+    def paper(self, corpus_id: int) -> Dict:
+        rng = random.Random(corpus_id)
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 10))).capitalize()
+        authors = [{'authorId': str(rng.randint(1, 10 ** 6)), 'name': f'Author{rng.randint(1, 5000)} Surname'}
+                   for _ in range(rng.randint(1, 6))]
+        year = 1990 + corpus_id % 35
+        venue = rng.choice(['NeurIPS', 'CVPR', 'ICML', 'Journal of Machine Learning Research'])
+        surname = authors[0]['name'].split()[-1]
+        bibtex = (f"@Article{{{surname}{year}{title.split()[0]},\n author = {{{' and '.join(a['name'] for a in authors)}}},\n"
+                  f" journal = {{{venue}}},\n title = {{{title}}},\n volume = {{{rng.randint(1, 40)}}},\n"
+                  f" pages = {{{rng.randint(1, 500)}-{rng.randint(501, 900)}}},\n year = {{{year}}}\n}}\n")
+        return {
+            'paperId': paper_id_of(corpus_id),
+            'corpusId': corpus_id,
+            'externalIds': {'DOI': f'10.5555/mock.{corpus_id}', 'CorpusId': corpus_id},
+            'title': title,
+            'authors': authors,
+            'year': year,
+            'venue': venue,
+            'journal': {'name': venue, 'volume': str(rng.randint(1, 40))},
+            'publicationVenue': {'name': venue},
+            'abstract': ' '.join(rng.choice(WORDS) for _ in range(120)),
+            'citationCount': rng.randint(0, 5000),
+            'referenceCount': self.references,
+            'openAccessPdf': None,
+            'citationStyles': {'bibtex': bibtex},
+        }
+
+    def reference_ids(self, corpus_id: int) -> List[int]:
+        rng = random.Random(-corpus_id)
+        return [rng.randint(1, self.size) for _ in range(self.references)]
+
+    def citation_ids(self, corpus_id: int) -> List[int]:
+        rng = random.Random(corpus_id * 31)
+        return [rng.randint(1, self.size) for _ in range(self.references)]
+
+    def project(self, corpus_id: int, fields: str) -> Dict:
+        """按 fields 输出论文；references.xxx / citations.xxx 输出嵌套的引用列表"""
+        paper = self.paper(corpus_id)
+        result = {'paperId': paper['paperId']}
+        nested: Dict[str, List[str]] = {}
+        for field in fields.split(','):
+            key, _, sub = field.strip().partition('.')
+            if key in ('references', 'citations'):
+                nested.setdefault(key, []).append(sub or 'title')
+            elif key in paper:
+                result[key] = paper[key]
+        for key, sub_fields in nested.items():
+            ids = self.reference_ids(corpus_id) if key == 'references' else self.citation_ids(corpus_id)
+            result[key] = [self.project(i, ','.join(sub_fields)) for i in ids]
+        return result
+
+    def search(self, query: str, offset: int, limit: int) -> List[int]:
+        seed = int.from_bytes(hashlib.blake2b(query.encode('utf-8'), digest_size=8).digest(), 'big')
+        rng = random.Random(seed)
+        return [rng.randint(1, self.size) for _ in range(offset + limit)][offset:]
+
+
+def create_app(latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, throttle_rate: float = 0.0,
+               retry_after: int = 1, size: int = 100000, references: int = 40, seed: int = None,
+               tail_rate: float = 0.0, tail_latency: float = 0.0) -> Starlette:
+    data = MockData(size=size, references=references)
+    rng = random.Random(seed)
+    calls: Counter = Counter()
+    injected: Counter = Counter()
+
+    async def simulate(kind: str) -> Optional[JSONResponse]:
+        """记录调用、模拟延迟，按概率注入 429 或 500"""
+        calls[kind] += 1
+        delay = latency + (rng.uniform(-jitter, jitter) if jitter else 0)
+        if tail_rate and rng.random() < tail_rate:
+            # 偶发的慢响应，模拟上游的长尾延迟
+            injected['slow'] += 1
+            delay += tail_latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+        roll = rng.random()
+        if roll < throttle_rate:
+            injected['429'] += 1
+            return JSONResponse({'message': 'Too Many Requests'}, status_code=429,
+                                headers={'Retry-After': str(retry_after)})
+        if roll < throttle_rate + error_rate:
+            injected['500'] += 1
+            return JSONResponse({'message': 'Internal Server Error'}, status_code=500)
+        return None
+
+    def params(request: Request):
+        fields = request.query_params.get('fields') or DEFAULT_FIELDS
+        offset = int(request.query_params.get('offset', 0))
+        limit = int(request.query_params.get('limit', 100))
+        return fields, offset, limit
+
+    async def search(request: Request):
+        failure = await simulate('search')
+        if failure:
+            return failure
+        fields, offset, limit = params(request)
+        ids = data.search(request.query_params.get('query', ''), offset, min(limit, 100))
+        return JSONResponse({'total': 1000, 'offset': offset, 'next': offset + len(ids),
+                             'data': [data.project(i, fields) for i in ids]})
+
+    async def batch(request: Request):
+        failure = await simulate('batch')
+        if failure:
+            return failure
+        fields, _, _ = params(request)
+        ids = json.loads(await request.body()).get('ids', [])
+        if len(ids) > 500:
+            return JSONResponse({'error': 'Cannot process more than 500 paper ids at a time.'}, status_code=400)
+        result = []
+        for paper_id in ids:
+            corpus_id = data.corpus_id(paper_id)
+            result.append(data.project(corpus_id, fields) if corpus_id else None)
+        return JSONResponse(result)
+
+    async def paper(request: Request, paper_id: str = None):
+        failure = await simulate('paper')
+        if failure:
+            return failure
+        corpus_id = data.corpus_id(paper_id or request.path_params['paper_id'])
+        if corpus_id is None:
+            return JSONResponse({'error': 'Paper not found'}, status_code=404)
+        return JSONResponse(data.project(corpus_id, params(request)[0]))
+
+    async def edges(request: Request):
+        kind = request.path_params['kind']
+        if kind not in ('references', 'citations'):
+            # 含 / 的 ID（如 DOI:10.5555/mock.1）
+            return await paper(request, f"{request.path_params['paper_id']}/{kind}")
+        failure = await simulate(kind)
+        if failure:
+            return failure
+        corpus_id = data.corpus_id(request.path_params['paper_id'])
+        if corpus_id is None:
+            return JSONResponse({'error': 'Paper not found'}, status_code=404)
+        fields, offset, limit = params(request)
+        ids = data.reference_ids(corpus_id) if kind == 'references' else data.citation_ids(corpus_id)
+        page = ids[offset:offset + min(limit, 1000)]
+        key = 'citedPaper' if kind == 'references' else 'citingPaper'
+        paper_fields = ','.join(f for f in fields.split(',') if f not in ('contexts', 'intents', 'isInfluential'))
+        body = {'offset': offset, 'data': [{key: data.project(i, paper_fields or DEFAULT_FIELDS), 'contexts': []}
+                                           for i in page]}
+        if offset + len(page) < len(ids):
+            body['next'] = offset + len(page)
+        return JSONResponse(body)
+
+    async def stats(request: Request):
+        return JSONResponse({'calls': dict(calls), 'total': sum(calls.values()), 'injected': dict(injected)})
+
+    async def reset(request: Request):
+        calls.clear()
+        injected.clear()
+        return JSONResponse({'ok': True})
+
+    return Starlette(routes=[
+        Route('/graph/v1/paper/search', search),
+        Route('/graph/v1/paper/batch', batch, methods=['POST']),
+        Route('/graph/v1/paper/{paper_id:path}/{kind}', edges),
+        Route('/graph/v1/paper/{paper_id:path}', paper),
+        Route('/_stats', stats),
+        Route('/_reset', reset, methods=['POST']),
+    ])
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="模拟的 Semantic Scholar Graph API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency', type=float, default=0.05, help="每个请求的基础延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.0, help="延迟的随机抖动幅度（秒）")
+    parser.add_argument('--tail-rate', type=float, default=0.0, help="出现慢响应的概率")
+    parser.add_argument('--tail-latency', type=float, default=1.0, help="慢响应额外增加的延迟（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回 500 的概率")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="返回 429 的概率")
+    parser.add_argument('--retry-after', type=int, default=1, help="429 响应的 Retry-After（秒）")
+    parser.add_argument('--size', type=int, default=100000, help="论文总数")
+    parser.add_argument('--references', type=int, default=40, help="每篇论文的参考文献数")
+    parser.add_argument('--seed', type=int, default=None, help="错误注入的随机种子")
+    args = parser.parse_args(argv)
+    app = create_app(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                     throttle_rate=args.throttle_rate, retry_after=args.retry_after, size=args.size,
+                     references=args.references, seed=args.seed, tail_rate=args.tail_rate,
+                     tail_latency=args.tail_latency)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+批量将 BibTeX 条目转换为 GB/T 7714 格式
+
+逐行读取 .bib 文件并切分条目，按块分发到进程池解析与格式化，结果按输入顺序流式写出，
+内存占用与输入大小无关。
+
+用法:
+    python bulk_convert.py refs.bib -o refs.txt --workers 4
+    python bulk_convert.py refs.bib --format jsonl > refs.jsonl
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from utils import BibtexSyntaxError, convert_bibtex_entry, parse_bibtex_entry, BIBTEX_ENTRY_HEAD
+
+# 不产生文献条目的特殊类型
+_SKIPPED_TYPES = {'comment', 'preamble'}
+# 条目定界符对应的括号匹配正则
+_DELIMITERS = {'{': re.compile(r'[{}]'), '(': re.compile(r'[()]')}
+
+
+def iter_bibtex_entries(lines: Iterable[str]) -> Iterator[str]:
+    """
+    从逐行输入中切分出完整的 BibTeX 条目（按 @type{ ... } 的括号深度），不一次性读入整个文件
+    条目之间的文本视为注释忽略
+    """
+    buf: List[str] = []
+    opener = None  # 条目使用的定界符：'{' 或 '('
+    depth = 0
+    for line in lines:
+        pos = 0
+        while pos < len(line):
+            if opener is None:
+                at = line.find('@', pos)
+                if at < 0:
+                    break
+                head = BIBTEX_ENTRY_HEAD.match(line, at)
+                if not head:
+                    pos = at + 1
+                    continue
+                opener = head.group(2)
+                depth = 1
+                buf.append(line[at:head.end()])
+                pos = head.end()
+                continue
+            end = None
+            for match in _DELIMITERS[opener].finditer(line, pos):
+                if match.group() == opener:
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        end = match.end()
+                        break
+            if end is None:
+                buf.append(line[pos:])
+                break
+            buf.append(line[pos:end])
+            yield ''.join(buf)
+            buf = []
+            opener = None
+            pos = end
+    if buf:
+        # 文件在条目中途结束，交给解析器报告错误
+        yield ''.join(buf)
+
+
+def _entry_key(entry: str) -> str:
+    head = BIBTEX_ENTRY_HEAD.search(entry)
+    if not head:
+        return ''
+    return entry[head.end():].split(',', 1)[0].strip()
+
+
+def _convert_chunk(start: int, entries: List[str], macros: Dict[str, str]) -> List[Dict]:
+    """在工作进程中转换一块条目，每个条目单独报告错误"""
+    results = []
+    for offset, entry in enumerate(entries):
+        result = {'index': start + offset, 'key': _entry_key(entry), 'gbt7714': None, 'error': None}
+        try:
+            result['gbt7714'] = convert_bibtex_entry(entry, macros)
+        except BibtexSyntaxError as e:
+            result['error'] = f"格式错误: {e}"
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+        results.append(result)
+    return results
+
+
+def _iter_chunks(entries: Iterable[str], chunk_size: int) -> Iterator[tuple]:
+    """把条目切成块，同时收集 @string 宏并随块下发"""
+    macros: Dict[str, str] = {}
+    chunk: List[str] = []
+    start = 0
+    for entry in entries:
+        head = BIBTEX_ENTRY_HEAD.search(entry)
+        entry_type = head.group(1).lower() if head else ''
+        if entry_type in _SKIPPED_TYPES:
+            continue
+        if entry_type == 'string':
+            try:
+                macros.update({k.lower(): v for k, v in parse_bibtex_entry(entry, macros)[2].items()})
+            except BibtexSyntaxError:
+                pass
+            continue
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            yield start, chunk, dict(macros)
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield start, chunk, dict(macros)
+
+
+_shared_pool: Optional[ProcessPoolExecutor] = None
+_shared_pool_lock = threading.Lock()
+
+
+def shared_pool() -> ProcessPoolExecutor:
+    """
+    长期运行的服务进程共用的进程池：首次使用时创建，工作进程按需启动（最多 CPU 核数个）
+    使用 spawn 方式启动，不从带有事件循环与线程的服务进程 fork
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                               mp_context=multiprocessing.get_context('spawn'))
+        return _shared_pool
+
+
+def convert_entries(entries: Iterable[str], workers: int = None, chunk_size: int = 256,
+                    pool: Optional[ProcessPoolExecutor] = None) -> Iterator[Dict]:
+    """
+    批量转换条目，按输入顺序逐条产出结果:
+        {'index': 序号, 'key': 引用键, 'gbt7714': 结果或 None, 'error': 错误信息或 None}
+    workers <= 1 或输入只有一块时在当前进程中转换；否则使用进程池，同时在途的块数有上限，保证内存占用平稳
+    pool 为已有的进程池（如 shared_pool()）时在其中执行，最多同时占用 workers 个工作进程；
+    未指定时临时创建 workers 个进程的进程池
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = _iter_chunks(entries, chunk_size)
+    first = next(chunks, None)
+    second = next(chunks, None) if first is not None else None
+    if workers <= 1 or second is None:
+        for start, chunk, macros in filter(None, (first, second)):
+            yield from _convert_chunk(start, chunk, macros)
+        for start, chunk, macros in chunks:
+            yield from _convert_chunk(start, chunk, macros)
+        return
+
+    def run(executor: ProcessPoolExecutor, max_pending: int) -> Iterator[Dict]:
+        pending = deque()
+        for start, chunk, macros in itertools.chain((first, second), chunks):
+            pending.append(executor.submit(_convert_chunk, start, chunk, macros))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+    if pool is not None:
+        yield from run(pool, workers)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from run(executor, workers * 2)
+
+
+def convert_file(input_file: TextIO, output_file: TextIO, workers: int = None, chunk_size: int = 256,
+                 output_format: str = 'text', error_file: Optional[TextIO] = None,
+                 pool: Optional[ProcessPoolExecutor] = None) -> Dict[str, int]:
+    """
+    流式转换文件并写出结果，返回统计信息
+    text 格式每个条目输出一行（出错的条目输出空行并把错误写到 error_file）；jsonl 格式输出完整结果
+    """
+    stats = {'total': 0, 'errors': 0}
+    for result in convert_entries(iter_bibtex_entries(input_file), workers=workers, chunk_size=chunk_size,
+                                  pool=pool):
+        stats['total'] += 1
+        if result['error']:
+            stats['errors'] += 1
+            if error_file is not None:
+                error_file.write(f"[{result['index']}] {result['key']}: {result['error']}\n")
+        if output_format == 'jsonl':
+            output_file.write(json.dumps(result, ensure_ascii=False) + '\n')
+        else:
+            output_file.write((result['gbt7714'] or '') + '\n')
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量将 BibTeX 文件转换为 GB/T 7714 格式")
+    parser.add_argument('input', help="输入的 .bib 文件，'-' 表示标准输入")
+    parser.add_argument('-o', '--output', default='-', help="输出文件，默认标准输出")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="工作进程数，默认 CPU 核数")
+    parser.add_argument('--chunk-size', type=int, default=256, help="每个任务块包含的条目数")
+    parser.add_argument('--format', choices=['text', 'jsonl'], default='text', help="输出格式")
+    args = parser.parse_args(argv)
+
+    input_file = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        stats = convert_file(input_file, output_file, workers=args.workers, chunk_size=args.chunk_size,
+                             output_format=args.format, error_file=sys.stderr)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    print(f"共转换 {stats['total']} 条，失败 {stats['errors']} 条", file=sys.stderr)
+    return 1 if stats['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "scholar-mcp")
+
+# 各类接口的默认缓存有效期（秒），论文元数据变化很慢，搜索结果变化相对较快
+DEFAULT_TTLS = {
+    'search': 6 * 3600,
+    'paper': 7 * 24 * 3600,
+    'batch': 7 * 24 * 3600,
+    'references': 3 * 24 * 3600,
+    'citations': 24 * 3600,
+}
+
+# 每写入多少次按数据库重新统计一次缓存总大小
+SIZE_RESYNC_WRITES = 256
+# 淘汰时每批读取的条目数
+EVICT_BATCH = 256
+
+
+def endpoint_kind(endpoint: str) -> str:
+    """根据接口路径判断接口类型，用于选择 TTL"""
+    path = endpoint.strip('/')
+    if path.endswith('/search'):
+        return 'search'
+    if path.endswith('/batch'):
+        return 'batch'
+    if path.endswith('/references'):
+        return 'references'
+    if path.endswith('/citations'):
+        return 'citations'
+    return 'paper'
+
+
+def make_cache_key(method: str, endpoint: str, params: Dict = None, data: Dict = None) -> str:
+    """
+    生成缓存键：接口 + 规范化后的参数
+    fields 按字段名排序，其余参数按键排序，保证等价请求得到相同的键
+    """
+    normalized = {}
+    for key, value in (params or {}).items():
+        if value is None:
+            continue
+        if key == 'fields':
+            value = ','.join(sorted(f.strip() for f in str(value).split(',') if f.strip()))
+        normalized[key] = str(value)
+    raw = json.dumps(
+        [method.upper(), endpoint.strip('/'), normalized, data],
+        sort_keys=True, ensure_ascii=False, separators=(',', ':'),
+    )
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    基于 SQLite (WAL 模式) 的持久化响应缓存
+    - 按接口类型设置 TTL；过期后 stale_grace 秒内的条目仍可作为旧数据返回（由调用方在后台刷新）
+    - 记录每个条目的访问次数，供后台刷新排优先级
+    - 总大小超过上限时按最近访问时间淘汰
+    - 方法均为同步的 SQLite 操作（可能等待其他进程的写锁），在事件循环中应通过 asyncio.to_thread 调用
+    """
+
+    def __init__(self, path: str, ttls: Dict[str, int] = None, max_bytes: int = 256 * 1024 * 1024,
+                 stale_grace: int = 0):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_bytes = max_bytes
+        self.stale_grace = stale_grace
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(responses)')}
+        if 'hits' not in columns:
+            self._conn.execute('ALTER TABLE responses ADD COLUMN hits INTEGER NOT NULL DEFAULT 0')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)')
+        # 回源租约：多个进程共享缓存时，同一个键同一时间只由一个进程请求上游
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        self._owner = f'{os.getpid()}:{id(self)}'
+        self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        self._writes = 0
+
+    def ttl_for(self, endpoint: str) -> int:
+        return self.ttls.get(endpoint_kind(endpoint), self.ttls['paper'])
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取未过期的缓存项，未命中返回 None"""
+        return self.lookup(key)[0]
+
+    def lookup(self, key: str, allow_stale: bool = False) -> Tuple[Optional[Any], bool, int]:
+        """
+        读取缓存项，返回 (value, 是否已过期, 累计访问次数)
+        allow_stale=True 时过期但仍在宽限期内的条目也会返回；未命中时 value 为 None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at, hits FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None, False, 0
+            value, expires_at, hits = row
+            stale = expires_at <= now
+            if stale and (not allow_stale or expires_at + self.stale_grace <= now):
+                return None, stale, hits
+            self._conn.execute('UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?', (now, key))
+        return json.loads(value), stale, hits + 1
+
+    def set(self, key: str, endpoint: str, value: Any, ttl: int = None):
+        """写入缓存项，必要时触发淘汰"""
+        if ttl is None:
+            ttl = self.ttl_for(endpoint)
+        payload = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        size = len(payload.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT INTO responses (key, endpoint, value, size, created_at, expires_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value, '
+                'size = excluded.size, created_at = excluded.created_at, expires_at = excluded.expires_at, '
+                'last_access = excluded.last_access',
+                (key, endpoint.strip('/'), payload, size, now, now + ttl, now),
+            )
+            self._size += size - (old[0] if old else 0)
+            self._writes += 1
+            if self._writes % SIZE_RESYNC_WRITES == 0:
+                # 其他进程也在写同一个缓存文件，定期按数据库重新统计总大小
+                self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """先删除超出宽限期的过期项，再按最近访问时间淘汰，直到总大小降到上限的 90%"""
+        self._conn.execute('DELETE FROM responses WHERE expires_at <= ?', (time.time() - self.stale_grace,))
+        self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if self._size <= target:
+            return
+        removed = 0
+        evicted = 0
+        # 沿 last_access 索引分批取最久未访问的条目，只读取需要删除的行
+        while self._size > target:
+            rows = self._conn.execute('SELECT key, size FROM responses ORDER BY last_access LIMIT ?',
+                                      (EVICT_BATCH,)).fetchall()
+            if not rows:
+                break
+            stale_keys = []
+            for key, size in rows:
+                if self._size <= target:
+                    break
+                stale_keys.append((key,))
+                self._size -= size
+                removed += size
+            self._conn.executemany('DELETE FROM responses WHERE key = ?', stale_keys)
+            evicted += len(stale_keys)
+        logger.info(f"缓存淘汰 {evicted} 项，释放 {removed} 字节")
+
+    def claim(self, key: str, ttl: float = 60) -> bool:
+        """取得 key 的回源租约；其他进程持有未过期的租约时返回 False（过期视为持有者已退出）"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                '''INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?)
+                   ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                   WHERE leases.expires_at <= ?''', (key, self._owner, now + ttl, now))
+            return cursor.rowcount > 0
+
+    def release(self, key: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, self._owner))
+
+    def _leased(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute('SELECT expires_at FROM leases WHERE key = ?', (key,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def _poll(self, key: str) -> Tuple[Optional[Any], bool]:
+        """返回 (缓存值, 租约是否仍被持有)；租约已释放时再读一次，避免错过对方刚写入的结果"""
+        value = self.get(key)
+        if value is not None:
+            return value, False
+        if not self._leased(key):
+            return self.get(key), False
+        return None, True
+
+    async def wait_for(self, key: str, timeout: float = None) -> Optional[Any]:
+        """
+        等待持有租约的进程把结果写入缓存；租约释放或过期仍没有结果（对方请求失败）、
+        或超过 timeout 时返回 None，由调用方自行回源
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interval = 0.02
+        while True:
+            value, leased = await asyncio.to_thread(self._poll, key)
+            if not leased:
+                return value
+            if deadline is not None and time.monotonic() + interval > deadline:
+                return None
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, 0.25)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return {'path': self.path, 'entries': count, 'bytes': self._size, 'max_bytes': self.max_bytes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,746 @@
+"""
+本地持久化的引用图：paperId 映射为连续整数，references / citations 以 CSR 邻接数组保存，查询时内存映射
+
+磁盘布局（目录）:
+- graph.json: 当前版本号与规模
+- gen-NNNNNN/: 一个版本的数组（.npy，np.load(mmap_mode='r') 映射）
+    ids / sorted_ids / order: 整数 ID -> paperId，以及按 paperId 排序的索引（二分查找）
+    ref_indptr / ref_indices: 参考文献 CSR（每行升序）；cit_indptr / cit_indices: 施引文献 CSR（转置）
+    years / citation_counts / title_start / title_len: 论文元数据
+    complete / ref_checked / cit_checked: 各方向引用关系是否已获取及获取时间（超过 EDGE_TTL 后重新获取）
+- titles.bin: 只追加的标题字节
+
+新边先进入内存增量，超过 flush_edges 条时合并成新版本（在后台线程中进行，期间查询同时读取旧版本与增量）；
+合并时持有文件锁并以磁盘上的最新版本为基础，多个 worker 进程可以共用一个目录。
+
+用法:
+    python citation_graph.py stats ~/.cache/scholar-mcp/graph
+    python citation_graph.py related ~/.cache/scholar-mcp/graph 204e3073870fae3d05bcbc2f6a8e263d9b72e776
+    python citation_graph.py import ~/.cache/scholar-mcp/graph offline.sqlite3
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
+
+# 文件锁仅在 POSIX 上可用，其他平台只支持单进程写入
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# paperId 为 40 位十六进制字符串
+ID_DTYPE = 'S40'
+# 内存增量超过该边数时合并到磁盘
+FLUSH_EDGES = 200000
+# 导入离线索引时每批读取的边数
+IMPORT_BATCH = 1000000
+MANIFEST = 'graph.json'
+TITLES = 'titles.bin'
+ARRAYS = ('ids', 'sorted_ids', 'order', 'ref_indptr', 'ref_indices', 'cit_indptr', 'cit_indices',
+          'years', 'citation_counts', 'title_start', 'title_len', 'complete', 'ref_checked', 'cit_checked')
+METHODS = ('cocitation', 'coupling', 'combined')
+KINDS = ('references', 'citations')
+# 已完整获取某个方向全部引用关系的标记位
+COMPLETE_FLAGS = {'references': 1, 'citations': 2}
+# 某个方向已由 batch 的嵌套列表获取过、但可能不完整（嵌套列表有长度上限）的标记位
+PARTIAL_FLAGS = {'references': 4, 'citations': 8}
+# 标记的有效期（秒）：参考文献几乎不变，施引文献持续增加
+EDGE_TTL = {'references': 90 * 24 * 3600, 'citations': 7 * 24 * 3600}
+
+
+class PaperRecord:
+    """引用图中一篇论文的元数据"""
+    __slots__ = ('paper_id', 'title', 'year', 'citation_count', 'complete', 'checked')
+
+    def __init__(self, paper_id: str, title: str = '', year: int = 0, citation_count: int = -1, complete: int = 0,
+                 checked: Tuple[int, int] = (0, 0)):
+        self.paper_id = paper_id
+        self.title = title
+        self.year = year
+        self.citation_count = citation_count
+        # COMPLETE_FLAGS / PARTIAL_FLAGS 的组合：哪些方向的引用关系已经写入
+        self.complete = complete
+        # (参考文献, 施引文献) 最近一次获取的时间（Unix 秒），0 表示从未获取
+        self.checked = checked
+
+    def merge(self, other: 'PaperRecord'):
+        self.title = other.title or self.title
+        self.year = other.year or self.year
+        if other.citation_count >= 0:
+            self.citation_count = other.citation_count
+        self.complete |= other.complete
+        self.checked = (max(self.checked[0], other.checked[0]), max(self.checked[1], other.checked[1]))
+
+    def to_dict(self) -> Dict:
+        return {'paperId': self.paper_id, 'title': self.title or None, 'year': self.year or None,
+                'citationCount': self.citation_count if self.citation_count >= 0 else None}
+
+
+def _record_of(paper: Dict) -> PaperRecord:
+    citation_count = paper.get('citationCount')
+    return PaperRecord(paper['paperId'], paper.get('title') or '', paper.get('year') or 0,
+                       citation_count if citation_count is not None else -1)
+
+
+def _valid_id(paper_id: Optional[str]) -> bool:
+    return bool(paper_id) and len(paper_id) == 40
+
+
+def gather(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """一次取出 CSR 中多行的全部列号（向量化，不逐行循环）"""
+    rows = np.asarray(rows, dtype=np.int64)
+    if not len(rows):
+        return np.empty(0, dtype=np.int64)
+    starts = np.asarray(indptr[rows], dtype=np.int64)
+    lengths = np.asarray(indptr[rows + 1], dtype=np.int64) - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    # 每个元素的位置 = 所在行的起点 + 行内序号
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total, dtype=np.int64)
+    return np.asarray(indices[offsets], dtype=np.int64)
+
+
+class _Base:
+    """磁盘上的一个版本：只读的内存映射数组"""
+
+    def __init__(self, directory: str, generation: int = 0, arrays: Dict[str, np.ndarray] = None):
+        self.directory = directory
+        self.generation = generation
+        arrays = arrays or {}
+        empty_int = np.empty(0, dtype=np.int64)
+        self.ids = arrays.get('ids', np.empty(0, dtype=ID_DTYPE))
+        self.sorted_ids = arrays.get('sorted_ids', np.empty(0, dtype=ID_DTYPE))
+        self.order = arrays.get('order', empty_int)
+        self.ref_indptr = arrays.get('ref_indptr', np.zeros(1, dtype=np.int64))
+        self.ref_indices = arrays.get('ref_indices', np.empty(0, dtype=np.int32))
+        self.cit_indptr = arrays.get('cit_indptr', np.zeros(1, dtype=np.int64))
+        self.cit_indices = arrays.get('cit_indices', np.empty(0, dtype=np.int32))
+        self.years = arrays.get('years', np.empty(0, dtype=np.int16))
+        self.citation_counts = arrays.get('citation_counts', np.empty(0, dtype=np.int32))
+        self.title_start = arrays.get('title_start', empty_int)
+        self.title_len = arrays.get('title_len', np.empty(0, dtype=np.int32))
+        self.size = len(self.ids)
+        # 旧版本没有 complete / *_checked 数组
+        self.complete = arrays.get('complete', np.zeros(self.size, dtype=np.uint8))
+        self.ref_checked = arrays.get('ref_checked', np.zeros(self.size, dtype=np.uint32))
+        self.cit_checked = arrays.get('cit_checked', np.zeros(self.size, dtype=np.uint32))
+
+    @classmethod
+    def load(cls, directory: str) -> '_Base':
+        try:
+            with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return cls(directory)
+        path = os.path.join(directory, manifest['path'])
+        arrays = {}
+        for name in ARRAYS:
+            file = os.path.join(path, f'{name}.npy')
+            if not os.path.exists(file):
+                continue
+            # 空数组无法内存映射
+            arrays[name] = np.load(file, mmap_mode='r' if os.path.getsize(file) > 128 else None)
+        return cls(directory, manifest['generation'], arrays)
+
+    @property
+    def edges(self) -> int:
+        return len(self.ref_indices)
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """paperId 数组 -> 整数 ID 数组，不存在的为 -1"""
+        if not self.size or not len(keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.sorted_ids, keys), self.size - 1)
+        found = self.sorted_ids[positions] == keys
+        return np.where(found, self.order[positions], -1).astype(np.int64)
+
+    def row(self, kind: str, node: int) -> np.ndarray:
+        indptr, indices = (self.ref_indptr, self.ref_indices) if kind == 'references' else \
+            (self.cit_indptr, self.cit_indices)
+        return np.asarray(indices[indptr[node]:indptr[node + 1]], dtype=np.int64)
+
+
+class _Delta:
+    """尚未合并到磁盘的增量，新论文的整数 ID 从 start 开始顺延"""
+
+    def __init__(self, start: int):
+        self.start = start
+        self.ids: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.refs: Dict[int, Set[int]] = {}
+        self.cits: Dict[int, Set[int]] = {}
+        self.records: Dict[int, PaperRecord] = {}
+        self.edges = 0
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.keys)
+
+    def __bool__(self):
+        return bool(self.edges or self.records)
+
+
+@contextmanager
+def _file_lock(directory: str) -> Iterator[None]:
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, 'graph.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CitationGraph:
+    """
+    紧凑的本地引用图，由 Scholar 看到的 references / citations 响应持续填充
+    查询（共被引、文献耦合、相关论文）在 CSR 数组上用 numpy 向量化计算，不访问上游
+    """
+
+    def __init__(self, directory: str, flush_edges: int = FLUSH_EDGES, edge_ttl: Dict[str, float] = None):
+        self.directory = directory
+        self.flush_edges = flush_edges
+        self.edge_ttl = {**EDGE_TTL, **(edge_ttl or {})}
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._base = _Base.load(directory)
+        # 正在合并的增量（合并期间仍参与查询）与当前增量
+        self._frozen: Optional[_Delta] = None
+        self._delta = _Delta(self._base.size)
+        self._flusher: Optional[threading.Thread] = None
+        self._manifest_mtime = self._stat_manifest()
+        # titles.bin 的只读句柄（只追加，合并写入的新标题对已打开的句柄同样可见）
+        self._titles = None
+
+    # --- 写入 ---
+
+    def _overlays(self) -> List[_Delta]:
+        return [self._frozen, self._delta] if self._frozen is not None else [self._delta]
+
+    def _node(self, paper_id: str, create: bool = True) -> int:
+        """paperId -> 整数 ID；create=True 时为新论文分配 ID"""
+        found = self._base.lookup(np.array([paper_id], dtype=ID_DTYPE))[0]
+        if found >= 0:
+            return int(found)
+        for overlay in self._overlays():
+            node = overlay.ids.get(paper_id)
+            if node is not None:
+                return node
+        if not create:
+            return -1
+        node = self._delta.end
+        self._delta.ids[paper_id] = node
+        self._delta.keys.append(paper_id)
+        return node
+
+    def _nodes(self, paper_ids: List[str]) -> List[int]:
+        """批量版本的 _node：基础版本只做一次向量化二分查找"""
+        found = self._base.lookup(np.array(paper_ids, dtype=ID_DTYPE)).tolist()
+        return [node if node >= 0 else self._node(paper_id) for paper_id, node in zip(paper_ids, found)]
+
+    def _key(self, node: int) -> str:
+        return self._key_in(self._base, *self._overlays(), node)
+
+    def _add_record(self, node: int, record: PaperRecord):
+        existing = self._delta.records.get(node)
+        if existing is None:
+            self._delta.records[node] = record
+        else:
+            existing.merge(record)
+
+    def _add_edges(self, source: int, targets: Iterable[int], kind: str = 'references'):
+        """添加 source 的参考文献（kind='references'）或施引文献（kind='citations'），跳过已有的边"""
+        targets = set(targets)
+        targets.discard(source)
+        if source < self._base.size:
+            targets.difference_update(self._base.row(kind, source).tolist())
+        for overlay in self._overlays():
+            targets.difference_update((overlay.refs if kind == 'references' else overlay.cits).get(source, ()))
+        if not targets:
+            return
+        forward, backward = (self._delta.refs, self._delta.cits) if kind == 'references' else \
+            (self._delta.cits, self._delta.refs)
+        forward.setdefault(source, set()).update(targets)
+        for target in targets:
+            backward.setdefault(target, set()).add(source)
+        self._delta.edges += len(targets)
+
+    def add_edges(self, paper_id: str, neighbors: List[Dict], kind: str = 'references'):
+        """写入一篇论文的参考文献（kind='references'）或施引文献（kind='citations'）及邻居的元数据"""
+        if not _valid_id(paper_id):
+            return
+        neighbors = [neighbor for neighbor in neighbors if neighbor and _valid_id(neighbor.get('paperId'))]
+        with self._lock:
+            source, *targets = self._nodes([paper_id] + [neighbor['paperId'] for neighbor in neighbors])
+            for node, neighbor in zip(targets, neighbors):
+                if len(neighbor) > 1:
+                    self._add_record(node, _record_of(neighbor))
+            self._add_edges(source, targets, kind)
+        self._maybe_flush()
+
+    def add_papers(self, papers: Iterable[Optional[Dict]]):
+        """写入论文元数据；带有 references / citations 字段的论文同时写入引用边"""
+        with self._lock:
+            for paper in papers:
+                if not paper or not _valid_id(paper.get('paperId')):
+                    continue
+                node = self._node(paper['paperId'])
+                self._add_record(node, _record_of(paper))
+                for kind in ('references', 'citations'):
+                    neighbors = paper.get(kind)
+                    if neighbors:
+                        self._add_edges(node, self._nodes([n['paperId'] for n in neighbors
+                                                           if n and _valid_id(n.get('paperId'))]), kind)
+        self._maybe_flush()
+
+    # --- 合并到磁盘 ---
+
+    def _maybe_flush(self):
+        if self._delta.edges < self.flush_edges:
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self.flush, name='citation-graph-flush', daemon=True)
+            self._flusher.start()
+
+    def flush(self):
+        """把内存增量合并成磁盘上的新版本"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._delta:
+                    return
+                base, frozen = self._base, self._delta
+                self._frozen = frozen
+                self._delta = _Delta(frozen.end)
+            try:
+                src, dst = self._delta_edges(frozen)
+                table = np.array(frozen.keys, dtype=ID_DTYPE)
+                records = [(self._key_in(base, frozen, node), record) for node, record in frozen.records.items()]
+                new_base = self.merge(self._keys_of(base, table, src), self._keys_of(base, table, dst), records)
+            except Exception:
+                # 合并失败时把两份增量按 paperId 放回，下次再试
+                with self._lock:
+                    delta = self._delta
+                    self._frozen = None
+                    self._delta = _Delta(base.size)
+                    self._replay(frozen, lambda node: self._key_in(base, frozen, node))
+                    self._replay(delta, lambda node: self._key_in(base, frozen, delta, node))
+                raise
+            with self._lock:
+                delta = self._delta
+                self._base = new_base
+                self._manifest_mtime = self._stat_manifest()
+                self._frozen = None
+                self._delta = _Delta(new_base.size)
+                self._replay(delta, lambda node: self._key_in(base, frozen, delta, node))
+            logger.info(f"引用图合并完成：{new_base.size} 篇论文，{new_base.edges} 条引用边")
+
+    def _stat_manifest(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.directory, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _reload(self):
+        """其他进程合并出新版本时切换过去，当前增量按 paperId 重新编号"""
+        mtime = self._stat_manifest()
+        if mtime == self._manifest_mtime or self._frozen is not None:
+            return
+        self._manifest_mtime = mtime
+        base, delta = self._base, self._delta
+        new_base = _Base.load(self.directory)
+        if new_base.generation == base.generation:
+            return
+        self._base = new_base
+        self._delta = _Delta(new_base.size)
+        self._replay(delta, lambda node: self._key_in(base, delta, node))
+
+    @staticmethod
+    def _key_in(base: _Base, *overlays_and_node) -> str:
+        """在基础版本与若干增量中查找整数 ID 对应的 paperId"""
+        *overlays, node = overlays_and_node
+        if node < base.size:
+            return base.ids[node].decode('ascii')
+        for overlay in overlays:
+            if overlay.start <= node < overlay.end:
+                return overlay.keys[node - overlay.start]
+        raise KeyError(node)
+
+    @staticmethod
+    def _keys_of(base: _Base, table: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        """整数 ID 数组 -> paperId 数组；table 为紧接在 base 之后分配的新论文"""
+        keys = np.empty(len(nodes), dtype=ID_DTYPE)
+        in_base = nodes < base.size
+        keys[in_base] = base.ids[nodes[in_base]]
+        keys[~in_base] = table[nodes[~in_base] - base.size]
+        return keys
+
+    @staticmethod
+    def _delta_edges(delta: _Delta) -> Tuple[np.ndarray, np.ndarray]:
+        sources, targets = [], []
+        for source, nodes in delta.refs.items():
+            sources.extend([source] * len(nodes))
+            targets.extend(nodes)
+        return np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64)
+
+    def _replay(self, delta: _Delta, key_of):
+        """把基于旧版本编号的增量按 paperId 重新写入当前增量"""
+        for source, nodes in delta.refs.items():
+            self._add_edges(self._node(key_of(source)), [self._node(key_of(node)) for node in nodes])
+        for node, record in delta.records.items():
+            self._add_record(self._node(key_of(node)), record)
+
+    def merge(self, src_keys: np.ndarray, dst_keys: np.ndarray,
+              records: List[Tuple[str, PaperRecord]] = ()) -> _Base:
+        """
+        把以 paperId 表示的引用边（src 引用 dst）与论文元数据合并进磁盘上的最新版本，写出新版本并返回
+        全部为 numpy 向量化操作：新 ID 追加在末尾，边编码为 src * n + dst 后排序去重再生成 CSR
+        """
+        with _file_lock(self.directory):
+            latest = _Base.load(self.directory)
+            record_keys = np.array([key for key, _ in records], dtype=ID_DTYPE)
+            all_keys = np.unique(np.concatenate([src_keys, dst_keys, record_keys]))
+            known = latest.lookup(all_keys)
+            new_keys = all_keys[known < 0]
+            n = latest.size + len(new_keys)
+            ids = np.concatenate([np.asarray(latest.ids), new_keys])
+            # new_keys 已排序，直接插入到原有的有序数组中
+            positions = np.searchsorted(latest.sorted_ids, new_keys)
+            sorted_ids = np.insert(np.asarray(latest.sorted_ids), positions, new_keys)
+            order = np.insert(np.asarray(latest.order, dtype=np.int64), positions,
+                              np.arange(latest.size, n, dtype=np.int64))
+
+            def to_nodes(keys: np.ndarray) -> np.ndarray:
+                nodes = latest.lookup(keys)
+                missing = nodes < 0
+                nodes[missing] = latest.size + np.searchsorted(new_keys, keys[missing])
+                return nodes
+
+            src, dst = to_nodes(src_keys), to_nodes(dst_keys)
+            old_src = np.repeat(np.arange(latest.size, dtype=np.int64), np.diff(np.asarray(latest.ref_indptr)))
+            codes = np.unique(np.concatenate([old_src * n + np.asarray(latest.ref_indices, dtype=np.int64),
+                                              src * n + dst]))
+            src, dst = codes // n, codes % n
+            ref_indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(src, minlength=n), out=ref_indptr[1:])
+            transposed = np.sort(dst * n + src)
+            cit_indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(dst, minlength=n), out=cit_indptr[1:])
+
+            years = np.concatenate([np.asarray(latest.years), np.zeros(len(new_keys), dtype=np.int16)])
+            citation_counts = np.concatenate([np.asarray(latest.citation_counts),
+                                              np.full(len(new_keys), -1, dtype=np.int32)])
+            title_start = np.concatenate([np.asarray(latest.title_start), np.zeros(len(new_keys), dtype=np.int64)])
+            title_len = np.concatenate([np.asarray(latest.title_len), np.zeros(len(new_keys), dtype=np.int32)])
+            complete = np.concatenate([np.asarray(latest.complete), np.zeros(len(new_keys), dtype=np.uint8)])
+            checked = [np.concatenate([np.asarray(column), np.zeros(len(new_keys), dtype=np.uint32)])
+                       for column in (latest.ref_checked, latest.cit_checked)]
+            if len(records):
+                nodes = to_nodes(record_keys)
+                with open(os.path.join(self.directory, TITLES), 'ab') as titles:
+                    offset = titles.tell()
+                    for node, (_, record) in zip(nodes.tolist(), records):
+                        if record.year:
+                            years[node] = record.year
+                        if record.citation_count >= 0:
+                            citation_counts[node] = record.citation_count
+                        complete[node] |= record.complete
+                        for column, at in zip(checked, record.checked):
+                            column[node] = max(int(column[node]), at)
+                        if record.title and not title_len[node]:
+                            data = record.title.encode('utf-8')
+                            titles.write(data)
+                            title_start[node], title_len[node] = offset, len(data)
+                            offset += len(data)
+
+            arrays = {
+                'ids': ids, 'sorted_ids': sorted_ids, 'order': order,
+                'ref_indptr': ref_indptr, 'ref_indices': dst.astype(np.int32),
+                'cit_indptr': cit_indptr, 'cit_indices': (transposed % n).astype(np.int32),
+                'years': years, 'citation_counts': citation_counts,
+                'title_start': title_start, 'title_len': title_len, 'complete': complete,
+                'ref_checked': checked[0], 'cit_checked': checked[1],
+            }
+            generation = latest.generation + 1
+            name = f'gen-{generation:06d}'
+            path = os.path.join(self.directory, name)
+            os.makedirs(path, exist_ok=True)
+            for key, array in arrays.items():
+                np.save(os.path.join(path, f'{key}.npy'), array)
+            manifest = os.path.join(self.directory, MANIFEST)
+            with open(manifest + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'generation': generation, 'path': name, 'papers': n, 'edges': int(len(codes))}, f)
+            os.replace(manifest + '.tmp', manifest)
+            # 旧版本可能仍被其他进程映射，POSIX 上删除不影响已有映射
+            for entry in os.listdir(self.directory):
+                if entry.startswith('gen-') and entry != name:
+                    shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+        return _Base.load(self.directory)
+
+    # --- 查询 ---
+
+    def _size(self) -> int:
+        return self._delta.end
+
+    def _rows(self, kind: str, nodes: np.ndarray) -> np.ndarray:
+        """多行邻居（含重复）：磁盘 CSR 向量化取出，增量部分逐行补充"""
+        base = self._base
+        indptr, indices = (base.ref_indptr, base.ref_indices) if kind == 'references' else \
+            (base.cit_indptr, base.cit_indices)
+        parts = [gather(indptr, indices, nodes[nodes < base.size])]
+        for overlay in self._overlays():
+            adjacency = overlay.refs if kind == 'references' else overlay.cits
+            if adjacency:
+                extra = [node for row in nodes.tolist() for node in adjacency.get(row, ())]
+                if extra:
+                    parts.append(np.array(extra, dtype=np.int64))
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    def _record(self, node: int) -> PaperRecord:
+        record = PaperRecord(self._key(node))
+        base = self._base
+        if node < base.size:
+            record.year = int(base.years[node])
+            record.citation_count = int(base.citation_counts[node])
+            record.complete = int(base.complete[node])
+            record.checked = (int(base.ref_checked[node]), int(base.cit_checked[node]))
+            if base.title_len[node]:
+                record.title = self._read_title(int(base.title_start[node]), int(base.title_len[node]))
+        for overlay in self._overlays():
+            update = overlay.records.get(node)
+            if update is not None:
+                record.merge(update)
+        return record
+
+    def _read_title(self, start: int, length: int) -> str:
+        if self._titles is None:
+            self._titles = open(os.path.join(self.directory, TITLES), 'rb')
+        self._titles.seek(start)
+        return self._titles.read(length).decode('utf-8', errors='replace')
+
+    def paper(self, paper_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._reload()
+            node = self._node(paper_id, create=False)
+            if node < 0:
+                return None
+            result = self._record(node).to_dict()
+            result['referenceCount'] = len(self._rows('references', np.array([node])))
+            result['citedByCount'] = len(self._rows('citations', np.array([node])))
+            return result
+
+    def mark_complete(self, paper_id: str, kind: str, partial: bool = False):
+        """
+        记录 paper_id 在 kind 方向（references / citations）上的引用关系已经写入（及写入时间）
+        partial=True 表示只写入了 batch 嵌套列表中的部分（列表长度有上限）
+        """
+        if not _valid_id(paper_id):
+            return
+        flag = (PARTIAL_FLAGS if partial else COMPLETE_FLAGS)[kind]
+        now = int(time.time())
+        checked = (now, 0) if kind == 'references' else (0, now)
+        with self._lock:
+            self._add_record(self._node(paper_id), PaperRecord(paper_id, complete=flag, checked=checked))
+
+    def is_complete(self, paper_id: str, kind: str, partial: bool = False) -> bool:
+        """kind 方向的引用关系是否已完整获取且未超过 edge_ttl；partial=True 时 batch 嵌套列表获取过的也算"""
+        return not self.stale([paper_id], kind, partial)
+
+    def stale(self, paper_ids: List[str], kind: str, partial: bool = False) -> List[str]:
+        """返回 kind 方向需要（重新）获取的论文：从未完整获取，或距上次获取已超过 edge_ttl"""
+        flags_wanted = COMPLETE_FLAGS[kind] | (PARTIAL_FLAGS[kind] if partial else 0)
+        column = 0 if kind == 'references' else 1
+        oldest = time.time() - self.edge_ttl[kind]
+        result = []
+        with self._lock:
+            self._reload()
+            base = self._base
+            checked_base = base.ref_checked if kind == 'references' else base.cit_checked
+            for paper_id in paper_ids:
+                node = self._node(paper_id, create=False)
+                flags, checked = 0, 0
+                if 0 <= node < base.size:
+                    flags, checked = int(base.complete[node]), int(checked_base[node])
+                for overlay in self._overlays():
+                    record = overlay.records.get(node)
+                    if record is not None:
+                        flags |= record.complete
+                        checked = max(checked, record.checked[column])
+                if node < 0 or not flags & flags_wanted or checked < oldest:
+                    result.append(paper_id)
+        return result
+
+    def add_nested(self, papers: Iterable[Optional[Dict]], kind: str) -> int:
+        """
+        写入 batch 响应中各论文 kind 方向的嵌套引用列表并记录获取时间，返回写入的论文数
+        嵌套列表不短于论文的 referenceCount / citationCount 时标记为完整，否则标记为部分获取
+        """
+        count_key = 'referenceCount' if kind == 'references' else 'citationCount'
+        written = 0
+        with self._lock:
+            for paper in papers:
+                if not paper or not _valid_id(paper.get('paperId')) or paper.get(kind) is None:
+                    continue
+                self.add_papers([paper])
+                nested = paper[kind]
+                self.mark_complete(paper['paperId'], kind, partial=len(nested) < (paper.get(count_key) or 0))
+                written += 1
+        return written
+
+    def neighbors(self, paper_id: str, kind: str) -> List[str]:
+        """paper_id 的参考文献（kind='references'）或施引文献（kind='citations'）"""
+        with self._lock:
+            self._reload()
+            node = self._node(paper_id, create=False)
+            if node < 0:
+                return []
+            return [self._key(other) for other in np.unique(self._rows(kind, np.array([node]))).tolist()]
+
+    def _pair(self, a: str, b: str, kind: str) -> Dict:
+        with self._lock:
+            self._reload()
+            node_a, node_b = self._node(a, create=False), self._node(b, create=False)
+            if node_a < 0 or node_b < 0:
+                shared = np.empty(0, dtype=np.int64)
+            else:
+                shared = np.intersect1d(self._rows(kind, np.array([node_a])), self._rows(kind, np.array([node_b])))
+            return {'count': int(len(shared)), 'papers': [self._record(int(node)).to_dict() for node in shared[:50]]}
+
+    def co_citation(self, a: str, b: str) -> Dict:
+        """共被引：同时引用 a 与 b 的论文"""
+        return self._pair(a, b, 'citations')
+
+    def coupling(self, a: str, b: str) -> Dict:
+        """文献耦合：a 与 b 共同引用的参考文献"""
+        return self._pair(a, b, 'references')
+
+    def related(self, paper_id: str, k: int = 10, method: str = 'combined') -> List[Dict]:
+        """
+        与 paper_id 最相关的 k 篇论文
+        - cocitation: 与它一起被引用的次数（A^T A 的一行：施引文献的参考文献计数）
+        - coupling: 与它共同的参考文献数（A A^T 的一行：参考文献的施引文献计数）
+        - combined: 两者之和
+        """
+        if method not in METHODS:
+            raise ValueError(f"不支持的方法: {method}")
+        with self._lock:
+            self._reload()
+            node = self._node(paper_id, create=False)
+            if node < 0:
+                return []
+            size = self._size()
+            start = np.array([node], dtype=np.int64)
+            cocitation = coupling = None
+            if method in ('cocitation', 'combined'):
+                cocitation = np.bincount(self._rows('references', self._rows('citations', start)), minlength=size)
+            if method in ('coupling', 'combined'):
+                coupling = np.bincount(self._rows('citations', self._rows('references', start)), minlength=size)
+            scores = cocitation if coupling is None else coupling if cocitation is None else cocitation + coupling
+            scores[node] = 0
+            k = min(k, int(np.count_nonzero(scores)))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            results = []
+            for other in top.tolist():
+                item = self._record(other).to_dict()
+                item['score'] = int(scores[other])
+                if cocitation is not None:
+                    item['coCitation'] = int(cocitation[other])
+                if coupling is not None:
+                    item['coupling'] = int(coupling[other])
+                results.append(item)
+            return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._reload()
+            pending = sum(overlay.edges for overlay in self._overlays())
+            return {'directory': self.directory, 'papers': self._size(), 'edges': self._base.edges + pending,
+                    'pending_edges': pending, 'generation': self._base.generation}
+
+    def close(self):
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        with self._lock:
+            if self._titles is not None:
+                self._titles.close()
+                self._titles = None
+
+
+def import_offline_index(graph: CitationGraph, index_path: str, batch: int = IMPORT_BATCH) -> int:
+    """从 offline_index.py 构建的离线索引导入全部引用边（按 paperId），返回导入的边数"""
+    conn = sqlite3.connect(f'file:{index_path}?mode=ro', uri=True)
+    try:
+        cursor = conn.execute('''
+            SELECT a.paper_id, b.paper_id FROM citations c
+            JOIN papers a ON a.corpus_id = c.citing JOIN papers b ON b.corpus_id = c.cited
+            WHERE a.paper_id IS NOT NULL AND b.paper_id IS NOT NULL''')
+        total = 0
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                break
+            src, dst = zip(*rows)
+            graph.merge(np.array(src, dtype=ID_DTYPE), np.array(dst, dtype=ID_DTYPE))
+            total += len(rows)
+            logger.info(f"已导入 {total} 条引用边")
+        records = [(paper_id, PaperRecord(paper_id, title or '', year or 0,
+                                          citation_count if citation_count is not None else -1))
+                   for paper_id, title, year, citation_count in conn.execute(
+                       'SELECT paper_id, title, year, citation_count FROM papers WHERE paper_id IS NOT NULL')]
+        empty = np.empty(0, dtype=ID_DTYPE)
+        for i in range(0, len(records), batch):
+            graph.merge(empty, empty, records[i:i + batch])
+    finally:
+        conn.close()
+    with graph._lock:
+        graph._reload()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地引用图")
+    commands = parser.add_subparsers(dest='command', required=True)
+    stats = commands.add_parser('stats', help="查看规模")
+    stats.add_argument('directory')
+    related = commands.add_parser('related', help="查询相关论文")
+    related.add_argument('directory')
+    related.add_argument('paper_id')
+    related.add_argument('--k', type=int, default=10)
+    related.add_argument('--method', choices=METHODS, default='combined')
+    imported = commands.add_parser('import', help="从离线索引导入引用边")
+    imported.add_argument('directory')
+    imported.add_argument('index')
+    args = parser.parse_args(argv)
+
+    graph = CitationGraph(args.directory)
+    if args.command == 'stats':
+        result = graph.stats()
+    elif args.command == 'related':
+        result = graph.related(args.paper_id, k=args.k, method=args.method)
+    else:
+        result = {'edges': import_offline_index(graph, args.index), **graph.stats()}
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
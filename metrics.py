@@ -0,0 +1,348 @@
+import bisect
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter as _Counter, deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+# 默认的延迟分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_PAPER_SEGMENT = re.compile(r'^(paper|author)/[^/]+(?:/[^/]+)*?/(references|citations|papers)$')
+
+
+def normalize_endpoint(endpoint: str) -> str:
+    """把接口路径中的论文 ID 去掉，避免标签基数爆炸：graph/v1/paper/abc/references -> paper/{id}/references"""
+    path = endpoint.strip('/')
+    if path.startswith('graph/v1/'):
+        path = path[len('graph/v1/'):]
+    if path in ('paper/search', 'paper/batch', 'paper/search/bulk', 'paper/search/match'):
+        return path
+    match = _PAPER_SEGMENT.match(path)
+    if match:
+        return f'{match.group(1)}/{{id}}/{match.group(2)}'
+    parts = path.split('/')
+    if len(parts) >= 2:
+        return f'{parts[0]}/{{id}}'
+    return path
+
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{str(value)}"'.replace('\n', ' ') for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """单调递增计数器，按标签值分组"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value:g}')
+        return lines
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {','.join(key) or 'total': value for key, value in sorted(self._values.items())}
+
+
+class Histogram:
+    """固定分桶的直方图，分位数按桶内线性插值估算"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数..., +Inf 桶计数, 总和]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _quantile(self, series: List[float], q: float) -> float:
+        counts = series[:-1]
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index >= len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % le)
+                    lines.append(f'{self.name}_bucket{labels} {cumulative:g}')
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {series[-1]:.6f}')
+                lines.append(f'{self.name}_count{labels} {cumulative:g}')
+        return lines
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """各标签组合的次数、平均值与 p50/p95/p99（秒）"""
+        result = {}
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                count = sum(series[:-1])
+                result[','.join(key) or 'total'] = {
+                    'count': count,
+                    'mean': round(series[-1] / count, 6) if count else 0.0,
+                    'p50': round(self._quantile(series, 0.50), 6),
+                    'p95': round(self._quantile(series, 0.95), 6),
+                    'p99': round(self._quantile(series, 0.99), 6),
+                }
+        return result
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+REGISTRY = MetricsRegistry()
+
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    'scholar_upstream_request_seconds', '单次上游请求（每次尝试）的耗时',
+    ('endpoint', 'method', 'status', 'backend'))
+UPSTREAM_RETRIES = REGISTRY.counter(
+    'scholar_upstream_retries_total', '上游请求的重试次数，按触发原因', ('endpoint', 'reason'))
+UPSTREAM_ERRORS = REGISTRY.counter(
+    'scholar_upstream_errors_total', '上游请求失败次数，按状态码或错误类型',
+    ('endpoint', 'status', 'backend'))
+UPSTREAM_HEDGES = REGISTRY.counter(
+    'scholar_upstream_hedges_total',
+    '对冲请求次数：slow 为首选上游超时未响应，failover 为失败后换上游，won 为对冲请求胜出',
+    ('endpoint', 'backend', 'outcome'))
+CACHE_REQUESTS = REGISTRY.counter(
+    'scholar_cache_requests_total', '各级缓存/索引的查询次数', ('cache', 'result'))
+RATE_LIMIT_WAIT = REGISTRY.histogram(
+    'scholar_rate_limit_wait_seconds', '客户端限流的排队等待时间',
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+TOOL_LATENCY = REGISTRY.histogram(
+    'scholar_tool_seconds', 'MCP 工具调用的端到端耗时，outcome 为 ok / partial / empty / error / exception',
+    ('tool', 'outcome'))
+REFRESHES = REGISTRY.counter(
+    'scholar_refresh_total', '后台刷新任务数：ok / failed / dropped（队列已满）/ skipped（其他进程正在刷新）',
+    ('kind', 'outcome'))
+STAGE_LATENCY = REGISTRY.histogram(
+    'scholar_stage_seconds', '工具内部各阶段的耗时', ('operation', 'stage'))
+
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    if count:
+        CACHE_REQUESTS.inc(count, cache=cache, result='hit' if hit else 'miss')
+
+
+def cache_hit_ratios() -> Dict[str, float]:
+    """各缓存的命中率"""
+    totals: Dict[str, List[float]] = {}
+    for key, value in CACHE_REQUESTS.snapshot().items():
+        cache, result = key.split(',')
+        # 宽限期内返回的旧数据也算命中
+        totals.setdefault(cache, [0, 0])[0 if result in ('hit', 'stale') else 1] += value
+    return {cache: round(hit / (hit + miss), 4) for cache, (hit, miss) in totals.items() if hit + miss}
+
+
+@contextmanager
+def stage(operation: str, name: str) -> Iterator[None]:
+    with STAGE_LATENCY.time(operation=operation, stage=name):
+        yield
+
+
+class SlowRequestProfiler:
+    """
+    可选的采样分析器：工具调用期间由后台线程定时采样事件循环线程的调用栈，
+    调用耗时超过阈值时把采样聚合为折叠栈（flamegraph 格式）写入日志或目录
+    事件循环是单线程的，采样中也会包含同一时间段内其他并发请求的栈
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.005, output_dir: str = '', top: int = 10,
+                 max_samples: int = 200000):
+        self.threshold = threshold
+        self.interval = interval
+        self.output_dir = output_dir
+        self.top = top
+        self._samples: deque = deque(maxlen=max_samples)
+        self._sequence = 0
+        self._active: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            with self._lock:
+                targets = set(self._active)
+            if not targets:
+                self._wake.clear()
+                continue
+            frames = sys._current_frames()
+            for thread_id in targets:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                with self._lock:
+                    self._sequence += 1
+                    self._samples.append((self._sequence, thread_id, ';'.join(reversed(stack))))
+            time.sleep(self.interval)
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        thread_id = threading.get_ident()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+                self._thread.start()
+            self._active[thread_id] = self._active.get(thread_id, 0) + 1
+            first = self._sequence
+        self._wake.set()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._active[thread_id] -= 1
+                if not self._active[thread_id]:
+                    del self._active[thread_id]
+                stacks = _Counter(stack for seq, tid, stack in self._samples if seq > first and tid == thread_id)
+            if elapsed >= self.threshold and stacks:
+                self._report(name, elapsed, stacks)
+
+    def _report(self, name: str, elapsed: float, stacks: _Counter):
+        total = sum(stacks.values())
+        lines = [f"慢请求 {name}: {elapsed:.3f}s，共 {total} 个采样"]
+        for stack, count in stacks.most_common(self.top):
+            lines.append(f"  {count / total:6.1%}  {';'.join(stack.rsplit(';', 3)[-3:])}")
+        logger.warning('\n'.join(lines))
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms.folded")
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+
+
+# 慢请求分析：设置阈值（毫秒）后启用，例如 SCHOLAR_PROFILE_SLOW_MS=2000
+_slow_ms = float(os.environ.get('SCHOLAR_PROFILE_SLOW_MS', '0') or 0)
+PROFILER: Optional[SlowRequestProfiler] = SlowRequestProfiler(
+    _slow_ms / 1000, output_dir=os.environ.get('SCHOLAR_PROFILE_DIR', '')) if _slow_ms > 0 else None
+
+
+class ToolCall:
+    """一次工具调用的结果分类，由 track_tool 产出；工具可以用 check 按返回值设置，或直接设置 outcome"""
+    __slots__ = ('outcome',)
+
+    def __init__(self):
+        self.outcome: Optional[str] = None
+
+    def check(self, result) -> None:
+        """
+        按返回值分类：带 error 的字典为 'error'，空结果为 'empty'，
+        带 incomplete / unresolved 列表（部分获取失败）的为 'partial'，其余为 'ok'
+        """
+        if isinstance(result, dict) and result.get('error'):
+            self.outcome = 'error'
+        elif isinstance(result, dict) and (result.get('incomplete') or result.get('unresolved')):
+            self.outcome = 'partial'
+        elif not result:
+            self.outcome = 'empty'
+        else:
+            self.outcome = 'ok'
+
+
+@contextmanager
+def track_tool(tool: str) -> Iterator[ToolCall]:
+    """
+    记录工具调用耗时与结果：outcome 取 ToolCall.outcome，未设置时为 'ok'，抛出异常时为 'exception'
+    启用慢请求分析时同时采样调用栈
+    """
+    start = time.perf_counter()
+    call = ToolCall()
+    outcome = 'exception'
+    try:
+        if PROFILER is not None:
+            with PROFILER.profile(tool):
+                yield call
+        else:
+            yield call
+        outcome = call.outcome or 'ok'
+    finally:
+        TOOL_LATENCY.observe(time.perf_counter() - start, tool=tool, outcome=outcome)
@@ -0,0 +1,420 @@
+"""
+基于 Semantic Scholar 批量数据集（Datasets API 下载的 papers / abstracts / citations 分片）的本地离线索引
+
+所有数据保存在一个 SQLite 文件中：
+- papers: 论文元数据（以 corpusId 为主键，paperId 取自记录中的 url）
+- papers_fts: 标题与作者的 FTS5 全文索引
+- citations: 以 corpusId 表示的引用边
+
+导入按行流式读取（支持 .gz），分批写入，内存占用与输入大小无关；同一个索引可以多次追加导入。
+每行记录按字段自动识别所属数据集，也接受 Graph API 形式（paperId、citationCount 等驼峰字段）的记录。
+
+用法:
+    python offline_index.py build index.sqlite3 papers/*.jsonl.gz abstracts/*.jsonl.gz citations/*.jsonl.gz
+    python offline_index.py search index.sqlite3 "attention is all you need"
+    python offline_index.py stats index.sqlite3
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from loguru import logger
+
+from paper_store import parse_fields, top_level
+
+# 每批写入的行数
+BATCH_SIZE = 5000
+# 标题的 BM25 权重高于作者
+TITLE_WEIGHT = 10.0
+AUTHOR_WEIGHT = 1.0
+# 索引能提供的论文字段（references/citations 仅在导入过引用边时提供）
+OFFLINE_FIELDS = ('paperId', 'corpusId', 'externalIds', 'url', 'title', 'authors', 'year', 'venue', 'journal',
+                  'publicationTypes', 'publicationDate', 'citationCount', 'referenceCount', 'abstract',
+                  'citationStyles')
+EDGE_KEYS = ('references', 'citations')
+
+_PAPER_ID = re.compile(r'^[0-9a-f]{40}$')
+_WORD = re.compile(r'\w+')
+_BIBTEX_SPECIAL = re.compile(r'[{}\\]')
+
+_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS papers (
+        corpus_id INTEGER PRIMARY KEY,
+        paper_id TEXT,
+        doi TEXT,
+        arxiv TEXT,
+        external_ids TEXT,
+        title TEXT,
+        authors TEXT,
+        author_names TEXT,
+        year INTEGER,
+        venue TEXT,
+        journal TEXT,
+        publication_types TEXT,
+        publication_date TEXT,
+        citation_count INTEGER,
+        reference_count INTEGER,
+        abstract TEXT
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_papers_paper_id ON papers(paper_id);
+    CREATE INDEX IF NOT EXISTS idx_papers_doi ON papers(doi);
+    CREATE INDEX IF NOT EXISTS idx_papers_arxiv ON papers(arxiv);
+    CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+        title, author_names, content='papers', content_rowid='corpus_id'
+    );
+    CREATE TABLE IF NOT EXISTS citations (
+        citing INTEGER NOT NULL,
+        cited INTEGER NOT NULL,
+        PRIMARY KEY (citing, cited)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_citations_cited ON citations(cited, citing);
+'''
+
+_UPSERT_PAPER = '''
+    INSERT INTO papers (corpus_id, paper_id, doi, arxiv, external_ids, title, authors, author_names, year, venue,
+                        journal, publication_types, publication_date, citation_count, reference_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(corpus_id) DO UPDATE SET
+        paper_id = excluded.paper_id, doi = excluded.doi, arxiv = excluded.arxiv,
+        external_ids = excluded.external_ids, title = excluded.title, authors = excluded.authors,
+        author_names = excluded.author_names, year = excluded.year, venue = excluded.venue,
+        journal = excluded.journal, publication_types = excluded.publication_types,
+        publication_date = excluded.publication_date, citation_count = excluded.citation_count,
+        reference_count = excluded.reference_count
+'''
+_UPSERT_ABSTRACT = '''
+    INSERT INTO papers (corpus_id, abstract) VALUES (?, ?)
+    ON CONFLICT(corpus_id) DO UPDATE SET abstract = excluded.abstract
+'''
+_INSERT_CITATION = 'INSERT OR IGNORE INTO citations (citing, cited) VALUES (?, ?)'
+
+
+def _json_or_none(value: Any) -> Optional[str]:
+    return json.dumps(value, ensure_ascii=False) if value else None
+
+
+def _paper_row(record: Dict) -> Optional[tuple]:
+    """papers 数据集记录 -> papers 表的一行；缺少 corpusId 或 paperId 时返回 None"""
+    corpus_id = record.get('corpusid')
+    external = record.get('externalids') or {}
+    if corpus_id is None:
+        corpus_id = external.get('CorpusId')
+    paper_id = record.get('paperid')
+    if not paper_id and record.get('url'):
+        paper_id = record['url'].rstrip('/').rsplit('/', 1)[-1]
+    if corpus_id is None or not paper_id or not _PAPER_ID.match(paper_id):
+        return None
+    doi = external.get('DOI')
+    arxiv = external.get('ArXiv')
+    authors = [{'authorId': a.get('authorId'), 'name': a.get('name')} for a in record.get('authors') or []]
+    return (
+        int(corpus_id), paper_id, doi.lower() if doi else None, arxiv.lower() if arxiv else None,
+        _json_or_none(external), record.get('title'), _json_or_none(authors),
+        ' '.join(a['name'] for a in authors if a['name']), record.get('year'), record.get('venue'),
+        _json_or_none(record.get('journal')), _json_or_none(record.get('publicationtypes')),
+        record.get('publicationdate'), record.get('citationcount'), record.get('referencecount'),
+    )
+
+
+def _open_input(path: str) -> TextIO:
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_records(lines: Iterable[str]) -> Iterator[Dict]:
+    """逐行解析 JSONL，键统一转为小写；无法解析的行跳过"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            yield {key.lower(): value for key, value in record.items()}
+
+
+def _connect(path: str, read_only: bool = False) -> sqlite3.Connection:
+    if read_only:
+        return sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def ingest(index_path: str, inputs: Iterable[str], batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """
+    把数据集分片流式导入索引，返回各类记录的导入数量
+    每攒够 batch_size 行提交一次；全文索引在全部导入后统一重建
+    """
+    conn = _connect(index_path)
+    stats = {'papers': 0, 'abstracts': 0, 'citations': 0, 'skipped': 0}
+    batches: Dict[str, List[tuple]] = {'papers': [], 'abstracts': [], 'citations': []}
+    statements = {'papers': _UPSERT_PAPER, 'abstracts': _UPSERT_ABSTRACT, 'citations': _INSERT_CITATION}
+
+    def flush(kind: str):
+        rows = batches[kind]
+        if not rows:
+            return
+        conn.execute('BEGIN')
+        conn.executemany(statements[kind], rows)
+        conn.execute('COMMIT')
+        stats[kind] += len(rows)
+        rows.clear()
+
+    try:
+        for path in inputs:
+            logger.info(f"导入 {path}")
+            source = _open_input(path)
+            try:
+                for record in iter_records(source):
+                    if 'citingcorpusid' in record:
+                        citing, cited = record.get('citingcorpusid'), record.get('citedcorpusid')
+                        row = (int(citing), int(cited)) if citing is not None and cited is not None else None
+                        kind = 'citations'
+                    elif 'title' in record:
+                        row = _paper_row(record)
+                        kind = 'papers'
+                        if row is not None and record.get('abstract'):
+                            # Graph API 形式的记录自带摘要
+                            batches['abstracts'].append((row[0], record['abstract']))
+                    elif 'abstract' in record and record.get('corpusid') is not None:
+                        row = (int(record['corpusid']), record['abstract']) if record['abstract'] else None
+                        kind = 'abstracts'
+                    else:
+                        row, kind = None, None
+                    if row is None:
+                        stats['skipped'] += 1
+                        continue
+                    batches[kind].append(row)
+                    if len(batches[kind]) >= batch_size:
+                        flush(kind)
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+        for kind in batches:
+            flush(kind)
+        if stats['papers']:
+            logger.info("重建全文索引")
+            conn.execute("INSERT INTO papers_fts(papers_fts) VALUES ('rebuild')")
+    finally:
+        conn.close()
+    return stats
+
+
+def _bibtex_value(value: Any) -> str:
+    return _BIBTEX_SPECIAL.sub('', str(value))
+
+
+def synthesize_bibtex(paper: Dict) -> str:
+    """根据论文元数据生成 BibTeX（与 Graph API 的 citationStyles.bibtex 格式相近）"""
+    authors = [a.get('name') for a in paper.get('authors') or [] if a.get('name')]
+    title = paper.get('title') or ''
+    year = paper.get('year')
+    first_word = next(iter(_WORD.findall(title)), '')
+    last_name = authors[0].split()[-1] if authors else ''
+    key = re.sub(r'\W', '', f"{last_name}{year or ''}{first_word.capitalize()}") or str(paper.get('corpusId', ''))
+    journal = paper.get('journal') or {}
+    types = paper.get('publicationTypes') or []
+    fields = []
+    if 'Conference' in types and paper.get('venue'):
+        entry_type = 'InProceedings'
+        fields.append(('booktitle', paper['venue']))
+    elif journal.get('name') or 'JournalArticle' in types:
+        entry_type = 'Article'
+        fields.append(('journal', journal.get('name') or paper.get('venue') or ''))
+        if journal.get('volume'):
+            fields.append(('volume', journal['volume']))
+        if journal.get('pages'):
+            fields.append(('pages', journal['pages'].strip()))
+    else:
+        entry_type = 'Misc'
+        if paper.get('venue'):
+            fields.append(('howpublished', paper['venue']))
+    fields = [('author', ' and '.join(authors)), ('title', title)] + fields
+    if year:
+        fields.append(('year', year))
+    external = paper.get('externalIds') or {}
+    if external.get('DOI'):
+        fields.append(('doi', external['DOI']))
+    body = ',\n'.join(f" {name} = {{{_bibtex_value(value)}}}" for name, value in fields if value)
+    return f"@{entry_type}{{{key},\n{body}\n}}\n"
+
+
+class OfflineIndex:
+    """
+    离线索引的只读查询接口，记录格式与 Graph API 返回的论文对象一致
+    索引中没有的字段（如 openAccessPdf、tldr）不出现在结果中
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = _connect(path, read_only=True)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self.has_citations = self._conn.execute('SELECT EXISTS (SELECT 1 FROM citations)').fetchone()[0] == 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def can_serve(self, fields: Optional[str]) -> bool:
+        """请求了引用关系但索引中没有引用边时无法提供；其余索引没有的字段直接省略"""
+        return self.has_citations or not any(top_level(f) in EDGE_KEYS for f in parse_fields(fields))
+
+    def _row_to_paper(self, row: sqlite3.Row) -> Dict[str, Any]:
+        paper = {
+            'paperId': row['paper_id'],
+            'corpusId': row['corpus_id'],
+            'externalIds': json.loads(row['external_ids']) if row['external_ids'] else {},
+            'url': f"https://www.semanticscholar.org/paper/{row['paper_id']}",
+            'title': row['title'],
+            'authors': json.loads(row['authors']) if row['authors'] else [],
+            'year': row['year'],
+            'venue': row['venue'] or '',
+            'journal': json.loads(row['journal']) if row['journal'] else None,
+            'publicationTypes': json.loads(row['publication_types']) if row['publication_types'] else None,
+            'publicationDate': row['publication_date'],
+            'citationCount': row['citation_count'],
+            'referenceCount': row['reference_count'],
+            'abstract': row['abstract'],
+        }
+        return paper
+
+    def _project(self, row: sqlite3.Row, fields: Optional[str]) -> Dict[str, Any]:
+        paper = self._row_to_paper(row)
+        field_list = parse_fields(fields) or ['title', 'authors', 'year', 'venue', 'citationCount', 'abstract']
+        result = {'paperId': paper['paperId']}
+        edge_fields: Dict[str, List[str]] = {}
+        for field in field_list:
+            key = top_level(field)
+            if key in EDGE_KEYS:
+                sub = field.partition('.')[2]
+                edge_fields.setdefault(key, [])
+                if sub:
+                    edge_fields[key].append(sub)
+            elif key == 'citationStyles':
+                result['citationStyles'] = {'bibtex': synthesize_bibtex(paper)}
+            elif key in paper:
+                result[key] = paper[key]
+        if self.has_citations:
+            for key, sub_fields in edge_fields.items():
+                result[key] = self._edges(row['corpus_id'], key, ','.join(sub_fields) or 'paperId,title')
+        return result
+
+    def _edges(self, corpus_id: int, key: str, fields: str) -> List[Dict]:
+        if key == 'references':
+            sql = 'SELECT p.* FROM citations c JOIN papers p ON p.corpus_id = c.cited WHERE c.citing = ?'
+        else:
+            sql = 'SELECT p.* FROM citations c JOIN papers p ON p.corpus_id = c.citing WHERE c.cited = ?'
+        rows = self._conn.execute(sql + ' AND p.paper_id IS NOT NULL', (corpus_id,)).fetchall()
+        return [self._project(row, fields) for row in rows]
+
+    def _lookup(self, paper_id: str) -> Optional[sqlite3.Row]:
+        paper_id = paper_id.strip()
+        prefix, _, value = paper_id.partition(':')
+        prefix = prefix.upper() if value else ''
+        if _PAPER_ID.match(paper_id.lower()):
+            sql, arg = 'SELECT * FROM papers WHERE paper_id = ?', paper_id.lower()
+        elif prefix == 'DOI' or paper_id.startswith('10.'):
+            sql, arg = 'SELECT * FROM papers WHERE doi = ?', (value if prefix == 'DOI' else paper_id).lower()
+        elif prefix == 'CORPUSID' and value.isdigit():
+            sql, arg = 'SELECT * FROM papers WHERE corpus_id = ?', int(value)
+        elif prefix == 'ARXIV':
+            sql, arg = 'SELECT * FROM papers WHERE arxiv = ?', value.lower()
+        else:
+            return None
+        return self._conn.execute(sql + ' AND paper_id IS NOT NULL', (arg,)).fetchone()
+
+    def get(self, paper_id: str, fields: str = None) -> Optional[Dict[str, Any]]:
+        """按 paperId / DOI / CorpusId / ArXiv ID 查询单篇论文，未收录时返回 None"""
+        with self._lock:
+            row = self._lookup(paper_id)
+            return self._project(row, fields) if row is not None else None
+
+    def get_many(self, paper_ids: List[str], fields: str = None) -> List[Optional[Dict[str, Any]]]:
+        """批量查询，结果与输入顺序一致，未收录的位置为 None"""
+        with self._lock:
+            results = []
+            for paper_id in paper_ids:
+                row = self._lookup(paper_id)
+                results.append(self._project(row, fields) if row is not None else None)
+            return results
+
+    def search(self, query: str, limit: int = 10, fields: str = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """对标题和作者做全文检索（所有词都需出现），按 BM25 排序"""
+        words = _WORD.findall(query)
+        if not words:
+            return []
+        match = ' '.join('"{}"'.format(word.replace('"', '')) for word in words)
+        sql = f'''
+            SELECT p.* FROM papers_fts f JOIN papers p ON p.corpus_id = f.rowid
+            WHERE papers_fts MATCH ? AND p.paper_id IS NOT NULL
+            ORDER BY bm25(papers_fts, {TITLE_WEIGHT}, {AUTHOR_WEIGHT}), p.citation_count DESC
+            LIMIT ? OFFSET ?
+        '''
+        with self._lock:
+            try:
+                rows = self._conn.execute(sql, (match, limit, offset)).fetchall()
+            except sqlite3.OperationalError as e:
+                logger.warning(f"离线索引检索失败: {e}")
+                return []
+            return [self._project(row, fields) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            papers = self._conn.execute('SELECT COUNT(*) FROM papers WHERE paper_id IS NOT NULL').fetchone()[0]
+            abstracts = self._conn.execute('SELECT COUNT(*) FROM papers WHERE abstract IS NOT NULL').fetchone()[0]
+            citations = self._conn.execute('SELECT COUNT(*) FROM citations').fetchone()[0]
+        return {'papers': papers, 'abstracts': abstracts, 'citations': citations,
+                'size': os.path.getsize(self.path)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Semantic Scholar 数据集离线索引")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="导入数据集分片（JSONL 或 .jsonl.gz）")
+    build.add_argument('index', help="索引文件路径")
+    build.add_argument('inputs', nargs='+', help="数据集分片，'-' 表示标准输入")
+    build.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="每批写入的行数")
+    search = commands.add_parser('search', help="检索索引")
+    search.add_argument('index', help="索引文件路径")
+    search.add_argument('query', help="检索词")
+    search.add_argument('--limit', type=int, default=10)
+    stats = commands.add_parser('stats', help="查看索引统计")
+    stats.add_argument('index', help="索引文件路径")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        result = ingest(args.index, args.inputs, batch_size=args.batch_size)
+        print(f"论文 {result['papers']} 条，摘要 {result['abstracts']} 条，引用 {result['citations']} 条，"
+              f"跳过 {result['skipped']} 条", file=sys.stderr)
+        return 0
+    index = OfflineIndex(args.index)
+    try:
+        if args.command == 'search':
+            for paper in index.search(args.query, limit=args.limit, fields='title,year,authors'):
+                print(json.dumps(paper, ensure_ascii=False))
+        else:
+            print(json.dumps(index.stats(), ensure_ascii=False))
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
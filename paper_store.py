@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+# references/citations 接口中属于“引用关系”而非论文本身的字段
+EDGE_FIELDS = {'contexts', 'intents', 'isInfluential', 'contextsWithIntent'}
+
+
+def parse_fields(fields: str) -> List[str]:
+    """将逗号分隔的 fields 字符串拆分为去重后的字段列表（保持顺序）"""
+    result = []
+    for field in (fields or '').split(','):
+        field = field.strip()
+        if field and field not in result:
+            result.append(field)
+    return result
+
+
+def top_level(field: str) -> str:
+    """嵌套字段（如 authors.name）对应的顶层键"""
+    return field.split('.', 1)[0]
+
+
+# 嵌套列表中用于对齐元素的 ID 键
+ITEM_KEYS = ('paperId', 'authorId')
+
+
+class Unmergeable(ValueError):
+    """同一顶层键下两次获取的值无法逐项对齐（如参考文献列表已变化）"""
+
+
+def _item_key(items: List) -> Optional[str]:
+    """列表元素都是带同一个 ID 键的 dict 时返回该键"""
+    for key in ITEM_KEYS:
+        if all(isinstance(item, dict) and item.get(key) for item in items):
+            return key
+    return None
+
+
+def merge_value(old, new):
+    """
+    合并同一顶层键下分别请求不同子字段得到的两个值（如 authors.name 与 authors.affiliations）
+    dict 按键递归合并；列表按元素的 paperId / authorId 逐项合并，两次的元素集合不同时抛出 Unmergeable
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        merged = dict(old)
+        for key, value in new.items():
+            merged[key] = merge_value(old[key], value) if key in old else value
+        return merged
+    if isinstance(old, list) and isinstance(new, list) and (old or new):
+        key = _item_key(old + new)
+        if key is None:
+            if len(old) != len(new) or not all(isinstance(item, dict) for item in old + new):
+                raise Unmergeable(f"无法对齐的列表（{len(old)} / {len(new)} 项）")
+            return [merge_value(a, b) for a, b in zip(old, new)]
+        by_id = {item[key]: item for item in old}
+        if set(by_id) != {item[key] for item in new}:
+            raise Unmergeable(f"列表元素不一致（{len(old)} / {len(new)} 项）")
+        return [merge_value(by_id[item[key]], item) for item in new]
+    return new
+
+
+class PaperStore:
+    """
+    按 paperId 存储论文记录的有界 LRU 内存缓存
+    每篇论文记录已经获取过的字段，后续请求只需补齐缺失字段；
+    同时记录最近一次从上游获取的时间与访问次数，供后台刷新判断新旧与排优先级
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self._papers: "OrderedDict[str, Dict]" = OrderedDict()
+        self._fields: Dict[str, Set[str]] = {}
+        # paperId -> [最近一次写入的时间, 访问次数]
+        self._meta: Dict[str, List[float]] = {}
+        # DOI:xxx / CorpusId:xxx 等外部 ID 到 paperId 的映射
+        self._aliases: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._papers)
+
+    def __contains__(self, paper_id: str):
+        return self.resolve(paper_id) in self._papers
+
+    def resolve(self, paper_id: str) -> str:
+        return self._aliases.get(paper_id, paper_id)
+
+    def missing_fields(self, paper_id: str, fields: List[str]) -> List[str]:
+        """
+        返回需要获取的字段；未知论文返回全部字段
+        缺少某个子字段时，同一顶层键下所请求的其他子字段一并返回，使获取到的值本身就完整
+        """
+        held = self._fields.get(self.resolve(paper_id))
+        if held is None:
+            return list(fields)
+        keys = {top_level(f) for f in fields if f not in held}
+        return [f for f in fields if top_level(f) in keys]
+
+    def put(self, paper: Dict, fields: List[str], alias: str = None):
+        """合并一条论文记录，fields 为本次响应所请求的字段"""
+        if not paper or not paper.get('paperId'):
+            return
+        paper_id = paper['paperId']
+        fields = [f for f in fields if f not in EDGE_FIELDS]
+        with self._lock:
+            record = self._papers.get(paper_id)
+            if record is None:
+                record = {'paperId': paper_id}
+                self._papers[paper_id] = record
+                self._fields[paper_id] = set()
+                self._meta[paper_id] = [0.0, 0]
+            held = self._fields[paper_id]
+            for key in dict.fromkeys(top_level(f) for f in fields):
+                value = paper.get(key)
+                if key in record and any(top_level(f) == key and f not in fields for f in held):
+                    # 已持有本次没有请求的子字段：逐项合并，合并不了时只保留本次请求的子字段
+                    try:
+                        value = merge_value(record[key], value)
+                    except Unmergeable:
+                        held.difference_update([f for f in held if top_level(f) == key])
+                record[key] = value
+            held.update(fields)
+            self._meta[paper_id][0] = time.time()
+            self._papers.move_to_end(paper_id)
+            if alias and alias != paper_id:
+                self._aliases[alias] = paper_id
+            while len(self._papers) > self.capacity:
+                evicted, _ = self._papers.popitem(last=False)
+                self._fields.pop(evicted, None)
+                self._meta.pop(evicted, None)
+            if len(self._aliases) > self.capacity:
+                self._aliases = {k: v for k, v in self._aliases.items() if v in self._papers}
+
+    def get(self, paper_id: str, fields: List[str]) -> Optional[Dict]:
+        """返回只包含所请求字段的记录副本；字段不全时返回 None"""
+        paper_id = self.resolve(paper_id)
+        with self._lock:
+            record = self._papers.get(paper_id)
+            if record is None:
+                return None
+            held = self._fields[paper_id]
+            if any(f not in held for f in fields if f not in EDGE_FIELDS):
+                return None
+            self._papers.move_to_end(paper_id)
+            self._meta[paper_id][1] += 1
+            result = {'paperId': paper_id}
+            for field in fields:
+                key = top_level(field)
+                if key in record:
+                    result[key] = record[key]
+            return result
+
+    def held(self, paper_id: str, fields: List[str]) -> Optional[Dict]:
+        """返回所请求字段中已持有部分的记录副本（字段可能不全），未知论文返回 None"""
+        paper_id = self.resolve(paper_id)
+        with self._lock:
+            record = self._papers.get(paper_id)
+            if record is None:
+                return None
+            held = self._fields[paper_id]
+            return {'paperId': paper_id, **{top_level(f): record.get(top_level(f)) for f in fields if f in held}}
+
+    def freshness(self, paper_id: str) -> Optional[Tuple[float, int, List[str]]]:
+        """返回 (距最近一次写入的秒数, 访问次数, 已持有的字段)，未知论文返回 None"""
+        paper_id = self.resolve(paper_id)
+        with self._lock:
+            meta = self._meta.get(paper_id)
+            if meta is None:
+                return None
+            return time.time() - meta[0], int(meta[1]), sorted(self._fields[paper_id])
+
+    def clear(self):
+        with self._lock:
+            self._papers.clear()
+            self._fields.clear()
+            self._meta.clear()
+            self._aliases.clear()
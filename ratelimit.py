@@ -0,0 +1,207 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+from loguru import logger
+
+# 各上游的默认速率：(每秒请求数, 突发容量)
+# Semantic Scholar 官方 API 对单个 key 的限制约为 1 次/秒
+DEFAULT_RATE_LIMITS = {
+    'api.semanticscholar.org': (1.0, 1),
+    'lifuai.com': (5.0, 5),
+}
+FALLBACK_RATE_LIMIT = (5.0, 5)
+
+
+def default_rate_limit(base_url: str, api_key: str = "") -> Tuple[float, int]:
+    """根据 base_url（以及是否有 api key）返回默认的 (rate, burst)"""
+    host = urlparse(base_url).hostname or ''
+    for domain, limit in DEFAULT_RATE_LIMITS.items():
+        if host == domain or host.endswith('.' + domain):
+            if domain == 'api.semanticscholar.org' and not api_key:
+                # 无 key 时与所有匿名用户共享配额，保守一些
+                return 0.5, 1
+            return limit
+    return FALLBACK_RATE_LIMIT
+
+
+class AdaptiveRateLimiter:
+    """
+    令牌桶限流器，所有工具调用共享
+    - asyncio.Lock 按到达顺序排队，保证各调用之间公平
+    - 收到 429 时速率减半（乘性减），冷却期后每次成功缓慢回升（加性增）
+    """
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = None,
+                 recovery_step: float = None, cooldown: float = 10.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.recovery_step = recovery_step if recovery_step is not None else rate * 0.05
+        self.cooldown = cooldown
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.last_throttle = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, timeout: float = None) -> Optional[float]:
+        """
+        取得一个令牌，返回排队等待的秒数
+        若预计等待超过 timeout，则不消耗令牌并返回 None
+        """
+        start = time.monotonic()
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                if timeout is not None and (time.monotonic() - start) + wait > timeout:
+                    return None
+                await asyncio.sleep(wait)
+                self._refill()
+            self.tokens -= 1
+        return time.monotonic() - start
+
+    def on_throttle(self):
+        """上游返回 429：降低速率并清空令牌"""
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+        self.last_throttle = time.monotonic()
+
+    def on_success(self):
+        """请求成功：冷却期过后逐步恢复速率"""
+        if self.rate < self.max_rate and time.monotonic() - self.last_throttle >= self.cooldown:
+            self.rate = min(self.max_rate, self.rate + self.recovery_step)
+
+
+class SharedRateLimiter:
+    """
+    多进程共享的令牌桶（SQLite WAL），同一台机器上的多个 worker 共同遵守一个上游配额
+    - 预约式：取令牌时直接扣减（可以欠账），按欠账计算需要等待的时间，每次只需一个短事务
+    - 收到 429 时共享速率减半，冷却期后每次成功缓慢回升，与 AdaptiveRateLimiter 相同
+    """
+
+    def __init__(self, path: str, name: str, rate: float, burst: int = 1, min_rate: float = None,
+                 recovery_step: float = None, cooldown: float = 10.0, busy_timeout: float = 10.0):
+        self.path = path
+        self.name = name
+        self.max_rate = rate
+        self.capacity = max(1, burst)
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.recovery_step = recovery_step if recovery_step is not None else rate * 0.05
+        self.cooldown = cooldown
+        self.busy_timeout = busy_timeout
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                max_rate REAL NOT NULL,
+                rate REAL NOT NULL,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                last_throttle REAL NOT NULL
+            )
+        ''')
+        # 已有的桶沿用当前速率（可能处于 429 后的降速状态），配置的上限变化时重置
+        self._conn.execute(
+            '''INSERT INTO buckets (name, max_rate, rate, tokens, updated_at, last_throttle)
+               VALUES (?, ?, ?, ?, ?, 0)
+               ON CONFLICT(name) DO UPDATE SET max_rate = excluded.max_rate, rate = excluded.rate
+               WHERE buckets.max_rate != excluded.max_rate''',
+            (name, rate, rate, float(self.capacity), time.time()))
+        self._rate = self._read_rate()
+
+    def _read_rate(self) -> float:
+        return self._conn.execute('SELECT rate FROM buckets WHERE name = ?', (self.name,)).fetchone()[0]
+
+    @property
+    def rate(self) -> float:
+        """最近一次预约或调整时读到的共享速率；不访问数据库，可以在事件循环中调用"""
+        return self._rate
+
+    def _reserve(self, timeout: Optional[float]) -> Optional[float]:
+        """
+        预约一个令牌，返回需要等待的秒数；预计等待超过 timeout 时不预约并返回 None
+        在线程中执行：BEGIN IMMEDIATE 可能要等待其他进程释放写锁，最多等待 busy_timeout（不超过 timeout），
+        超时则抛出 sqlite3.OperationalError
+        """
+        busy_timeout = self.busy_timeout if timeout is None else min(self.busy_timeout, max(0.0, timeout))
+        with self._lock:
+            self._conn.execute(f'PRAGMA busy_timeout = {int(busy_timeout * 1000)}')
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rate, tokens, updated_at = self._conn.execute(
+                    'SELECT rate, tokens, updated_at FROM buckets WHERE name = ?', (self.name,)).fetchone()
+                self._rate = rate
+                now = time.time()
+                tokens = min(self.capacity, tokens + max(0.0, now - updated_at) * rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+                if timeout is not None and wait > timeout:
+                    return None
+                self._conn.execute('UPDATE buckets SET tokens = ?, updated_at = ? WHERE name = ?',
+                                   (tokens - 1, now, self.name))
+                return wait
+            finally:
+                self._conn.execute('COMMIT')
+
+    async def acquire(self, timeout: float = None) -> Optional[float]:
+        """
+        取得一个令牌，返回排队等待的秒数
+        若预计等待超过 timeout，则不消耗令牌并返回 None；共享库被其他进程锁住时抛出 sqlite3.OperationalError
+        """
+        start = time.monotonic()
+        wait = await asyncio.to_thread(self._reserve, timeout)
+        if wait is None:
+            return None
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return time.monotonic() - start
+
+    def _update(self, sql: str, params: Tuple):
+        """调整共享速率；写锁被占用时放弃本次调整，只影响恢复快慢，不影响调用本身"""
+        with self._lock:
+            try:
+                self._conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}')
+                self._conn.execute(sql, params)
+                self._rate = self._read_rate()
+            except sqlite3.OperationalError as e:
+                logger.warning(f"共享限流器更新失败: {e}")
+
+    def _submit(self, sql: str, params: Tuple):
+        """在事件循环中调用时交给线程执行，避免等待写锁时阻塞事件循环"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._update(sql, params)
+            return
+        loop.run_in_executor(None, self._update, sql, params)
+
+    def on_throttle(self):
+        """上游返回 429：降低共享速率并清空令牌"""
+        self._submit(
+            '''UPDATE buckets SET rate = MAX(?, rate / 2), tokens = MIN(tokens, 0.0), last_throttle = ?
+               WHERE name = ?''', (self.min_rate, time.time(), self.name))
+
+    def on_success(self):
+        """请求成功：冷却期过后逐步恢复共享速率"""
+        self._submit(
+            '''UPDATE buckets SET rate = MIN(max_rate, rate + ?)
+               WHERE name = ? AND rate < max_rate AND ? - last_throttle >= ?''',
+            (self.recovery_step, self.name, time.time(), self.cooldown))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
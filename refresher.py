@@ -0,0 +1,208 @@
+import asyncio
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from cache import endpoint_kind
+from metrics import REFRESHES
+from paper_store import parse_fields
+from resilience import clear_deadline, deadline
+
+# 单篇论文接口的前缀；这类条目合并成 paper/batch 请求刷新
+PAPER_ENDPOINT = 'graph/v1/paper/'
+BATCH_ENDPOINT = 'graph/v1/paper/batch'
+
+
+class RefreshJob:
+    """一个待刷新的条目：单篇论文（paper_id 不为空）或一次原样重发的请求"""
+    __slots__ = ('key', 'priority', 'seq', 'paper_id', 'fields', 'cache_key', 'endpoint', 'params', 'method',
+                 'data')
+
+    def __init__(self, key: str, priority: int, seq: int, paper_id: str = None, fields: str = None,
+                 cache_key: str = None, endpoint: str = None, params: Dict = None, method: str = 'GET',
+                 data: Dict = None):
+        self.key = key
+        self.priority = priority
+        self.seq = seq
+        self.paper_id = paper_id
+        self.fields = fields
+        self.cache_key = cache_key
+        self.endpoint = endpoint
+        self.params = params
+        self.method = method
+        self.data = data
+
+
+class BackgroundRefresher:
+    """
+    stale-while-revalidate：过期的缓存数据照常返回，由有界的后台任务重新获取
+    - 待刷新队列有上限，按访问次数排优先级，满了丢弃优先级最低的任务；同一条目只排队一次
+    - 单篇论文按字段分组，合并成 graph/v1/paper/batch 请求（每次最多 batch_size 个 ID），
+      结果写回响应缓存与论文库
+    - 其他接口（搜索、参考文献分页、batch）按原请求重新获取后写回缓存
+    - 多 worker 共享缓存时通过缓存租约避免多个进程刷新同一条目
+    """
+
+    def __init__(self, scholar, concurrency: int = 2, max_pending: int = 1000, batch_size: int = 500,
+                 linger: float = 0.05, timeout: float = 60):
+        self.scholar = scholar
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.linger = linger
+        self.timeout = timeout
+        self._pending: Dict[str, RefreshJob] = {}
+        self._running = set()
+        self._workers: List[asyncio.Task] = []
+        self._seq = itertools.count()
+
+    def schedule_paper(self, paper_id: str, fields: str, priority: int = 0, cache_key: str = None):
+        """刷新一篇论文的这些字段；cache_key 为对应的 paper/{id} 缓存条目（可选）"""
+        fields = ','.join(sorted(parse_fields(fields)))
+        self._enqueue(RefreshJob(f'paper:{paper_id}:{fields}', priority, next(self._seq), paper_id=paper_id,
+                                 fields=fields, cache_key=cache_key))
+
+    def schedule_request(self, cache_key: str, endpoint: str, params: Dict = None, method: str = 'GET',
+                         data: Dict = None, priority: int = 0):
+        """刷新一个响应缓存条目；单篇论文接口转为论文刷新以便合并成 batch 请求"""
+        endpoint = endpoint.strip('/')
+        if (method.upper() == 'GET' and endpoint.startswith(PAPER_ENDPOINT) and endpoint_kind(endpoint) == 'paper'
+                and set(params or {}) <= {'fields'}):
+            paper_id = endpoint[len(PAPER_ENDPOINT):]
+            self.schedule_paper(paper_id, (params or {}).get('fields') or 'title', priority, cache_key=cache_key)
+            return
+        self._enqueue(RefreshJob(f'request:{cache_key}', priority, next(self._seq), cache_key=cache_key,
+                                 endpoint=endpoint, params=params, method=method.upper(), data=data))
+
+    def _enqueue(self, job: RefreshJob):
+        if job.key in self._running:
+            return
+        queued = self._pending.get(job.key)
+        if queued is not None:
+            queued.priority = max(queued.priority, job.priority)
+            return
+        if len(self._pending) >= self.max_pending:
+            lowest = min(self._pending.values(), key=lambda j: (j.priority, -j.seq))
+            if lowest.priority >= job.priority:
+                REFRESHES.inc(kind=self._kind(job), outcome='dropped')
+                return
+            del self._pending[lowest.key]
+            REFRESHES.inc(kind=self._kind(lowest), outcome='dropped')
+        self._pending[job.key] = job
+        self._workers = [task for task in self._workers if not task.done()]
+        if len(self._workers) < self.concurrency:
+            self._workers.append(asyncio.ensure_future(self._work()))
+
+    @staticmethod
+    def _kind(job: RefreshJob) -> str:
+        return 'paper' if job.paper_id else 'request'
+
+    def _take(self) -> List[RefreshJob]:
+        """取出优先级最高的任务；论文任务连同同一字段组里优先级最高的其他论文一起取出"""
+        first = max(self._pending.values(), key=lambda j: (j.priority, -j.seq))
+        if first.paper_id is None:
+            jobs = [first]
+        else:
+            group = [j for j in self._pending.values() if j.paper_id is not None and j.fields == first.fields]
+            group.sort(key=lambda j: (-j.priority, j.seq))
+            jobs = group[:self.batch_size]
+        for job in jobs:
+            del self._pending[job.key]
+            self._running.add(job.key)
+        return jobs
+
+    async def _work(self):
+        clear_deadline()
+        # 稍等片刻，让同一批触发的论文刷新合并到一个 batch 请求里
+        await asyncio.sleep(self.linger)
+        while self._pending:
+            jobs = self._take()
+            try:
+                with deadline(self.timeout):
+                    if jobs[0].paper_id is None:
+                        await self._refresh_request(jobs[0])
+                    else:
+                        await self._refresh_papers(jobs)
+            except Exception as e:
+                logger.warning(f"后台刷新失败: {e!r}")
+                REFRESHES.inc(len(jobs), kind=self._kind(jobs[0]), outcome='failed')
+            finally:
+                for job in jobs:
+                    self._running.discard(job.key)
+
+    async def _claim(self, cache_key: Optional[str]) -> bool:
+        cache = self.scholar.cache
+        if cache_key is None or cache is None or not self.scholar.shared_cache:
+            return True
+        return await asyncio.to_thread(cache.claim, cache_key, ttl=self.timeout)
+
+    async def _release(self, cache_key: Optional[str]):
+        if cache_key is not None and self.scholar.shared_cache:
+            await asyncio.to_thread(self.scholar.cache.release, cache_key)
+
+    async def _refresh_request(self, job: RefreshJob):
+        if not await self._claim(job.cache_key):
+            REFRESHES.inc(kind='request', outcome='skipped')
+            return
+        try:
+            result = await self.scholar._fetch(job.endpoint, params=job.params, method=job.method, data=job.data)
+            if result and self.scholar.cache is not None:
+                await asyncio.to_thread(self.scholar.cache.set, job.cache_key, job.endpoint, result)
+        finally:
+            await self._release(job.cache_key)
+        REFRESHES.inc(kind='request', outcome='ok' if result else 'failed')
+
+    async def _refresh_papers(self, jobs: List[RefreshJob]):
+        claimed = [job for job in jobs if await self._claim(job.cache_key)]
+        if len(claimed) < len(jobs):
+            REFRESHES.inc(len(jobs) - len(claimed), kind='paper', outcome='skipped')
+        if not claimed:
+            return
+        fields = claimed[0].fields
+        try:
+            papers = await self.scholar._fetch(BATCH_ENDPOINT, params={'fields': fields}, method='POST',
+                                               data={'ids': [job.paper_id for job in claimed]})
+            if not isinstance(papers, list) or len(papers) != len(claimed):
+                REFRESHES.inc(len(claimed), kind='paper', outcome='failed')
+                return
+            await self._store_papers(claimed, papers, fields)
+        finally:
+            for job in claimed:
+                await self._release(job.cache_key)
+        refreshed = sum(1 for paper in papers if paper)
+        REFRESHES.inc(refreshed, kind='paper', outcome='ok')
+        if refreshed < len(claimed):
+            REFRESHES.inc(len(claimed) - refreshed, kind='paper', outcome='failed')
+
+    async def _store_papers(self, jobs: List[RefreshJob], papers: List[Optional[Dict[str, Any]]], fields: str):
+        scholar = self.scholar
+        field_list = parse_fields(fields)
+        entries = []
+        for job, paper in zip(jobs, papers):
+            if not paper:
+                continue
+            if scholar.paper_store is not None:
+                scholar.paper_store.put(paper, field_list, alias=job.paper_id)
+            if job.cache_key is not None and scholar.cache is not None:
+                entries.append((job.cache_key, PAPER_ENDPOINT + job.paper_id, paper))
+        if entries:
+            await asyncio.to_thread(self._cache_papers, entries)
+        if scholar.title_index is not None:
+            scholar.index_titles(papers)
+
+    def _cache_papers(self, entries: List[Tuple[str, str, Dict[str, Any]]]):
+        for cache_key, endpoint, paper in entries:
+            self.scholar.cache.set(cache_key, endpoint, paper)
+
+    def stats(self) -> Dict[str, int]:
+        return {'pending': len(self._pending), 'running': len(self._running),
+                'workers': sum(1 for task in self._workers if not task.done())}
+
+    async def close(self):
+        """取消尚未完成的刷新"""
+        self._pending.clear()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+# 可重试的 HTTP 状态码：超时、限流以及上游临时故障；其余 4xx 属于永久错误
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class RetryPolicy:
+    """重试策略：错误分类 + 带抖动的指数退避 + 遵循 Retry-After"""
+
+    def __init__(self, max_attempts: int = 6, base_delay: float = 0.5, max_delay: float = 20.0,
+                 max_retry_after: float = 60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        return status_code in RETRYABLE_STATUS
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间（full jitter）"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def retry_after(self, response: 'httpx.Response') -> Optional[float]:
+        """解析 Retry-After 头（秒数或 HTTP 日期），无法解析时返回 None"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(seconds, 0.0), self.max_retry_after)
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后打开，打开期间直接快速失败；
+    冷却时间过后进入半开状态，放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            # 半开状态只允许一个探测请求
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    @property
+    def ready(self) -> bool:
+        """allow() 是否可能放行，但不占用半开状态的探测名额"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return not self._probing
+
+    def release(self):
+        """探测请求被取消、没有得到结果时归还探测名额"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+# 当前工具调用的截止时间（time.monotonic），随 asyncio 任务上下文传递
+_deadline: ContextVar[Optional[float]] = ContextVar('scholar_deadline', default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """为当前调用设置总截止时间；嵌套时取更早的那个"""
+    if not seconds or seconds <= 0:
+        yield
+        return
+    new_deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        new_deadline = min(current, new_deadline)
+    token = _deadline.set(new_deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """距截止时间的剩余秒数，未设置截止时间时返回 None"""
+    current = _deadline.get()
+    if current is None:
+        return None
+    return current - time.monotonic()
+
+
+def clear_deadline():
+    """后台任务不继承触发它的工具调用的截止时间（只影响当前任务的上下文副本）"""
+    _deadline.set(None)
@@ -0,0 +1,174 @@
+import copy
+import json
+from typing import Any, Dict, List, Optional
+
+# orjson 为可选依赖，安装后序列化更快、分配更少
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from paper_store import parse_fields, top_level
+
+# 估算 token 数时按每个 token 约 4 字节计算
+BYTES_PER_TOKEN = 4
+# 超出预算时摘要依次截断到的长度（0 表示去掉摘要）
+ABSTRACT_LIMITS = (1000, 300, 0)
+# 超出预算时可以从末尾截断的顶层结果列表
+RESULT_LISTS = ('data', 'references', 'citations', 'results', 'related', 'nodes', 'edges')
+
+
+def dumps(obj: Any, compact: bool = False) -> str:
+    """序列化为 JSON 字符串：compact=True 时输出无空白的紧凑格式，否则缩进 2 格"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=0 if compact else orjson.OPT_INDENT_2).decode('utf-8')
+    if compact:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+
+def _byte_size(obj: Any, compact: bool) -> int:
+    if orjson is not None:
+        return len(orjson.dumps(obj, option=0 if compact else orjson.OPT_INDENT_2))
+    return len(dumps(obj, compact).encode('utf-8'))
+
+
+def _is_paper(obj: Any) -> bool:
+    return isinstance(obj, dict) and 'paperId' in obj
+
+
+def _project(record: Dict, fields: List[str]) -> Dict:
+    """只保留所请求的字段；authors.name 之类的嵌套字段作用于子对象"""
+    # 顶层键 -> 子字段列表；None 表示保留整个值
+    nested: Dict[str, Optional[List[str]]] = {}
+    for field in fields:
+        key, _, rest = field.partition('.')
+        if not rest:
+            nested[key] = None
+        elif nested.get(key, []) is not None:
+            nested.setdefault(key, []).append(rest)
+    result = {'paperId': record['paperId']} if 'paperId' in record else {}
+    for key, sub_fields in nested.items():
+        if key not in record:
+            continue
+        value = record[key]
+        if sub_fields:
+            if isinstance(value, list):
+                value = [_project(item, sub_fields) if isinstance(item, dict) else item for item in value]
+            elif isinstance(value, dict):
+                value = _project(value, sub_fields)
+        result[key] = value
+    return result
+
+
+def project_fields(obj: Any, fields: List[str]) -> Any:
+    """对结果中的每条论文记录（含 paperId 的字典）做字段投影，其余结构保持不变"""
+    if _is_paper(obj):
+        return _project(obj, fields)
+    if isinstance(obj, dict):
+        return {key: project_fields(value, fields) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [project_fields(item, fields) for item in obj]
+    return obj
+
+
+def _walk_papers(obj: Any):
+    if _is_paper(obj):
+        yield obj
+    if isinstance(obj, dict):
+        for value in obj.values():
+            yield from _walk_papers(value)
+    elif isinstance(obj, list):
+        for item in obj:
+            yield from _walk_papers(item)
+
+
+def _paper_lists(obj: Any):
+    """
+    找出可以截断的结果列表：顶层本身是列表，或顶层字典中 RESULT_LISTS 里的键
+    论文记录内部的列表（authors、嵌套的 references 等）属于记录本身，截断会破坏记录，因此不在其列
+    """
+    if isinstance(obj, list):
+        yield '', obj
+    elif isinstance(obj, dict):
+        for key in RESULT_LISTS:
+            value = obj.get(key)
+            if isinstance(value, list):
+                yield key, value
+
+
+def fit_to_budget(obj: Any, max_bytes: int, compact: bool = False) -> Any:
+    """
+    确定性地缩减结果直到序列化后不超过 max_bytes：
+    1. 依次把摘要截断到 ABSTRACT_LIMITS 中的长度
+    2. 已有 gbt7714 的记录去掉 citationStyles
+    3. 反复把最长的顶层结果列表（见 _paper_lists）从末尾截掉四分之一
+    顶层为字典时在 truncated 字段中记录截断情况
+    """
+    if _byte_size(obj, compact) <= max_bytes:
+        return obj
+    obj = copy.deepcopy(obj)
+    notes: Dict[str, Any] = {}
+
+    def fits() -> bool:
+        if isinstance(obj, dict):
+            obj['truncated'] = notes
+        return _byte_size(obj, compact) <= max_bytes
+
+    for limit in ABSTRACT_LIMITS:
+        for paper in _walk_papers(obj):
+            abstract = paper.get('abstract')
+            if not abstract:
+                continue
+            if limit == 0:
+                del paper['abstract']
+            elif len(abstract) > limit:
+                paper['abstract'] = abstract[:limit] + '…'
+        notes['abstract_max_chars'] = limit
+        if fits():
+            return obj
+
+    for paper in _walk_papers(obj):
+        if paper.get('gbt7714'):
+            paper.pop('citationStyles', None)
+    notes['citation_styles_removed'] = True
+    if fits():
+        return obj
+
+    omitted: Dict[str, int] = {}
+    notes['omitted_items'] = omitted
+    while True:
+        candidates = [(len(items), path, items) for path, items in _paper_lists(obj) if items]
+        if not candidates:
+            break
+        _, path, items = max(candidates, key=lambda c: c[0])
+        keep = len(items) * 3 // 4
+        omitted[path] = omitted.get(path, 0) + len(items) - keep
+        del items[keep:]
+        if fits():
+            return obj
+    return obj
+
+
+def render_response(obj: Any, fields: str = '', compact: bool = False, max_bytes: int = 0,
+                    max_tokens: int = 0) -> str:
+    """
+    按输出选项把工具结果序列化为字符串
+    - fields: 逗号分隔的字段投影（作用于每条论文记录，始终保留 paperId）
+    - compact: 紧凑（无缩进）输出
+    - max_bytes / max_tokens: 输出大小预算，超出时按 fit_to_budget 的规则截断
+    """
+    field_list = parse_fields(fields)
+    if field_list:
+        obj = project_fields(obj, field_list)
+    budgets = [b for b in (max_bytes, max_tokens * BYTES_PER_TOKEN) if b and b > 0]
+    if budgets:
+        obj = fit_to_budget(obj, min(budgets), compact=compact)
+    return dumps(obj, compact=compact)
+
+
+def upstream_fields(fields: str, default: Optional[str] = None, computed=('gbt7714',)) -> Optional[str]:
+    """把输出投影转换为上游 fields 参数（去掉本地计算的字段），没有投影时返回 default"""
+    keys = [top_level(f) for f in parse_fields(fields)]
+    field_list = [k for k in dict.fromkeys(keys) if k not in computed and k != 'paperId']
+    return ','.join(field_list) if field_list else default
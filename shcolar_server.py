@@ -1,64 +1,362 @@
-import requests
+import argparse
+import asyncio
+import atexit
 import json
-import time
 import os
-from typing import List, Dict, Any
+import re
+import sqlite3
+import sys
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, AsyncIterator, Awaitable, Callable, Tuple
 from loguru import logger
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
 
 # 初始化 MCP Server
 mcp = FastMCP("Scholar Search Service")
 
 from utils import bibtex_to_gbt7714
+from bulk_convert import convert_entries, convert_file, iter_bibtex_entries, shared_pool
+from response_format import dumps, project_fields, render_response, upstream_fields
+from cache import ResponseCache, DEFAULT_CACHE_DIR, DEFAULT_TTLS, make_cache_key
+from paper_store import PaperStore, parse_fields, top_level
+from singleflight import SingleFlight, coalesce
+from resilience import RetryPolicy, CircuitBreaker, deadline, remaining
+from ratelimit import AdaptiveRateLimiter, SharedRateLimiter, default_rate_limit
+from backends import Attempt, Backend, hedged, parse_backends, rank_backends
+from offline_index import OfflineIndex
+from title_index import TitleIndex, normalize_title, title_similarity
+from refresher import BackgroundRefresher
+from metrics import (REGISTRY, UPSTREAM_LATENCY, UPSTREAM_RETRIES, UPSTREAM_ERRORS, UPSTREAM_HEDGES,
+                     CACHE_REQUESTS, RATE_LIMIT_WAIT, normalize_endpoint, record_cache, cache_hit_ratios, stage,
+                     track_tool)
+
+# 进度回调：progress(stage, data)
+ProgressCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+def looks_like_paper_id(value: str) -> bool:
+    """判断字符串是否为 Semantic Scholar paperId 或带前缀的外部 ID（DOI:、ARXIV: 等）"""
+    if len(value) == 40 and all(c in '0123456789abcdef' for c in value.lower()):
+        return True
+    prefix = value.split(':', 1)[0].upper()
+    return ':' in value and prefix in ('DOI', 'ARXIV', 'CORPUSID', 'MAG', 'ACL', 'PMID', 'PMCID', 'URL')
+
+
+_DOI = re.compile(r'10\.\d{4,9}/\S+', re.IGNORECASE)
+# 参考文献列表中的编号前缀：[12]、12.、(12) 等
+# 纯数字编号后必须有空白，避免吃掉裸 DOI 开头的 "10."
+_REFERENCE_NUMBER = re.compile(r'^\s*(?:\[\d+\]\s*|\(\d+\)\s*|\d+[.)]\s+)')
+
+
+def parse_reference(item: str) -> Optional[tuple]:
+    """
+    把一行参考文献输入规范化为 (类型, 查询)：
+    - ('id', 'DOI:10.x/y')：含 DOI（doi.org 链接、doi: 前缀均可）时直接按 DOI 查询，DOI 转为小写
+    - ('id', paperId)：Semantic Scholar paperId 或带前缀的外部 ID
+    - ('title', 标题)：其余按标题检索，去掉编号前缀与首尾标点
+    空输入返回 None
+    """
+    # 先在原始输入中找 DOI，再去掉编号前缀
+    doi = _DOI.search(item or '')
+    if doi:
+        return 'id', 'DOI:' + doi.group().rstrip('.,;)]}').lower()
+    text = _REFERENCE_NUMBER.sub('', item or '').strip()
+    if not text:
+        return None
+    if ' ' not in text and looks_like_paper_id(text):
+        return 'id', text
+    title = text.strip(' .,;"\'“”')
+    return ('title', title) if normalize_title(title) else None
+
+
+def reference_key(entry: tuple) -> str:
+    """parse_reference 结果的去重键：ID 不区分大小写，标题按规范化后的形式"""
+    return entry[1].lower() if entry[0] == 'id' else normalize_title(entry[1])
 
 
 # --- Scholar 类定义 (主要逻辑保持不变，移除了pdb和部分print) ---
 class Scholar:
     """学术论文搜索与分析类"""
+
+    # 上游接口限制：batch 每次最多 500 个 ID，references/citations 每页最多 1000 条
+    BATCH_MAX_IDS = 500
+    EDGE_PAGE_MAX = 1000
+    # get_references_info 中主论文的字段（referenceCount 用于并发预取参考文献分页）
+    MAIN_PAPER_FIELDS = 'title,authors,year,abstract,citationCount,referenceCount,venue,openAccessPdf,citationStyles'
+    # 引用图爬取时每个节点保留的字段
+    CRAWL_NODE_FIELDS = 'title,authors,year,venue,citationCount'
+    # 推送进度时每块参考文献的数量（与 references 接口默认页大小一致）
+    REFERENCE_CHUNK = 100
+    # 本地引用图查询时每个方向最多获取的引用关系数（上游分页的 offset 上限约为 10000）
+    GRAPH_EDGE_LIMIT = 9000
+    # related 查询第二跳最多补齐的论文数
+    GRAPH_HOP_LIMIT = 500
+    # 批量解析参考文献时获取的详情字段
+    BIBLIOGRAPHY_FIELDS = 'title,authors,year,venue,journal,externalIds,citationCount,citationStyles'
+    # 批量解析参考文献时为 batch 获取详情预留的秒数：剩余时间不足时不再发起新的标题检索
+    BIBLIOGRAPHY_BATCH_RESERVE = 5.0
     
-    def __init__(self, api_key: str="", base_url: str = "https://lifuai.com/api/v1"):
+    def __init__(self, api_key: str="", base_url: str = "https://lifuai.com/api/v1",
+                 max_connections: int = 20, max_keepalive_connections: int = 10, timeout: float = 30,
+                 cache: Optional[ResponseCache] = None, paper_store: Optional[PaperStore] = None,
+                 coalesce_requests: bool = True, retry_policy: Optional[RetryPolicy] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None, batch_concurrency: int = 4,
+                 offline_index: Optional[OfflineIndex] = None, title_index: Optional[TitleIndex] = None,
+                 backends: Optional[List[Backend]] = None, hedge_percentile: float = 0.9,
+                 hedge_min_delay: float = 0.05, max_hedges: int = 1, shared_cache: bool = False,
+                 background_refresh: bool = False, refresh_concurrency: int = 2, paper_max_age: float = None,
+                 citation_graph: Optional['CitationGraph'] = None):
         self.api_key = api_key
-        self.base_url = base_url
-        
-        # 简单的逻辑判断 base_url
-        if "lifuai" in self.base_url or "api.semanticscholar.org" in self.base_url:
-            self.headers = {
-                'Content-Type': 'application/json'
-            }
-            if self.api_key:
-                self.headers['Authorization'] = f'Bearer {self.api_key}'
-            # 对于官方 semantic scholar，有时使用的是 x-api-key
-            if "semanticscholar.org" in self.base_url and self.api_key:
-                 self.headers['x-api-key'] = self.api_key
-        else:
-            self.headers = None
+        # 上游列表：未指定时只使用 base_url；多个上游时按健康分选择，慢请求向下一个上游发出对冲请求
+        self.backends = backends or [Backend(base_url, api_key, circuit_breaker=circuit_breaker,
+                                             rate_limiter=rate_limiter)]
+        self.base_url = self.backends[0].base_url
+        self.headers = self.backends[0].headers
+        # 对冲时机：等待超过首选上游最近延迟的该分位数（不短于 hedge_min_delay 秒）
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.max_hedges = max_hedges
+
+        # 连接池配置：所有 MCP 会话共享同一组 keep-alive 连接
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self._client: Optional['httpx.AsyncClient'] = None
+        # 本地持久化响应缓存（可选）
+        self.cache = cache
+        # 缓存由多个 worker 进程共享时，通过缓存中的租约合并各进程对同一数据的回源
+        self.shared_cache = shared_cache and cache is not None
+        # 按 paperId 合并字段的内存论文库（可选）
+        self.paper_store = paper_store
+        # 并发的相同调用合并为一次上游请求
+        self.single_flight = SingleFlight() if coalesce_requests else None
+        # 失败处理：重试策略与熔断器
+        self.retry_policy = retry_policy or RetryPolicy()
+        # 首选上游的熔断器与限流器（每个上游各有一组，所有 MCP 会话共享）
+        self.circuit_breaker = self.backends[0].circuit_breaker
+        self.rate_limiter = self.backends[0].rate_limiter
+        # batch 分块请求的并发数
+        self.batch_concurrency = batch_concurrency
+        # 由批量数据集构建的本地离线索引（可选），查询时优先使用
+        self.offline_index = offline_index
+        # 持久化的 标题 -> paperId 解析索引（可选），由搜索与 batch 响应自动填充
+        self.title_index = title_index
+        self._title_flush: Optional[asyncio.Task] = None
+        # 后台刷新（stale-while-revalidate）：缓存过期后先返回旧数据，再由后台批量重新获取
+        self.refresher = BackgroundRefresher(self, concurrency=refresh_concurrency) if background_refresh else None
+        # 论文库中的记录超过该时间（秒）即在命中后安排后台刷新
+        self.paper_max_age = paper_max_age if paper_max_age is not None else DEFAULT_TTLS['batch']
+        # 本地引用图（可选）：由 references/citations 响应与带引用字段的 batch 响应自动填充
+        self.citation_graph = citation_graph
+
+    @property
+    def client(self) -> 'httpx.AsyncClient':
+        """延迟创建的异步 HTTP 客户端（持久连接池）；httpx 在首次请求时才导入，不计入启动时间"""
+        if self._client is None or self._client.is_closed:
+            import httpx
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_keepalive_connections, keepalive_expiry=30)
+            self._client = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        return self._client
+
+    async def aclose(self):
+        """停止后台刷新，把引用图增量写入磁盘并关闭连接池"""
+        if self.refresher is not None:
+            await self.refresher.close()
+        if self._title_flush is not None:
+            await self._title_flush
+        if self.citation_graph is not None:
+            await asyncio.to_thread(self.citation_graph.close)
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
     
-    def _make_request(self, endpoint: str, params: Dict = None, method: str = 'GET', data: Dict = None) -> Dict:
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
-        count = 0
-        while count <= 10: # 减少重试次数以提高响应速度
-            count += 1
-            try:
-                if method.upper() == 'GET':
-                    response = requests.get(url, params=params, headers=self.headers, timeout=30)
-                elif method.upper() == 'POST':
-                    response = requests.post(url, params=params, json=data, headers=self.headers, timeout=30)
-                else:
-                    raise ValueError(f"不支持的HTTP方法: {method}")
-                
-                response.raise_for_status()
-                return response.json()
-            except requests.exceptions.RequestException as e:
-                logger.error(f"API请求失败 (尝试 {count}): {e}")
-                time.sleep(1)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON解析失败: {e}")
-                time.sleep(1)
-        
-        logger.error("最终请求失败") 
+    async def _make_request(self, endpoint: str, params: Dict = None, method: str = 'GET', data: Dict = None,
+                            refresh: bool = False) -> Dict:
+        """
+        发送请求；启用缓存时先查本地缓存，refresh=True 时跳过读取并用新结果覆盖缓存
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_cache_key(method, endpoint, params, data)
+            if not refresh:
+                cached, stale, hits = await asyncio.to_thread(self.cache.lookup, cache_key,
+                                                              allow_stale=self.refresher is not None)
+                if cached is not None and stale:
+                    # 宽限期内的旧数据直接返回，由后台任务刷新
+                    CACHE_REQUESTS.inc(cache='response', result='stale')
+                    self.refresher.schedule_request(cache_key, endpoint, params, method, data, priority=hits)
+                    return cached
+                record_cache('response', cached is not None)
+                if cached is not None:
+                    return cached
+        leased = False
+        if cache_key is not None and self.shared_cache and not refresh:
+            # 多 worker 共享缓存：同一请求只由一个进程回源，其他进程等它写入缓存
+            leased = await asyncio.to_thread(self.cache.claim, cache_key, ttl=self.timeout * 2)
+            if not leased:
+                shared = await self.cache.wait_for(cache_key, timeout=remaining())
+                record_cache('shared', shared is not None)
+                if shared is not None:
+                    return shared
+        try:
+            result = await self._fetch(endpoint, params=params, method=method, data=data)
+            if cache_key is not None and result:
+                await asyncio.to_thread(self.cache.set, cache_key, endpoint, result)
+        finally:
+            if leased:
+                await asyncio.to_thread(self.cache.release, cache_key)
+        return result
+
+    async def _fetch(self, endpoint: str, params: Dict = None, method: str = 'GET', data: Dict = None) -> Dict:
+        method = method.upper()
+        if method not in ('GET', 'POST'):
+            raise ValueError(f"不支持的HTTP方法: {method}")
+        label = normalize_endpoint(endpoint)
+        if not rank_backends(self.backends):
+            logger.error(f"上游服务熔断中，快速失败: {endpoint}")
+            UPSTREAM_ERRORS.inc(endpoint=label, status='circuit_open')
+            return {}
+
+        def on_hedge(backend: Backend, reason: str):
+            UPSTREAM_HEDGES.inc(endpoint=label, backend=backend.name, outcome=reason)
+
+        async def send(backend: Backend) -> Attempt:
+            return await self._send(backend, endpoint, label, method, params, data, attempt)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            time_left = remaining()
+            if time_left is not None and time_left <= 0:
+                logger.error(f"超出调用截止时间，放弃请求: {endpoint}")
+                UPSTREAM_ERRORS.inc(endpoint=label, status='deadline')
+                return {}
+            backends = rank_backends(self.backends)
+            if not backends:
+                logger.error(f"上游服务熔断，停止重试: {endpoint}")
+                return {}
+            outcome = await hedged(backends, send, percentile=self.hedge_percentile, min_delay=self.hedge_min_delay,
+                                   max_hedges=self.max_hedges, on_hedge=on_hedge)
+            if outcome.ok:
+                if outcome.backend is not backends[0]:
+                    UPSTREAM_HEDGES.inc(endpoint=label, backend=outcome.backend.name, outcome='won')
+                return outcome.result
+            if not outcome.retryable or attempt >= self.retry_policy.max_attempts:
+                break
+            if not any(backend.available for backend in self.backends):
+                logger.error(f"上游服务熔断，停止重试: {endpoint}")
+                return {}
+            delay = outcome.retry_after if outcome.retry_after is not None else self.retry_policy.backoff(attempt)
+            time_left = remaining()
+            if time_left is not None and delay >= time_left:
+                logger.error(f"剩余时间不足以继续重试: {endpoint}")
+                return {}
+            UPSTREAM_RETRIES.inc(endpoint=label, reason=outcome.reason)
+            await asyncio.sleep(delay)
+
+        if not outcome.permanent:
+            logger.error("最终请求失败")
         return {}
 
-    def search_papers(self, query: str, limit: int = 10, fields: str = None) -> List[Dict]:
+    async def _send(self, backend: Backend, endpoint: str, label: str, method: str, params: Dict, data: Dict,
+                    attempt: int) -> Attempt:
+        """向单个上游发出一次请求，并更新该上游的熔断器、限流器与健康统计"""
+        import httpx
+        breaker = backend.circuit_breaker
+        if not breaker.allow():
+            UPSTREAM_ERRORS.inc(endpoint=label, backend=backend.name, status='circuit_open')
+            return Attempt(backend, reason='circuit_open')
+        time_left = remaining()
+        if backend.rate_limiter is not None:
+            try:
+                waited = await backend.rate_limiter.acquire(timeout=time_left)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except sqlite3.OperationalError as e:
+                # 共享限流库被其他进程长时间锁住：本次不发请求，按可重试处理
+                logger.warning(f"共享限流器暂不可用 (尝试 {attempt}, {backend.name}): {e}")
+                UPSTREAM_ERRORS.inc(endpoint=label, backend=backend.name, status='rate_limiter')
+                breaker.release()
+                return Attempt(backend, reason='rate_limiter')
+            if waited is None:
+                logger.error(f"限流排队超出调用截止时间: {endpoint} ({backend.name})")
+                UPSTREAM_ERRORS.inc(endpoint=label, backend=backend.name, status='deadline')
+                breaker.release()
+                return Attempt(backend, reason='deadline', retryable=False)
+            RATE_LIMIT_WAIT.observe(waited)
+            time_left = remaining()
+        timeout = self.timeout if time_left is None else min(self.timeout, time_left)
+        url = backend.url(endpoint)
+        started = time.perf_counter()
+        try:
+            if method == 'GET':
+                response = await self.client.get(url, params=params, headers=backend.headers, timeout=timeout)
+            else:
+                response = await self.client.post(url, params=params, json=data, headers=backend.headers,
+                                                  timeout=timeout)
+            elapsed = time.perf_counter() - started
+            UPSTREAM_LATENCY.observe(elapsed, endpoint=label, method=method, status=response.status_code,
+                                     backend=backend.name)
+            response.raise_for_status()
+            result = response.json()
+        except asyncio.CancelledError:
+            # 对冲请求中落败的一方被取消，不计入健康统计
+            breaker.release()
+            raise
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            reason = str(status)
+            UPSTREAM_ERRORS.inc(endpoint=label, backend=backend.name, status=reason)
+            if not self.retry_policy.is_retryable_status(status):
+                # 400/404 等永久错误重试也不会成功，直接返回
+                logger.error(f"API请求失败，不可重试 ({status}): {e}")
+                breaker.release()
+                return Attempt(backend, reason=reason, permanent=True)
+            logger.warning(f"API请求失败 (尝试 {attempt}, {backend.name}, 状态码 {status}): {e}")
+            if status == 429:
+                # 限流不代表上游故障，不计入熔断
+                if backend.rate_limiter is not None:
+                    backend.rate_limiter.on_throttle()
+                breaker.release()
+                return Attempt(backend, reason=reason, retry_after=self.retry_policy.retry_after(e.response))
+            breaker.record_failure()
+            backend.record(False)
+            return Attempt(backend, reason=reason)
+        except httpx.HTTPError as e:
+            logger.warning(f"API请求失败 (尝试 {attempt}, {backend.name}): {e!r}")
+            reason = 'transport'
+            UPSTREAM_LATENCY.observe(time.perf_counter() - started, endpoint=label, method=method, status=reason,
+                                     backend=backend.name)
+            UPSTREAM_ERRORS.inc(endpoint=label, backend=backend.name, status=reason)
+            breaker.record_failure()
+            backend.record(False)
+            return Attempt(backend, reason=reason)
+        except json.JSONDecodeError as e:
+            logger.warning(f"JSON解析失败 (尝试 {attempt}, {backend.name}): {e}")
+            reason = 'invalid_json'
+            UPSTREAM_ERRORS.inc(endpoint=label, backend=backend.name, status=reason)
+            breaker.record_failure()
+            backend.record(False)
+            return Attempt(backend, reason=reason)
+        breaker.record_success()
+        if backend.rate_limiter is not None:
+            backend.rate_limiter.on_success()
+        backend.record(True, elapsed)
+        return Attempt(backend, result=result)
+
+    @coalesce
+    async def search_papers(self, query: str, limit: int = 10, fields: str = None, refresh: bool = False) -> List[Dict]:
+        return await self._search(query, limit=limit, fields=fields, refresh=refresh) or []
+
+    async def _search(self, query: str, limit: int = 10, fields: str = None,
+                      refresh: bool = False) -> Optional[List[Dict]]:
+        """检索论文；上游请求失败（含超时、限流排队超出截止时间）时返回 None，没有结果时返回空列表"""
         if fields is None:
             fields = 'title,authors,year,abstract,citationCount,venue,openAccessPdf,citationStyles'
         
@@ -68,38 +366,279 @@ class Scholar:
             'fields': fields
         }
         
-        data = self._make_request('graph/v1/paper/search', params=params)
-        return data.get('data', [])
+        offline = []
+        if self.offline_index is not None and not refresh:
+            # 离线索引给出足够的结果时直接返回；不足 limit 条时再请求上游，离线结果在前、上游结果补齐
+            offline = await asyncio.to_thread(self.offline_index.search, query, limit=limit, fields=fields)
+            record_cache('offline_index', len(offline) >= limit)
+            if len(offline) >= limit:
+                return offline
+        data = await self._make_request('graph/v1/paper/search', params=params, refresh=refresh)
+        if not data:
+            return offline or None
+        papers = data.get('data', [])
+        if self.title_index is not None:
+            self.index_titles(papers)
+        if self.paper_store is not None:
+            field_list = parse_fields(fields)
+            for paper in papers:
+                self.paper_store.put(paper, field_list)
+        if offline:
+            seen = {paper['paperId'] for paper in offline}
+            papers = (offline + [paper for paper in papers if paper.get('paperId') not in seen])[:limit]
+        return papers
 
-    def get_paper_details(self, paper_id: str, fields: str = None) -> Dict:
+    @coalesce
+    async def get_paper_details(self, paper_id: str, fields: str = None, refresh: bool = False) -> Dict:
         if paper_id.startswith('10.'):
             paper_id = f'DOI:{paper_id}'
         endpoint = f'graph/v1/paper/{paper_id}'
         # 默认获取所有字段以便分析
         if not fields:
             fields = 'title,authors,year,abstract,citationCount,venue,citationStyles,references'
-        return self._make_request(endpoint, params={'fields': fields})
+        if self.offline_index is not None and not refresh and self.offline_index.can_serve(fields):
+            paper = await asyncio.to_thread(self.offline_index.get, paper_id, fields)
+            record_cache('offline_index', paper is not None)
+            if paper is not None:
+                return paper
+        if self.paper_store is not None:
+            # 通过论文库补齐缺失字段
+            papers = await self.batch_get_papers([paper_id], fields=fields, refresh=refresh)
+            return papers[0] if papers and papers[0] else {}
+        paper = await self._make_request(endpoint, params={'fields': fields}, refresh=refresh)
+        if self.citation_graph is not None:
+            await asyncio.to_thread(self.citation_graph.add_papers, [paper])
+        return paper
 
-    def batch_get_papers(self, paper_ids: List[str], fields: str = None) -> List[Dict]:
+    @coalesce
+    async def batch_get_papers(self, paper_ids: List[str], fields: str = None, refresh: bool = False,
+                               concurrency: int = None) -> List[Dict]:
         if fields is None:
             fields = 'title,authors,year,citationCount,publicationVenue,journal,citationStyles,abstract'
-        data = {'ids': paper_ids}
-        params = {'fields': fields}
-        return self._make_request('graph/v1/paper/batch', params=params, method='POST', data=data)
+        if self.offline_index is not None and not refresh and self.offline_index.can_serve(fields):
+            # 先查离线索引，只有未收录的论文才请求上游
+            papers = await asyncio.to_thread(self.offline_index.get_many, paper_ids, fields)
+            missing = [paper_id for paper_id, paper in zip(paper_ids, papers) if paper is None]
+            record_cache('offline_index', True, len(paper_ids) - len(missing))
+            record_cache('offline_index', False, len(missing))
+            if missing:
+                fetched = iter(await self._batch_get_remote(missing, fields, refresh=refresh,
+                                                            concurrency=concurrency))
+                papers = [paper if paper is not None else next(fetched) for paper in papers]
+            return papers
+        return await self._batch_get_remote(paper_ids, fields, refresh=refresh, concurrency=concurrency)
+
+    async def _batch_get_remote(self, paper_ids: List[str], fields: str, refresh: bool = False,
+                                concurrency: int = None) -> List[Dict]:
+        """从上游批量获取论文；启用论文库时只请求库中缺失的字段"""
+        if self.paper_store is None:
+            return await self._fetch_batch(paper_ids, fields, refresh=refresh, concurrency=concurrency)
+
+        field_list = parse_fields(fields)
+        # 按缺失字段分组，每组只请求缺失的字段
+        groups: Dict[tuple, List[str]] = {}
+        unique_ids = list(dict.fromkeys(paper_ids))
+        # 结果直接由本次获取的记录与请求前已持有的字段合并而成，不依赖有界论文库在获取之后仍保留它们
+        records: Dict[str, Optional[Dict]] = {}
+        held: Dict[str, Optional[Dict]] = {}
+        for paper_id in unique_ids:
+            missing = field_list if refresh else self.paper_store.missing_fields(paper_id, field_list)
+            if missing:
+                groups.setdefault(tuple(missing), []).append(paper_id)
+                held[paper_id] = None if refresh else self.paper_store.held(paper_id, field_list)
+            else:
+                records[paper_id] = self.paper_store.get(paper_id, field_list)
+        if not refresh:
+            misses = sum(len(ids) for ids in groups.values())
+            record_cache('paper_store', True, len(unique_ids) - misses)
+            record_cache('paper_store', False, misses)
+            if self.refresher is not None:
+                self._schedule_stale_papers(unique_ids)
+
+        if groups:
+            results = await asyncio.gather(*[
+                self._fetch_batch(ids, ','.join(missing), refresh=refresh, concurrency=concurrency)
+                for missing, ids in groups.items()
+            ])
+            for (missing, ids), papers in zip(groups.items(), results):
+                if not isinstance(papers, list):
+                    papers = [None] * len(ids)
+                for paper_id, paper in zip(ids, papers):
+                    self.paper_store.put(paper, list(missing), alias=paper_id)
+                    records[paper_id] = self._merge_paper(held[paper_id], paper, field_list)
+
+        # 重复的 ID 各自返回一份副本，调用方可以修改
+        return [dict(records[paper_id]) if records.get(paper_id) else None for paper_id in paper_ids]
 
-    def get_paper_references(self, paper_id: str, limit: int = 100, fields: str = None) -> List[Dict]:
+    @staticmethod
+    def _merge_paper(held: Optional[Dict], paper: Optional[Dict], field_list: List[str]) -> Optional[Dict]:
+        """把新获取的字段与已持有的字段合并成只包含所请求字段的记录；获取失败时返回 None"""
+        if not paper:
+            return None
+        merged = {**(held or {}), **paper}
+        result = {'paperId': paper.get('paperId') or merged.get('paperId')}
+        for field in field_list:
+            key = top_level(field)
+            if key in merged:
+                result[key] = merged[key]
+        return result
+
+    def _schedule_stale_papers(self, paper_ids: List[str]):
+        """论文库中过旧的记录照常返回，同时按访问次数安排后台刷新它持有的全部字段"""
+        for paper_id in paper_ids:
+            freshness = self.paper_store.freshness(paper_id)
+            if freshness is not None and freshness[0] > self.paper_max_age:
+                age, hits, held = freshness
+                self.refresher.schedule_paper(self.paper_store.resolve(paper_id), ','.join(held), priority=hits)
+
+    async def _fetch_batch(self, paper_ids: List[str], fields: str, refresh: bool = False,
+                           concurrency: int = None) -> List[Dict]:
+        """
+        按上游上限把 ID 分块并发请求，再按原顺序拼接；失败的分块对应位置为 None
+        """
+        chunks = [paper_ids[i:i + self.BATCH_MAX_IDS] for i in range(0, len(paper_ids), self.BATCH_MAX_IDS)]
+        semaphore = asyncio.Semaphore(max(1, concurrency or self.batch_concurrency))
+
+        async def fetch_chunk(chunk: List[str]) -> List[Dict]:
+            async with semaphore:
+                result = await self._make_request('graph/v1/paper/batch', params={'fields': fields},
+                                                  method='POST', data={'ids': chunk}, refresh=refresh)
+            if not isinstance(result, list) or len(result) != len(chunk):
+                return [None] * len(chunk)
+            return result
+
+        results = await asyncio.gather(*[fetch_chunk(chunk) for chunk in chunks])
+        papers = [paper for chunk_result in results for paper in chunk_result]
+        if self.title_index is not None:
+            self.index_titles(papers)
+        if self.citation_graph is not None:
+            await asyncio.to_thread(self.citation_graph.add_papers, papers)
+        return papers
+
+    @coalesce
+    async def get_paper_references(self, paper_id: str, limit: int = 100, fields: str = None,
+                                   offset: int = 0, refresh: bool = False) -> List[Dict]:
         if fields is None:
             fields = 'contexts,title,authors,year,citationCount'
-        params = {'limit': limit, 'fields': fields}
+        params = {'offset': offset, 'limit': limit, 'fields': fields}
         endpoint = f'graph/v1/paper/{paper_id}/references'
-        data = self._make_request(endpoint, params=params)
-        return data.get('data', [])
+        data = await self._make_request(endpoint, params=params, refresh=refresh)
+        references = data.get('data', [])
+        await self._remember_edges(paper_id, references, 'citedPaper', fields)
+        return references
+
+    @coalesce
+    async def get_paper_citations(self, paper_id: str, limit: int = 100, fields: str = None,
+                                  offset: int = 0, refresh: bool = False) -> List[Dict]:
+        if fields is None:
+            fields = 'contexts,title,authors,year,citationCount'
+        params = {'offset': offset, 'limit': limit, 'fields': fields}
+        endpoint = f'graph/v1/paper/{paper_id}/citations'
+        data = await self._make_request(endpoint, params=params, refresh=refresh)
+        citations = data.get('data', [])
+        await self._remember_edges(paper_id, citations, 'citingPaper', fields)
+        return citations
+
+    def iter_paper_references(self, paper_id: str, fields: str = None, page_size: int = 100,
+                              max_items: int = None, total: int = None, prefetch: int = 2,
+                              refresh: bool = False) -> AsyncIterator[Dict]:
+        """按 offset 分页遍历全部参考文献，见 _iter_edges"""
+        return self._iter_edges(paper_id, 'references', fields, page_size, max_items, total, prefetch, refresh)
 
-    def get_references_info(self, title: str) -> Dict[str, Any]:
+    def iter_paper_citations(self, paper_id: str, fields: str = None, page_size: int = 100,
+                             max_items: int = None, total: int = None, prefetch: int = 2,
+                             refresh: bool = False) -> AsyncIterator[Dict]:
+        """按 offset 分页遍历全部施引文献，见 _iter_edges"""
+        return self._iter_edges(paper_id, 'citations', fields, page_size, max_items, total, prefetch, refresh)
+
+    async def _iter_edges(self, paper_id: str, edge: str, fields: str, page_size: int, max_items: int,
+                          total: int, prefetch: int, refresh: bool) -> AsyncIterator[Dict]:
+        """
+        分页生成器：
+        - 已知总数 total（如 referenceCount）时，提前并发请求后续 prefetch 页
+        - 未知总数时，每收到一页并确认还有 next，就在处理当前页之前发出下一页请求
+        """
+        if fields is None:
+            fields = 'contexts,title,authors,year,citationCount'
+        endpoint = f'graph/v1/paper/{paper_id}/{edge}'
+        key = 'citedPaper' if edge == 'references' else 'citingPaper'
+        page_size = max(1, min(page_size, self.EDGE_PAGE_MAX))
+        bounds = [b for b in (total, max_items) if b is not None]
+        bound = min(bounds) if bounds else None
+        if bound is not None and bound <= 0:
+            return
+
+        pending = deque()
+        next_offset = 0
+
+        def schedule(offset: int):
+            nonlocal next_offset
+            limit = page_size if bound is None else min(page_size, bound - offset)
+            params = {'offset': offset, 'limit': limit, 'fields': fields}
+            pending.append(asyncio.ensure_future(self._make_request(endpoint, params=params, refresh=refresh)))
+            next_offset = offset + limit
+
+        schedule(0)
+        if total is not None:
+            while len(pending) < prefetch and next_offset < bound:
+                schedule(next_offset)
+        yielded = 0
+        try:
+            while pending:
+                data = await pending.popleft()
+                items = data.get('data') or []
+                has_next = bool(items) and data.get('next') is not None
+                if not has_next:
+                    for task in pending:
+                        task.cancel()
+                    pending.clear()
+                elif bound is not None:
+                    while len(pending) < prefetch and next_offset < bound:
+                        schedule(next_offset)
+                elif not pending:
+                    schedule(int(data['next']))
+
+                await self._remember_edges(paper_id, items, key, fields)
+                for item in items:
+                    yield item
+                    yielded += 1
+                    if max_items is not None and yielded >= max_items:
+                        return
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _remember_edges(self, paper_id: str, edges: List[Dict], key: str, fields: str):
+        """把 references/citations 响应中的论文写入论文库，引用关系写入本地引用图（在线程中进行）"""
+        if self.citation_graph is not None:
+            kind = 'references' if key == 'citedPaper' else 'citations'
+            await asyncio.to_thread(self.citation_graph.add_edges, paper_id, [edge.get(key) for edge in edges], kind)
+        if self.paper_store is None:
+            return
+        field_list = parse_fields(fields)
+        for edge in edges:
+            self.paper_store.put(edge.get(key), field_list)
+
+    @coalesce(listener='progress')
+    async def get_references_info(self, title: str, max_references: int = None, refresh: bool = False,
+                                  progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
         """
         获取论文及其参考文献的详细信息（含格式化引用）
+        max_references 为 None 时获取全部参考文献；refresh=True 时跳过本地缓存，重新从上游获取
+        progress 为可选的异步回调 progress(stage, data)，每个阶段完成时调用：
+        - 'main_paper': {'main_paper': 主论文, 'total': 预计参考文献数}
+        - 'references': {'offset': 起始序号, 'references': 这一块参考文献详情, 'done': 已完成数, 'total': 预计总数}
+        传入 progress 时参考文献按 REFERENCE_CHUNK 分块获取详情，边翻页边请求，每块完成即按顺序推送
         """
-        papers = self.search_papers(query=title, limit=1)
+        papers = []
+        with stage('get_references_info', 'search'):
+            # 标题已解析过时直接按 paperId 获取主论文，省去一次搜索
+            paper_id = await self._resolve_title(title) if not refresh else None
+            if paper_id:
+                papers = [p for p in await self.batch_get_papers([paper_id], fields=self.MAIN_PAPER_FIELDS) if p]
+            if not papers:
+                papers = await self.search_papers(query=title, limit=1, fields=self.MAIN_PAPER_FIELDS,
+                                                  refresh=refresh)
         
         if not papers:
             return {"error": "未查找到相关论文", "main_paper": {}, "references": []}
@@ -107,86 +646,861 @@ class Scholar:
         main_paper = papers[0]
         # 添加主论文的引用格式
         if "citationStyles" in main_paper and main_paper["citationStyles"]:
-            main_paper["gbt7714"] = bibtex_to_gbt7714(main_paper["citationStyles"].get('bibtex', ''))
+            with stage('get_references_info', 'format'):
+                main_paper["gbt7714"] = bibtex_to_gbt7714(main_paper["citationStyles"].get('bibtex', ''))
         
         paper_id = main_paper['paperId']
         logger.info(f'''获取论文的papepr_id为{paper_id}''') 
-        # 获取参考文献列表
+        expected = main_paper.get('referenceCount') or 0
+        if max_references is not None:
+            expected = min(expected, max_references)
+        if progress is not None:
+            await progress('main_paper', {'main_paper': main_paper, 'total': expected})
+
+        # 获取参考文献列表；每凑满一块 ID 就立即批量获取详情，与后续翻页重叠进行
         logger.info("获取参考文献列表")
-        references_raw = self.get_paper_references(paper_id=paper_id, limit=50) # 限制数量防止超时
-        logger.info("获取参考文献成功")
-        # 提取被引用的论文ID
-        references_paper_ids = []
-        for ref in references_raw:
-            if ref.get("citedPaper") and ref["citedPaper"].get('paperId'):
-                references_paper_ids.append(ref["citedPaper"]['paperId'])
-        
-        # 批量获取参考文献详情
-        reference_details = []
-        if references_paper_ids:
-            reference_details = self.batch_get_papers(paper_ids=references_paper_ids)
-            for info in reference_details:
-                if "citationStyles" in info and info["citationStyles"]:
-                    info["gbt7714"] = bibtex_to_gbt7714(info["citationStyles"].get('bibtex', ''))
+        chunk_size = self.REFERENCE_CHUNK if progress is not None else self.BATCH_MAX_IDS
+        chunks: List[asyncio.Future] = []
+        emitted: Optional[asyncio.Future] = None
+        done = 0
+
+        async def emit(previous, chunk, offset):
+            # 按块的顺序推送：先等前一块推送完成
+            nonlocal done
+            if previous is not None:
+                await previous
+            details = await chunk
+            done += len(details)
+            await progress('references', {'offset': offset, 'references': details,
+                                          'done': done, 'total': max(expected, done)})
+
+        def flush(ids: List[str], offset: int):
+            nonlocal emitted
+            chunk = asyncio.ensure_future(self._reference_details(ids, refresh))
+            chunks.append(chunk)
+            if progress is not None:
+                emitted = asyncio.ensure_future(emit(emitted, chunk, offset))
+
+        references_paper_ids: List[str] = []
+        pending_ids: List[str] = []
+        try:
+            # references 阶段与详情请求重叠；batch 阶段只统计翻页结束后还需等待的时间
+            with stage('get_references_info', 'references'):
+                async for ref in self.iter_paper_references(
+                        paper_id, max_items=max_references, total=main_paper.get('referenceCount'),
+                        refresh=refresh):
+                    # 提取被引用的论文ID
+                    if ref.get("citedPaper") and ref["citedPaper"].get('paperId'):
+                        pending_ids.append(ref["citedPaper"]['paperId'])
+                    if len(pending_ids) >= chunk_size:
+                        flush(pending_ids, len(references_paper_ids))
+                        references_paper_ids.extend(pending_ids)
+                        pending_ids = []
+                if pending_ids:
+                    flush(pending_ids, len(references_paper_ids))
+                    references_paper_ids.extend(pending_ids)
+            logger.info(f"获取参考文献成功，共 {len(references_paper_ids)} 篇")
+            with stage('get_references_info', 'batch'):
+                reference_details = [info for details in await asyncio.gather(*chunks) for info in details]
+                if emitted is not None:
+                    await emitted
+        finally:
+            for task in chunks + ([emitted] if emitted is not None else []):
+                if not task.done():
+                    task.cancel()
 
         return {
             "main_paper": main_paper,
             "references": reference_details
         }
 
+    async def _reference_details(self, paper_ids: List[str], refresh: bool = False) -> List[Optional[Dict]]:
+        """批量获取一块参考文献的详情并补充 GB/T 7714 引用格式"""
+        details = await self.batch_get_papers(paper_ids=paper_ids, refresh=refresh)
+        with stage('get_references_info', 'format'):
+            for info in details:
+                if info and info.get("citationStyles"):
+                    info["gbt7714"] = bibtex_to_gbt7714(info["citationStyles"].get('bibtex', ''))
+        return details
+
+    def index_titles(self, papers: List[Optional[Dict]]):
+        """把论文登记到标题索引；写入由一个后台任务在线程中批量完成，不阻塞当前请求"""
+        if not self.title_index.queue(papers):
+            return
+        if self._title_flush is None or self._title_flush.done():
+            self._title_flush = asyncio.create_task(self._flush_titles())
+
+    async def _flush_titles(self):
+        while self.title_index.pending:
+            await asyncio.to_thread(self.title_index.flush)
+
+    async def _resolve_title(self, title: str) -> Optional[str]:
+        """通过标题解析索引把标题转换为 paperId，未启用或未命中时返回 None"""
+        if self.title_index is None:
+            return None
+        paper_id = await asyncio.to_thread(self.title_index.resolve, title)
+        record_cache('title_index', paper_id is not None)
+        return paper_id
+
+    async def resolve_paper_id(self, query: str, refresh: bool = False) -> Optional[str]:
+        """把论文 ID / DOI / 标题解析为可用于接口的 ID；标题通过搜索解析"""
+        query = query.strip()
+        if query.startswith('10.'):
+            return f'DOI:{query}'
+        if looks_like_paper_id(query):
+            return query
+        if not refresh:
+            paper_id = await self._resolve_title(query)
+            if paper_id:
+                return paper_id
+        papers = await self.search_papers(query=query, limit=1, fields='title', refresh=refresh)
+        return papers[0]['paperId'] if papers else None
+
+    async def _match_title(self, title: str, refresh: bool = False) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        标题 -> (状态, {paperId, title, confidence, source})：先查标题索引，未命中再检索上游并取最相似的结果
+        状态为 'matched'、'not_found'（检索成功但没有结果）或 'failed'（上游请求失败，可以重试）
+        """
+        if self.title_index is not None and not refresh:
+            match = await asyncio.to_thread(self.title_index.lookup, title)
+            record_cache('title_index', match is not None)
+            if match is not None:
+                return 'matched', {'paperId': match[0], 'title': match[1], 'confidence': match[2],
+                                   'source': 'title_index'}
+        papers = await self._search(title, limit=3, fields='title', refresh=refresh)
+        if papers is None:
+            return 'failed', None
+        candidates = [(title_similarity(title, paper.get('title') or ''), paper) for paper in papers
+                      if paper and paper.get('paperId')]
+        if not candidates:
+            return 'not_found', None
+        confidence, paper = max(candidates, key=lambda candidate: candidate[0])
+        return 'matched', {'paperId': paper['paperId'], 'title': paper.get('title'), 'confidence': confidence,
+                           'source': 'search'}
+
+    async def resolve_bibliography(self, items: List[str], min_confidence: float = 0.5, concurrency: int = 8,
+                                   refresh: bool = False) -> Dict[str, Any]:
+        """
+        批量解析参考文献列表（标题或 DOI）并获取详情与 GB/T 7714 引用格式
+        - 输入先规范化并去重：DOI / paperId 直接查询，标题经标题索引或并发检索解析（受限流器约束）
+        - 解析出的 ID 合并为分块的 batch 请求获取详情
+        - 结果按输入顺序返回，每条带 status 与 confidence（标题相似度，DOI / ID 为 1.0）；
+          低于 min_confidence 的匹配视为未解析，只给出候选
+        - 上游失败（failed）或因截止时间未检索（skipped）的条目与“未找到”（not_found）区分开，
+          并列在 unresolved 中，调用方可以只重试这些条目
+        """
+        parsed = [parse_reference(item) for item in items]
+        # 规范化后相同的输入只解析一次
+        queries: Dict[str, tuple] = {}
+        for entry in parsed:
+            if entry is not None:
+                queries.setdefault(reference_key(entry), entry)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def resolve(kind: str, query: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+            if kind == 'id':
+                return 'matched', {'paperId': query, 'title': None, 'confidence': 1.0, 'source': 'id'}
+            async with semaphore:
+                time_left = remaining()
+                if time_left is not None and time_left <= 0:
+                    return 'skipped', None
+                return await self._match_title(query, refresh=refresh)
+
+        # 检索阶段提前 BIBLIOGRAPHY_BATCH_RESERVE 秒结束，剩余时间（与限流配额）留给 batch 获取已解析条目的详情
+        time_left = remaining()
+        search_time = None if time_left is None else max(1e-3, time_left - self.BIBLIOGRAPHY_BATCH_RESERVE)
+        with stage('resolve_bibliography', 'resolve'), deadline(search_time):
+            matches = dict(zip(queries, await asyncio.gather(*[resolve(*entry) for entry in queries.values()])))
+        accepted = {key: match for key, (status, match) in matches.items()
+                    if match is not None and match['confidence'] >= min_confidence}
+        ids = list(dict.fromkeys(match['paperId'] for match in accepted.values()))
+        with stage('resolve_bibliography', 'batch'):
+            papers = dict(zip(ids, await self.batch_get_papers(ids, fields=self.BIBLIOGRAPHY_FIELDS,
+                                                               refresh=refresh))) if ids else {}
+
+        errors = {'not_found': '未查找到相关论文', 'failed': '检索请求失败或超出截止时间，可稍后重试',
+                  'skipped': '超出调用截止时间，未检索'}
+        results = []
+        with stage('resolve_bibliography', 'format'):
+            for item, entry in zip(items, parsed):
+                result: Dict[str, Any] = {'input': item}
+                if entry is None:
+                    results.append({**result, 'status': 'empty', 'error': '输入为空'})
+                    continue
+                key = reference_key(entry)
+                status, match = matches[key]
+                if match is None:
+                    results.append({**result, 'status': status, 'error': errors[status]})
+                    continue
+                result['confidence'] = round(match['confidence'], 3)
+                result['source'] = match['source']
+                candidate = {'paperId': match['paperId'], 'title': match['title']}
+                if key not in accepted:
+                    results.append({**result, 'status': 'low_confidence', 'error': '匹配置信度过低',
+                                    'candidate': candidate})
+                    continue
+                paper = papers.get(match['paperId'])
+                if not paper:
+                    results.append({**result, 'status': 'failed', 'error': '获取论文详情失败',
+                                    'candidate': candidate})
+                    continue
+                bibtex = (paper.get('citationStyles') or {}).get('bibtex', '')
+                results.append({**result, 'status': 'resolved', 'paper': paper,
+                                'gbt7714': bibtex_to_gbt7714(bibtex) if bibtex else None})
+        return {
+            "total": len(items),
+            "resolved": sum(1 for result in results if result['status'] == 'resolved'),
+            "not_found": sum(1 for result in results if result['status'] == 'not_found'),
+            # 可以原样再次提交的条目（上游失败或超出截止时间）
+            "unresolved": [result['input'] for result in results if result['status'] in ('failed', 'skipped')],
+            "results": results,
+        }
+
+    @coalesce
+    async def crawl_citation_graph(self, seed: str, depth: int = 2, direction: str = 'both', max_nodes: int = 200,
+                                   concurrency: int = 4, min_citation_count: int = 0,
+                                   refresh: bool = False) -> Dict[str, Any]:
+        """
+        从种子论文出发按层广度优先爬取引用图
+        每一层只发起 batch 请求：节点信息与其 references/citations 的 paperId 一并返回
+        - depth: 最大跳数；max_nodes: 节点预算；concurrency: 每层 batch 分块的并发数
+        - min_citation_count: 被引数低于该值的邻居不再扩展（提前截断）
+        """
+        if direction not in ('references', 'citations', 'both'):
+            return {"error": f"不支持的方向: {direction}", "nodes": [], "edges": []}
+        seed_id = await self.resolve_paper_id(seed, refresh=refresh)
+        if not seed_id:
+            return {"error": "未查找到相关论文", "nodes": [], "edges": []}
+
+        edge_keys = ['references', 'citations'] if direction == 'both' else [direction]
+        neighbor_fields = ','.join(f'{key}.paperId,{key}.citationCount' for key in edge_keys)
+        queued = set()
+        nodes: Dict[str, Dict] = {}
+        edges = set()
+        frontier = [seed_id]
+        level = 0
+        while frontier:
+            expand = level < depth
+            fields = self.CRAWL_NODE_FIELDS + (',' + neighbor_fields if expand else '')
+            papers = await self.batch_get_papers(frontier, fields=fields, refresh=refresh, concurrency=concurrency)
+            logger.info(f"引用图第 {level} 层：{len(frontier)} 个节点")
+            if level == 0:
+                # DOI / arXiv 等种子换成响应中的 40 位 paperId，否则种子作为邻居出现时会被再次扩展
+                if not papers or not papers[0]:
+                    return {"error": "未查找到相关论文", "nodes": [], "edges": []}
+                seed_id = papers[0]['paperId']
+                queued.add(seed_id)
+
+            candidates: Dict[str, int] = {}
+            for paper in papers:
+                if not paper or paper['paperId'] in nodes:
+                    continue
+                paper_id = paper['paperId']
+                nodes[paper_id] = {key: paper.get(key) for key in self.CRAWL_NODE_FIELDS.split(',')}
+                nodes[paper_id]['paperId'] = paper_id
+                nodes[paper_id]['depth'] = level
+                if not expand:
+                    continue
+                for key in edge_keys:
+                    for neighbor in paper.get(key) or []:
+                        neighbor_id = neighbor.get('paperId')
+                        if not neighbor_id:
+                            continue
+                        edges.add((paper_id, neighbor_id) if key == 'references' else (neighbor_id, paper_id))
+                        citation_count = neighbor.get('citationCount') or 0
+                        if neighbor_id in queued or citation_count < min_citation_count:
+                            continue
+                        candidates[neighbor_id] = max(citation_count, candidates.get(neighbor_id, 0))
+
+            # 节点预算不足时优先扩展被引数高的论文
+            budget = max_nodes - len(queued)
+            frontier = sorted(candidates, key=lambda pid: -candidates[pid])[:max(0, budget)]
+            queued.update(frontier)
+            level += 1
+
+        return {
+            "seed": seed_id,
+            "nodes": sorted(nodes.values(), key=lambda n: (n['depth'], -(n.get('citationCount') or 0))),
+            "edges": sorted([list(e) for e in edges if e[0] in nodes and e[1] in nodes]),
+        }
+
+    async def _graph_node(self, query: str, refresh: bool = False) -> Optional[str]:
+        """把标题 / DOI / ID 解析为 40 位 paperId"""
+        paper_id = await self.resolve_paper_id(query, refresh=refresh)
+        if paper_id and len(paper_id) != 40:
+            paper_id = (await self.get_paper_details(paper_id, fields='title', refresh=refresh)).get('paperId')
+        return paper_id or None
+
+    async def _graph_edges(self, paper_id: str, kind: str, refresh: bool = False) -> str:
+        """
+        确保本地引用图持有 paper_id 在 kind 方向（references / citations）上的全部引用关系
+        已完整获取过的方向直接返回 'complete'；否则逐页获取，返回：
+        - 'complete': 全部获取，并在引用图中记下该方向已完整
+        - 'truncated': 超过 GRAPH_EDGE_LIMIT 条，只写入了前面一部分
+        - 'failed': 上游请求失败，只写入了已获取的部分
+        """
+        graph = self.citation_graph
+        if not refresh and await asyncio.to_thread(graph.is_complete, paper_id, kind):
+            return 'complete'
+        endpoint = f'graph/v1/paper/{paper_id}/{kind}'
+        key = 'citedPaper' if kind == 'references' else 'citingPaper'
+        fields = 'title,year,citationCount'
+        offset = 0
+        while offset < self.GRAPH_EDGE_LIMIT:
+            limit = min(self.EDGE_PAGE_MAX, self.GRAPH_EDGE_LIMIT - offset)
+            data = await self._make_request(endpoint, params={'offset': offset, 'limit': limit, 'fields': fields},
+                                            refresh=refresh)
+            if not data:
+                return 'failed'
+            items = data.get('data') or []
+            await self._remember_edges(paper_id, items, key, fields)
+            offset += len(items)
+            if not items or data.get('next') is None:
+                await asyncio.to_thread(graph.mark_complete, paper_id, kind)
+                return 'complete'
+        return 'truncated'
+
+    async def _ensure_edges(self, paper_ids: List[str], kind: str, refresh: bool = False) -> List[Dict[str, str]]:
+        """并发补齐多篇论文 kind 方向的引用关系，返回没能完整获取的 [{paperId, direction, status}]"""
+        statuses = await asyncio.gather(*[self._graph_edges(paper_id, kind, refresh) for paper_id in paper_ids])
+        return [{'paperId': paper_id, 'direction': kind, 'status': status}
+                for paper_id, status in zip(paper_ids, statuses) if status != 'complete']
+
+    async def _hop_edges(self, paper_ids: List[str], kind: str) -> List[Dict[str, str]]:
+        """
+        用 batch 请求的嵌套列表补齐多篇论文 kind 方向的引用关系，返回失败的 [{paperId, direction, status}]
+        嵌套列表可能很大且只用于引用图，因此直接请求上游，不经过响应缓存与论文库
+        """
+        count_field = 'referenceCount' if kind == 'references' else 'citationCount'
+        fields = f'{kind}.paperId,{count_field}'
+        chunks = [paper_ids[i:i + self.BATCH_MAX_IDS] for i in range(0, len(paper_ids), self.BATCH_MAX_IDS)]
+        semaphore = asyncio.Semaphore(max(1, self.batch_concurrency))
+
+        async def fetch_chunk(chunk: List[str]) -> List[str]:
+            async with semaphore:
+                result = await self._fetch('graph/v1/paper/batch', params={'fields': fields},
+                                           method='POST', data={'ids': chunk})
+            if not isinstance(result, list) or len(result) != len(chunk):
+                return chunk
+            await asyncio.to_thread(self.citation_graph.add_nested, result, kind)
+            return [paper_id for paper_id, paper in zip(chunk, result) if not paper]
+
+        failed = await asyncio.gather(*[fetch_chunk(chunk) for chunk in chunks])
+        return [{'paperId': paper_id, 'direction': kind, 'status': 'failed'}
+                for chunk in failed for paper_id in chunk]
+
+    async def graph_overlap(self, paper_a: str, paper_b: str, kind: str = 'cocitation',
+                            refresh: bool = False) -> Dict[str, Any]:
+        """
+        基于本地引用图计算两篇论文的共被引（kind='cocitation'，同时引用两者的论文）
+        或文献耦合（kind='coupling'，两者共同的参考文献）
+        需要的方向（共被引为施引文献，文献耦合为参考文献）尚未完整获取时先分页获取；
+        获取不完整时在 incomplete 中列出，此时计数只是下限
+        """
+        if self.citation_graph is None:
+            return {"error": "未启用本地引用图"}
+        ids = await asyncio.gather(self._graph_node(paper_a, refresh), self._graph_node(paper_b, refresh))
+        if not all(ids):
+            return {"error": "未查找到相关论文"}
+        direction = 'citations' if kind == 'cocitation' else 'references'
+        incomplete = await self._ensure_edges(list(dict.fromkeys(ids)), direction, refresh)
+        graph = self.citation_graph
+
+        def overlap() -> Dict[str, Any]:
+            counts = graph.co_citation(*ids) if kind == 'cocitation' else graph.coupling(*ids)
+            return {"paper_a": graph.paper(ids[0]), "paper_b": graph.paper(ids[1]), **counts}
+
+        result = await asyncio.to_thread(overlap)
+        if incomplete:
+            result['incomplete'] = incomplete
+        return result
+
+    async def related_papers(self, query: str, k: int = 10, method: str = 'combined',
+                             refresh: bool = False) -> Dict[str, Any]:
+        """
+        基于本地引用图按共被引 / 文献耦合次数找出最相关的 k 篇论文
+        - 共被引：先获取种子论文的全部施引文献，再用 batch 请求补齐这些施引文献的参考文献
+        - 文献耦合：先获取种子论文的全部参考文献，再用 batch 请求补齐这些参考文献的施引文献
+        第二跳最多补齐 GRAPH_HOP_LIMIT 篇；获取不完整的部分在 incomplete 中列出
+        第二跳的嵌套列表只写入引用图（不进入响应缓存与论文库），并按 EDGE_TTL 记下获取时间，有效期内不再重复获取
+        """
+        if self.citation_graph is None:
+            return {"error": "未启用本地引用图", "related": []}
+        from citation_graph import METHODS
+        if method not in METHODS:
+            return {"error": f"不支持的方法: {method}", "related": []}
+        paper_id = await self._graph_node(query, refresh)
+        if not paper_id:
+            return {"error": "未查找到相关论文", "related": []}
+
+        graph = self.citation_graph
+        hops = []
+        if method in ('cocitation', 'combined'):
+            hops.append(('citations', 'references'))
+        if method in ('coupling', 'combined'):
+            hops.append(('references', 'citations'))
+        incomplete = await self._ensure_edges([paper_id], hops[0][0], refresh)
+        if len(hops) > 1:
+            incomplete += await self._ensure_edges([paper_id], hops[1][0], refresh)
+        for first, second in hops:
+            neighbors = await asyncio.to_thread(graph.neighbors, paper_id, first)
+            if not refresh:
+                neighbors = await asyncio.to_thread(graph.stale, neighbors, second, True)
+            if len(neighbors) > self.GRAPH_HOP_LIMIT:
+                incomplete.append({'paperId': paper_id, 'direction': f'{first}.{second}',
+                                   'status': f'truncated: {len(neighbors) - self.GRAPH_HOP_LIMIT} neighbours skipped'})
+                neighbors = neighbors[:self.GRAPH_HOP_LIMIT]
+            incomplete += await self._hop_edges(neighbors, second)
+
+        def collect() -> Dict[str, Any]:
+            return {"paper": graph.paper(paper_id), "related": graph.related(paper_id, k=k, method=method)}
+
+        result = await asyncio.to_thread(collect)
+        if incomplete:
+            result['incomplete'] = incomplete
+        return result
+
 # --- 实例化全局 Scholar 对象 ---
 # 建议在运行 MCP 时通过环境变量配置 key
 API_KEY = os.environ.get("SCHOLAR_API_KEY", "") 
 BASE_URL = os.environ.get("SCHOLAR_BASE_URL", "https://api.semanticscholar.org")
+# 本地缓存路径，设置为空字符串可关闭缓存
+CACHE_PATH = os.environ.get("SCHOLAR_CACHE_PATH", os.path.join(DEFAULT_CACHE_DIR, "responses.sqlite3"))
+CACHE_MAX_MB = int(os.environ.get("SCHOLAR_CACHE_MAX_MB", "256"))
+PAPER_STORE_SIZE = int(os.environ.get("SCHOLAR_PAPER_STORE_SIZE", "10000"))
+# 缓存过期后仍可返回旧数据的宽限期（秒），期间由后台刷新；后台刷新并发数为 0 时关闭
+STALE_GRACE = int(os.environ.get("SCHOLAR_STALE_GRACE", str(7 * 24 * 3600)))
+REFRESH_CONCURRENCY = int(os.environ.get("SCHOLAR_REFRESH_CONCURRENCY", "2"))
+# 客户端限流：未设置时按 base_url / api key 取默认值，设置为 0 关闭
+_default_rate, _default_burst = default_rate_limit(BASE_URL, API_KEY)
+RATE_LIMIT = float(os.environ.get("SCHOLAR_RATE_LIMIT", _default_rate))
+RATE_BURST = int(os.environ.get("SCHOLAR_RATE_BURST", _default_burst))
+# 多个上游："url|key,url|key"（key 可省略，默认 SCHOLAR_API_KEY），设置后取代 SCHOLAR_BASE_URL
+# 按健康分选择上游，首选上游超过延迟分位数仍未响应时向下一个上游发出对冲请求
+BACKENDS = parse_backends(os.environ.get("SCHOLAR_BACKENDS", ""), API_KEY)
+HEDGE_PERCENTILE = float(os.environ.get("SCHOLAR_HEDGE_PERCENTILE", "0.9"))
+MAX_HEDGES = int(os.environ.get("SCHOLAR_MAX_HEDGES", "1"))
+# 单次工具调用的总时限（秒）
+TOOL_TIMEOUT = float(os.environ.get("SCHOLAR_TOOL_TIMEOUT", "60"))
+# resolve_bibliography 按待检索的标题数放宽截止时间，最多放宽到该秒数
+BIBLIOGRAPHY_TIMEOUT = float(os.environ.get("SCHOLAR_BIBLIOGRAPHY_TIMEOUT", "300"))
+# 标题解析索引路径，设置为空字符串可关闭
+TITLE_INDEX_PATH = os.environ.get("SCHOLAR_TITLE_INDEX", os.path.join(DEFAULT_CACHE_DIR, "titles.sqlite3"))
+# 离线索引路径（由 offline_index.py build 生成），未设置时只使用远程 API
+OFFLINE_INDEX_PATH = os.environ.get("SCHOLAR_OFFLINE_INDEX", "")
+# worker 进程数（由 workers.py 设置）；多于 1 个时各进程共享限流配额，并通过响应缓存合并回源
+WORKERS = int(os.environ.get("SCHOLAR_WORKERS", "1"))
+# convert_bibtex_bibliography 可以读写的目录（path / output_path 相对于它），未设置时只接受 BibTeX 文本
+BIB_DIR = os.environ.get("SCHOLAR_BIB_DIR", "")
+# 本地引用图目录（需要 numpy），设置为空字符串可关闭；多个 worker 可以共用同一目录
+GRAPH_DIR = os.environ.get("SCHOLAR_GRAPH_DIR", os.path.join(DEFAULT_CACHE_DIR, "graph"))
+RATE_LIMIT_PATH = os.environ.get("SCHOLAR_RATE_LIMIT_PATH", os.path.join(DEFAULT_CACHE_DIR, "ratelimit.sqlite3"))
+if WORKERS > 1 and not CACHE_PATH:
+    logger.warning("多 worker 模式下未启用响应缓存，各 worker 之间无法共享已获取的数据")
+
+
+def make_rate_limiter(url: str, rate: float, burst: int):
+    """速率为 0 时不限流；多 worker 时使用按上游地址共享的令牌桶"""
+    if rate <= 0:
+        return None
+    if WORKERS > 1 and RATE_LIMIT_PATH:
+        return SharedRateLimiter(RATE_LIMIT_PATH, url, rate, burst)
+    return AdaptiveRateLimiter(rate, burst)
+
+
+def make_backend(url: str, key: str) -> Backend:
+    """每个上游一个独立的限流器；速率未通过环境变量指定时按该上游取默认值"""
+    rate, burst = default_rate_limit(url, key)
+    rate = float(os.environ.get("SCHOLAR_RATE_LIMIT", rate))
+    burst = int(os.environ.get("SCHOLAR_RATE_BURST", burst))
+    return Backend(url, key, rate_limiter=make_rate_limiter(url, rate, burst))
 
-scholar_client = Scholar(api_key=API_KEY, base_url=BASE_URL)
+
+def make_citation_graph(directory: str):
+    """本地引用图依赖 numpy（可选），未安装时关闭"""
+    try:
+        from citation_graph import CitationGraph
+    except ImportError:
+        logger.info("未安装 numpy，本地引用图已关闭")
+        return None
+    graph = CitationGraph(directory)
+    # 退出时把尚未合并的引用边写入磁盘
+    atexit.register(graph.close)
+    return graph
+
+
+_scholar: Optional[Scholar] = None
+
+
+def get_scholar() -> Scholar:
+    """
+    全局 Scholar 客户端，在第一次工具调用时才创建（打开响应缓存、标题索引、离线索引与引用图）
+    stdio 会话的 initialize / tools/list 不必等待这些初始化
+    """
+    global _scholar
+    if _scholar is None:
+        response_cache = ResponseCache(CACHE_PATH, max_bytes=CACHE_MAX_MB * 1024 * 1024,
+                                       stale_grace=STALE_GRACE if REFRESH_CONCURRENCY > 0 else 0) \
+            if CACHE_PATH else None
+        _scholar = Scholar(api_key=API_KEY, base_url=BASE_URL, cache=response_cache,
+                           paper_store=PaperStore(PAPER_STORE_SIZE) if PAPER_STORE_SIZE > 0 else None,
+                           rate_limiter=make_rate_limiter(BASE_URL, RATE_LIMIT, RATE_BURST),
+                           offline_index=OfflineIndex(OFFLINE_INDEX_PATH) if OFFLINE_INDEX_PATH else None,
+                           title_index=TitleIndex(TITLE_INDEX_PATH) if TITLE_INDEX_PATH else None,
+                           backends=[make_backend(url, key) for url, key in BACKENDS] or None,
+                           hedge_percentile=HEDGE_PERCENTILE, max_hedges=MAX_HEDGES, shared_cache=WORKERS > 1,
+                           background_refresh=REFRESH_CONCURRENCY > 0, refresh_concurrency=REFRESH_CONCURRENCY,
+                           citation_graph=make_citation_graph(GRAPH_DIR) if GRAPH_DIR else None)
+    return _scholar
+
+
+def __getattr__(name: str):
+    # 兼容以模块属性访问 scholar_client / response_cache 的调用方（首次访问时创建客户端）
+    if name == 'scholar_client':
+        return get_scholar()
+    if name == 'response_cache':
+        return get_scholar().cache
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # --- MCP 工具定义 ---
 
 @mcp.tool
-def search_academic_papers(query: str, limit: int = 5) -> str:
+async def search_academic_papers(query: str, limit: int = 5, refresh: bool = False, fields: str = "", compact: bool = False,
+                                 max_bytes: int = 0, max_tokens: int = 0) -> str:
     """
     Search for academic papers by keyword.
     
     Args:
         query: The search query (e.g., "3D Human Pose Estimation")
         limit: Number of results to return (default 5)
+        refresh: Skip the local cache and fetch fresh data (default False)
+        fields: Comma-separated fields to keep for each paper, e.g. "title,year,authors.name" (default all)
+        compact: Return minified JSON without indentation (default False)
+        max_bytes: Shorten abstracts and reference lists to fit this many bytes (default 0 = no limit)
+        max_tokens: Same as max_bytes, in approximate LLM tokens (default 0 = no limit)
     """
     #scholar_client = Scholar(api_key="", base_url="https://api.semanticscholar.org")
-    results = scholar_client.search_papers(query, limit=limit)
-    return json.dumps(results, ensure_ascii=False, indent=2)
+    with track_tool('search_academic_papers') as call, deadline(TOOL_TIMEOUT):
+        results = await get_scholar().search_papers(query, limit=limit, fields=upstream_fields(fields),
+                                                     refresh=refresh)
+        call.check(results)
+        return render_response(results, fields=fields, compact=compact, max_bytes=max_bytes, max_tokens=max_tokens)
 
 @mcp.tool
-def get_paper_references_analysis(title: str) -> str:
+async def get_paper_references_analysis(title: str, max_references: int = 0, refresh: bool = False,
+                                        fields: str = "", compact: bool = False,
+                                        max_bytes: int = 0, max_tokens: int = 0, ctx: Context = None) -> str:
     """
     Find a paper by title and get detailed information about its references,
     including GB/T 7714 citation formats. Useful for literature review.
+    While running, the tool sends progress notifications and partial results
+    (the main paper first, then references in chunks) as log messages.
     
     Args:
         title: The exact or partial title of the paper.
+        max_references: Maximum number of references to analyse (default 0 = all)
+        refresh: Skip the local cache and fetch fresh data (default False)
+        fields: Comma-separated fields to keep for each paper, e.g. "title,year,authors.name" (default all)
+        compact: Return minified JSON without indentation (default False)
+        max_bytes: Shorten abstracts and reference lists to fit this many bytes (default 0 = no limit)
+        max_tokens: Same as max_bytes, in approximate LLM tokens (default 0 = no limit)
     """
     #scholar_client = Scholar(api_key="", base_url="https://api.semanticscholar.org")
-    result = scholar_client.get_references_info(title)
-    return json.dumps(result, ensure_ascii=False, indent=2)
+    progress = None
+    if ctx is not None:
+        field_list = parse_fields(fields)
+
+        async def progress(stage: str, data: Dict[str, Any]):
+            # 进度：主论文算 1 步，每篇参考文献算 1 步
+            total = data['total'] + 1
+            if stage == 'main_paper':
+                await ctx.report_progress(1, total, f"已找到论文: {data['main_paper'].get('title')}")
+                partial = {'stage': stage, 'main_paper': data['main_paper']}
+            else:
+                await ctx.report_progress(data['done'] + 1, total, f"参考文献 {data['done']}/{data['total']}")
+                partial = {'stage': stage, 'offset': data['offset'], 'references': data['references']}
+            if field_list:
+                partial = project_fields(partial, field_list)
+            await ctx.info(dumps(partial, compact=True), logger_name='get_paper_references_analysis')
+
+    with track_tool('get_paper_references_analysis') as call, deadline(TOOL_TIMEOUT):
+        result = await get_scholar().get_references_info(title, max_references=max_references or None,
+                                                          refresh=refresh, progress=progress)
+        call.check(result)
+        return render_response(result, fields=fields, compact=compact, max_bytes=max_bytes, max_tokens=max_tokens)
 
 @mcp.tool
-def get_paper_details(paper_id: str) -> str:
+async def get_paper_details(paper_id: str, refresh: bool = False, fields: str = "", compact: bool = False,
+                            max_bytes: int = 0, max_tokens: int = 0) -> str:
     """
     Get detailed metadata for a specific paper using its ID or DOI.
     
     Args:
         paper_id: The Semantic Scholar ID or DOI (e.g., "10.1109/CVPR.2020.00000")
+        refresh: Skip the local cache and fetch fresh data (default False)
+        fields: Comma-separated fields to keep for each paper, e.g. "title,year,authors.name" (default all)
+        compact: Return minified JSON without indentation (default False)
+        max_bytes: Shorten abstracts and reference lists to fit this many bytes (default 0 = no limit)
+        max_tokens: Same as max_bytes, in approximate LLM tokens (default 0 = no limit)
     """
     #scholar_client = Scholar(api_key="", base_url="https://api.semanticscholar.org")
-    result = scholar_client.get_paper_details(paper_id)
-    return json.dumps(result, ensure_ascii=False, indent=2)
+    with track_tool('get_paper_details') as call, deadline(TOOL_TIMEOUT):
+        # 有字段投影时只向上游请求这些字段，避免拉取完整的 references 与 citationStyles
+        result = await get_scholar().get_paper_details(paper_id, fields=upstream_fields(fields), refresh=refresh)
+        call.check(result)
+        return render_response(result, fields=fields, compact=compact, max_bytes=max_bytes, max_tokens=max_tokens)
+
+@mcp.tool
+async def crawl_citation_graph(seed: str, depth: int = 2, direction: str = "both", max_nodes: int = 200,
+                               concurrency: int = 4, min_citation_count: int = 0, refresh: bool = False,
+                               fields: str = "", compact: bool = False,
+                               max_bytes: int = 0, max_tokens: int = 0) -> str:
+    """
+    Crawl the citation graph breadth-first from a seed paper (title, Semantic Scholar ID or DOI).
+    Each level is fetched with a few batched requests. Useful for multi-hop literature reviews.
+    
+    Args:
+        seed: Title, Semantic Scholar paper ID or DOI of the seed paper.
+        depth: Number of hops to expand from the seed (default 2)
+        direction: "references", "citations" or "both" (default "both")
+        max_nodes: Maximum number of papers in the result graph (default 200)
+        concurrency: Maximum concurrent batch requests per level (default 4)
+        min_citation_count: Skip neighbours cited fewer times than this (default 0)
+        refresh: Skip the local cache and fetch fresh data (default False)
+        fields: Comma-separated fields to keep for each paper, e.g. "title,year,authors.name" (default all)
+        compact: Return minified JSON without indentation (default False)
+        max_bytes: Shorten abstracts and reference lists to fit this many bytes (default 0 = no limit)
+        max_tokens: Same as max_bytes, in approximate LLM tokens (default 0 = no limit)
+    """
+    with track_tool('crawl_citation_graph') as call, deadline(TOOL_TIMEOUT):
+        result = await get_scholar().crawl_citation_graph(
+            seed, depth=depth, direction=direction, max_nodes=max_nodes, concurrency=concurrency,
+            min_citation_count=min_citation_count, refresh=refresh)
+        call.check(result)
+        return render_response(result, fields=fields, compact=compact, max_bytes=max_bytes, max_tokens=max_tokens)
+
+def bibliography_timeout(client: Scholar, items: List[str]) -> float:
+    """标题检索受限流器约束：按待检索的标题数与当前速率估算所需时间，介于 TOOL_TIMEOUT 与 BIBLIOGRAPHY_TIMEOUT 之间"""
+    titles = {reference_key(entry) for entry in map(parse_reference, items) if entry and entry[0] == 'title'}
+    rate = client.rate_limiter.rate if client.rate_limiter is not None else None
+    if not titles or not rate:
+        return TOOL_TIMEOUT
+    return min(max(BIBLIOGRAPHY_TIMEOUT, TOOL_TIMEOUT), TOOL_TIMEOUT + len(titles) / rate)
+
+@mcp.tool
+async def resolve_bibliography(references: List[str] = None, text: str = "", min_confidence: float = 0.5,
+                               concurrency: int = 8, refresh: bool = False, fields: str = "",
+                               compact: bool = False, max_bytes: int = 0, max_tokens: int = 0) -> str:
+    """
+    Resolve a whole reference list (hundreds of titles or DOIs) in one call and return
+    metadata plus GB/T 7714 citation strings, in input order, with a status and match confidence per entry.
+    Duplicates are resolved once, titles are searched concurrently and details are fetched in batches.
+    Title searches are rate limited upstream, so a long list may not finish within one call: entries whose
+    search failed or was skipped at the deadline are listed in "unresolved" and can be submitted again.
+    
+    Args:
+        references: List of paper titles, DOIs or Semantic Scholar IDs (one per item).
+        text: Alternatively, a pasted reference list with one title or DOI per line.
+        min_confidence: Minimum title similarity (0-1) to accept a search match (default 0.5)
+        concurrency: Maximum concurrent title searches (default 8)
+        refresh: Skip the local cache and fetch fresh data (default False)
+        fields: Comma-separated fields to keep for each paper, e.g. "title,year,authors.name" (default all)
+        compact: Return minified JSON without indentation (default False)
+        max_bytes: Shorten abstracts and reference lists to fit this many bytes (default 0 = no limit)
+        max_tokens: Same as max_bytes, in approximate LLM tokens (default 0 = no limit)
+    """
+    items = list(references or []) + [line for line in text.splitlines() if line.strip()]
+    if not items:
+        return json.dumps({"error": "需要提供 references 或 text"}, ensure_ascii=False)
+    client = get_scholar()
+    with track_tool('resolve_bibliography') as call, deadline(bibliography_timeout(client, items)):
+        result = await client.resolve_bibliography(items, min_confidence=min_confidence,
+                                                   concurrency=concurrency, refresh=refresh)
+        call.check(result)
+        return render_response(result, fields=fields, compact=compact, max_bytes=max_bytes, max_tokens=max_tokens)
+
+@mcp.tool
+async def get_co_citation(paper_a: str, paper_b: str, refresh: bool = False, fields: str = "",
+                          compact: bool = False, max_bytes: int = 0, max_tokens: int = 0) -> str:
+    """
+    Count the papers that cite both paper A and paper B (co-citation), using the local citation graph.
+    Citations not yet in the graph are fetched first (paginated); "incomplete" lists any truncated or failed fetch.
+    
+    Args:
+        paper_a: Title, Semantic Scholar paper ID or DOI of the first paper.
+        paper_b: Title, Semantic Scholar paper ID or DOI of the second paper.
+        refresh: Re-fetch both papers' references and citations before counting (default False)
+        fields: Comma-separated fields to keep for each paper, e.g. "title,year" (default all)
+        compact: Return minified JSON without indentation (default False)
+        max_bytes: Shorten long lists to fit this many bytes (default 0 = no limit)
+        max_tokens: Same as max_bytes, in approximate LLM tokens (default 0 = no limit)
+    """
+    with track_tool('get_co_citation') as call, deadline(TOOL_TIMEOUT):
+        result = await get_scholar().graph_overlap(paper_a, paper_b, kind='cocitation', refresh=refresh)
+        call.check(result)
+        return render_response(result, fields=fields, compact=compact, max_bytes=max_bytes, max_tokens=max_tokens)
+
+@mcp.tool
+async def get_bibliographic_coupling(paper_a: str, paper_b: str, refresh: bool = False, fields: str = "",
+                                     compact: bool = False, max_bytes: int = 0, max_tokens: int = 0) -> str:
+    """
+    Count the references shared by paper A and paper B (bibliographic coupling), using the local citation graph.
+    References not yet in the graph are fetched first (paginated); "incomplete" lists any truncated or failed fetch.
+    
+    Args:
+        paper_a: Title, Semantic Scholar paper ID or DOI of the first paper.
+        paper_b: Title, Semantic Scholar paper ID or DOI of the second paper.
+        refresh: Re-fetch both papers' references and citations before counting (default False)
+        fields: Comma-separated fields to keep for each paper, e.g. "title,year" (default all)
+        compact: Return minified JSON without indentation (default False)
+        max_bytes: Shorten long lists to fit this many bytes (default 0 = no limit)
+        max_tokens: Same as max_bytes, in approximate LLM tokens (default 0 = no limit)
+    """
+    with track_tool('get_bibliographic_coupling') as call, deadline(TOOL_TIMEOUT):
+        result = await get_scholar().graph_overlap(paper_a, paper_b, kind='coupling', refresh=refresh)
+        call.check(result)
+        return render_response(result, fields=fields, compact=compact, max_bytes=max_bytes, max_tokens=max_tokens)
+
+@mcp.tool
+async def find_related_papers(paper: str, k: int = 10, method: str = "combined", refresh: bool = False,
+                              fields: str = "", compact: bool = False, max_bytes: int = 0,
+                              max_tokens: int = 0) -> str:
+    """
+    Find the top-k papers most related to a paper in the local citation graph,
+    ranked by co-citation count, bibliographic coupling, or both.
+    The paper's citations/references and their second hop are filled in first; "incomplete" lists any gaps.
+    
+    Args:
+        paper: Title, Semantic Scholar paper ID or DOI.
+        k: Number of related papers to return (default 10)
+        method: "cocitation", "coupling" or "combined" (default "combined")
+        refresh: Re-fetch the paper's references and citations first (default False)
+        fields: Comma-separated fields to keep for each paper, e.g. "title,year" (default all)
+        compact: Return minified JSON without indentation (default False)
+        max_bytes: Shorten long lists to fit this many bytes (default 0 = no limit)
+        max_tokens: Same as max_bytes, in approximate LLM tokens (default 0 = no limit)
+    """
+    with track_tool('find_related_papers') as call, deadline(TOOL_TIMEOUT):
+        result = await get_scholar().related_papers(paper, k=k, method=method, refresh=refresh)
+        call.check(result)
+        return render_response(result, fields=fields, compact=compact, max_bytes=max_bytes, max_tokens=max_tokens)
+
+def confined_path(name: str) -> str:
+    """把工具参数中的文件名解析为 BIB_DIR 下的路径（解析符号链接后仍须位于目录内），否则抛出 ValueError"""
+    if not BIB_DIR:
+        raise ValueError("服务器未配置 SCHOLAR_BIB_DIR，不允许读写文件")
+    root = os.path.realpath(BIB_DIR)
+    target = os.path.realpath(os.path.join(root, name))
+    if target == root or os.path.commonpath([root, target]) != root:
+        raise ValueError(f"路径不在 SCHOLAR_BIB_DIR 内: {name}")
+    return target
+
+
+@mcp.tool
+async def convert_bibtex_bibliography(bibtex: str = "", path: str = "", output_path: str = "",
+                                      workers: int = 0) -> str:
+    """
+    Convert a whole BibTeX bibliography to GB/T 7714 citation strings.
+    Entries are parsed in a shared process pool and returned in input order, with per-entry errors.
+    
+    Args:
+        bibtex: BibTeX text containing one or more entries.
+        path: Name of a .bib file inside the server's SCHOLAR_BIB_DIR (used when bibtex is empty).
+        output_path: Optional file name inside SCHOLAR_BIB_DIR to write JSON lines to instead of returning every result.
+        workers: Maximum number of worker processes to use (default 0 = CPU count)
+    """
+    if not bibtex and not path:
+        return json.dumps({"error": "需要提供 bibtex 或 path"}, ensure_ascii=False)
+    try:
+        input_file = confined_path(path) if not bibtex else None
+        output_file_path = confined_path(output_path) if output_path else None
+    except ValueError as e:
+        return json.dumps({"error": str(e)}, ensure_ascii=False)
+
+    def run():
+        source = open(input_file, encoding='utf-8') if input_file else bibtex.splitlines(keepends=True)
+        try:
+            # 单块输入直接在当前线程转换，只有多块输入才使用共享进程池
+            options = {'workers': workers or None, 'pool': shared_pool()}
+            if output_file_path:
+                with open(output_file_path, 'w', encoding='utf-8') as output_file:
+                    stats = convert_file(source, output_file, output_format='jsonl', **options)
+                return {"output_path": output_path, **stats}
+            results = list(convert_entries(iter_bibtex_entries(source), **options))
+            return {"total": len(results), "errors": sum(1 for r in results if r['error']), "results": results}
+        finally:
+            if input_file:
+                source.close()
+
+    with track_tool('convert_bibtex_bibliography') as call:
+        result = await asyncio.to_thread(run)
+        call.check(result)
+        return render_response(result)
+
+
+@mcp.tool
+async def server_stats() -> str:
+    """
+    Report server health and performance counters: upstream latency percentiles,
+    retries and errors by status, cache hit ratios, rate-limiter wait, per-tool and
+    per-stage timings, hedged requests, plus per-backend health, circuit breaker and cache state.
+    The same metrics are served in Prometheus text format at /metrics.
+    In multi-worker mode the counters are per worker process (see "pid").
+    """
+    client = get_scholar()
+
+    def storage_stats() -> Dict[str, Any]:
+        # 这些统计需要查询 SQLite / 磁盘，在线程中读取
+        return {
+            "response_cache": client.cache.stats() if client.cache is not None else None,
+            "title_index": len(client.title_index) if client.title_index is not None else None,
+            "offline_index": client.offline_index.stats() if client.offline_index is not None else None,
+            "citation_graph": client.citation_graph.stats() if client.citation_graph is not None else None,
+        }
+
+    storage = await asyncio.to_thread(storage_stats)
+    stats = {
+        "pid": os.getpid(),
+        "workers": WORKERS,
+        "cache_hit_ratio": cache_hit_ratios(),
+        "circuit_breaker": client.circuit_breaker.state,
+        "rate_limit": round(client.rate_limiter.rate, 3) if client.rate_limiter is not None else None,
+        "backends": [backend.stats() for backend in client.backends],
+        "response_cache": storage["response_cache"],
+        "background_refresh": client.refresher.stats() if client.refresher is not None else None,
+        "paper_store": len(client.paper_store) if client.paper_store is not None else None,
+        "title_index": storage["title_index"],
+        "offline_index": storage["offline_index"],
+        "citation_graph": storage["citation_graph"],
+        "metrics": REGISTRY.snapshot(),
+    }
+    return render_response(stats)
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> Response:
+    """Prometheus 抓取接口（SSE / HTTP 传输下与 MCP 服务同端口）"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # --- 服务器入口 ---
-#if __name__ == "__main__":
-    # 打印启动提示
-#    logger.info("正在启动 Scholar MCP Server (SSE 模式)...")
-#    logger.info("SSE 访问地址: http://0.0.0.0:8000/sse")
-
-    # 启动 SSE 服务
-    # FastMCP 默认在 transport='sse' 时会使用 uvicorn 启动
-#    mcp.run(transport='sse')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scholar MCP Server")
+    parser.add_argument('--transport', choices=('stdio', 'sse', 'http'),
+                        default=os.environ.get("SCHOLAR_TRANSPORT", "stdio"),
+                        help="stdio：由 MCP 客户端按会话启动（默认）；sse / http：常驻的网络服务")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    if args.transport == 'stdio':
+        # stdout 用于 MCP 消息，日志由 loguru 写到 stderr
+        mcp.run(transport='stdio', show_banner=False)
+        return 0
+    path = 'sse' if args.transport == 'sse' else 'mcp'
+    logger.info(f"正在启动 Scholar MCP Server ({args.transport} 模式): http://{args.host}:{args.port}/{path}")
+    mcp.run(transport=args.transport, host=args.host, port=args.port, show_banner=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import asyncio
+import functools
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from loguru import logger
+
+
+def freeze(value: Any) -> Hashable:
+    """把参数转换为可哈希的形式，用作合并请求的键"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, set):
+        return tuple(sorted(freeze(v) for v in value))
+    return value
+
+
+class SingleFlight:
+    """
+    请求合并：相同键的并发调用共享同一次正在进行的执行，全部调用方拿到同一个结果
+    执行结束后立即移除，不做结果缓存
+    调用方可以订阅某个键的进度事件，执行中通过 broadcaster(key) 推送给所有订阅者
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._listeners: Dict[Hashable, List[Callable[..., Awaitable]]] = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = future
+
+            def _forget(done, key=key):
+                if self._calls.get(key) is done:
+                    del self._calls[key]
+
+            future.add_done_callback(_forget)
+        # shield：某个调用方被取消时不影响其他等待者
+        return await asyncio.shield(future)
+
+    def subscribe(self, key: Hashable, listener: Callable[..., Awaitable]):
+        self._listeners.setdefault(key, []).append(listener)
+
+    def unsubscribe(self, key: Hashable, listener: Callable[..., Awaitable]):
+        listeners = self._listeners.get(key)
+        if listeners and listener in listeners:
+            listeners.remove(listener)
+            if not listeners:
+                del self._listeners[key]
+
+    def broadcaster(self, key: Hashable) -> Callable[..., Awaitable]:
+        """返回把事件转发给该键当前所有订阅者的回调；单个订阅者出错不影响执行本身"""
+        async def broadcast(*args, **kwargs):
+            for listener in list(self._listeners.get(key, ())):
+                try:
+                    await listener(*args, **kwargs)
+                except Exception as e:
+                    logger.warning(f"进度回调失败: {e}")
+
+        return broadcast
+
+
+def coalesce(method=None, *, listener: Optional[str] = None):
+    """
+    Scholar 方法装饰器：同一实例上参数相同的并发调用只执行一次
+    实例需要有 single_flight 属性（为 None 时直接调用）
+    listener 指定进度回调参数名：该参数不参与合并键，合并到同一次执行的调用方都会收到进度事件
+    （首个调用方未传回调时执行本身不产生进度事件）
+    """
+    if method is None:
+        return functools.partial(coalesce, listener=listener)
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        flight = getattr(self, 'single_flight', None)
+        if flight is None:
+            return await method(self, *args, **kwargs)
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        callback = None
+        if listener is not None:
+            callback = bound.arguments[listener]
+            bound.arguments[listener] = None
+        key = (method.__name__, freeze(dict(list(bound.arguments.items())[1:])))
+        if callback is None:
+            return await flight.do(key, method, *bound.args, **bound.kwargs)
+        flight.subscribe(key, callback)
+        try:
+            bound.arguments[listener] = flight.broadcaster(key)
+            return await flight.do(key, method, *bound.args, **bound.kwargs)
+        finally:
+            flight.unsubscribe(key, callback)
+
+    return wrapper
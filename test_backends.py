@@ -0,0 +1,113 @@
+"""
+多上游：对冲请求（超过延迟分位数才发出、落败请求被取消、失败时换下一个上游）与按健康分排序
+
+用法:
+    python -m pytest -q test_backends.py
+"""
+import asyncio
+import time
+
+from backends import Attempt, Backend, hedged, rank_backends
+
+
+def make_backends(*names, latency=None):
+    backends = [Backend(f'https://{name}.example.org', name=name) for name in names]
+    if latency is not None:
+        for backend in backends:
+            for _ in range(20):
+                backend.record(True, latency)
+    return backends
+
+
+class FakeUpstream:
+    """按上游名字决定响应：(延迟秒数, 是否成功, 是否永久错误)；记录发出时间与被取消的请求"""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.started = {}
+        self.cancelled = []
+        self.t0 = time.monotonic()
+
+    async def send(self, backend: Backend) -> Attempt:
+        self.started[backend.name] = time.monotonic() - self.t0
+        delay, ok, permanent = self.behaviour[backend.name]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(backend.name)
+            raise
+        if ok:
+            return Attempt(backend, result={'from': backend.name})
+        return Attempt(backend, reason='404' if permanent else '503', permanent=permanent)
+
+
+def run_hedged(backends, behaviour, **kwargs):
+    upstream = FakeUpstream(behaviour)
+    hedges = []
+
+    async def main():
+        attempt = await hedged(backends, upstream.send, on_hedge=lambda b, reason: hedges.append((b.name, reason)),
+                               **kwargs)
+        # 让被取消的任务处理 CancelledError
+        await asyncio.sleep(0)
+        return attempt
+
+    return asyncio.run(main()), upstream, hedges
+
+
+def test_hedge_fires_after_the_latency_percentile_and_the_loser_is_cancelled():
+    backends = make_backends('a', 'b', latency=0.1)
+    attempt, upstream, hedges = run_hedged(backends, {'a': (5, True, False), 'b': (0, True, False)},
+                                           percentile=0.9)
+    assert attempt.result == {'from': 'b'}
+    assert hedges == [('b', 'slow')]
+    # 对冲请求在首选上游的 p90 延迟（0.1 秒）之后才发出
+    assert 0.1 <= upstream.started['b'] < 1
+    assert upstream.cancelled == ['a']
+
+
+def test_no_hedge_when_the_primary_answers_within_the_delay():
+    backends = make_backends('a', 'b', latency=0.5)
+    attempt, upstream, hedges = run_hedged(backends, {'a': (0.01, True, False), 'b': (0, True, False)})
+    assert attempt.result == {'from': 'a'}
+    assert hedges == [] and 'b' not in upstream.started
+
+
+def test_failed_primary_falls_through_to_the_next_backend_without_waiting():
+    backends = make_backends('a', 'b', 'c', latency=5)
+    attempt, upstream, hedges = run_hedged(backends, {'a': (0, False, False), 'b': (0, False, False),
+                                                      'c': (0, True, False)}, max_hedges=2)
+    assert attempt.result == {'from': 'c'}
+    assert hedges == [('b', 'failover'), ('c', 'failover')]
+    assert upstream.started['c'] < 1
+
+
+def test_permanent_error_is_returned_without_trying_other_backends():
+    backends = make_backends('a', 'b')
+    attempt, upstream, _ = run_hedged(backends, {'a': (0, False, True), 'b': (0, True, False)})
+    assert attempt.permanent and attempt.backend is backends[0]
+    assert 'b' not in upstream.started
+
+
+def test_all_failed_returns_a_retryable_failure():
+    backends = make_backends('a', 'b')
+    attempt, _, _ = run_hedged(backends, {'a': (0, False, False), 'b': (0, False, False)})
+    assert not attempt.ok and attempt.retryable
+
+
+def test_rank_puts_open_breakers_and_unhealthy_backends_out_of_the_way():
+    a, b, c, d = make_backends('a', 'b', 'c', 'd')
+    for _ in range(10):
+        b.record(False)
+    for _ in range(5):
+        c.circuit_breaker.record_failure()
+    for _ in range(20):
+        d.record(True, 1.0)
+    # a 健康且无延迟，d 较慢，b 成功率过低，c 熔断打开
+    assert rank_backends([a, b, c, d]) == [a, d]
+    # 没有健康的上游时仍返回不健康的，熔断打开的始终不参与
+    assert rank_backends([b, c]) == [b]
+    assert rank_backends([c]) == []
+    # 健康分相同时保持配置顺序
+    e, f = make_backends('e', 'f')
+    assert rank_backends([f, e]) == [f, e]
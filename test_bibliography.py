@@ -0,0 +1,135 @@
+"""
+批量解析参考文献：输入规范化（DOI / 编号前缀）与 resolve_bibliography 的请求路径
+
+用法:
+    python -m pytest -q test_bibliography.py
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from shcolar_server import Scholar, parse_reference
+
+
+@pytest.mark.parametrize('item, expected', [
+    ('10.1109/CVPR.2020.00001', ('id', 'DOI:10.1109/cvpr.2020.00001')),
+    ('10.5555/mock.7', ('id', 'DOI:10.5555/mock.7')),
+    ('doi:10.1145/3292500.3330701', ('id', 'DOI:10.1145/3292500.3330701')),
+    ('DOI: 10.1145/3292500.3330701.', ('id', 'DOI:10.1145/3292500.3330701')),
+    ('https://doi.org/10.1038/nature14539', ('id', 'DOI:10.1038/nature14539')),
+    ('[3] 10.1109/CVPR.2016.90', ('id', 'DOI:10.1109/cvpr.2016.90')),
+    ('12. Attention Is All You Need.', ('title', 'Attention Is All You Need')),
+    ('(4) Deep Residual Learning', ('title', 'Deep Residual Learning')),
+    ('2020 Survey of Pose Estimation', ('title', '2020 Survey of Pose Estimation')),
+    ('204e3073870fae3d05bcbc2f6a8e263d9b72e776', ('id', '204e3073870fae3d05bcbc2f6a8e263d9b72e776')),
+    ('  ', None),
+    ('[7]', None),
+])
+def test_parse_reference(item, expected):
+    assert parse_reference(item) == expected
+
+
+def test_resolve_bibliography_sends_dois_to_batch():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path.endswith('/paper/batch'):
+            ids = json.loads(request.content)['ids']
+            return httpx.Response(200, json=[{'paperId': f'{i:040x}', 'title': paper_id}
+                                             for i, paper_id in enumerate(ids)])
+        if request.url.path.endswith('/paper/search'):
+            return httpx.Response(200, json={'data': [{'paperId': 'f' * 40, 'title': 'Attention Is All You Need'}]})
+        return httpx.Response(404)
+
+    async def run():
+        scholar = Scholar(base_url='https://api.semanticscholar.org', coalesce_requests=False)
+        scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await scholar.resolve_bibliography([
+                '10.5555/mock.7', 'doi:10.5555/MOCK.7', 'https://doi.org/10.1109/CVPR.2016.90',
+                '1. Attention is all you need',
+            ])
+        finally:
+            await scholar.aclose()
+
+    result = asyncio.run(run())
+    assert [path.rsplit('/', 1)[-1] for path in calls].count('search') == 1
+    assert result['resolved'] == 4
+    assert [r['source'] for r in result['results']] == ['id', 'id', 'id', 'search']
+    assert result['results'][0]['paper']['title'] == 'DOI:10.5555/mock.7'
+    assert result['results'][1]['paper'] == result['results'][0]['paper']
+
+
+def make_scholar(handler, **kwargs):
+    scholar = Scholar(base_url='https://api.semanticscholar.org', coalesce_requests=False, **kwargs)
+    scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return scholar
+
+
+def search_handler(request: httpx.Request) -> httpx.Response:
+    """标题含 missing 时检索成功但没有结果，含 broken 时返回不可重试的错误，其余按标题返回一篇论文"""
+    if request.url.path.endswith('/paper/search'):
+        query = request.url.params['query']
+        if 'missing' in query:
+            return httpx.Response(200, json={'total': 0, 'offset': 0})
+        if 'broken' in query:
+            return httpx.Response(400, json={'error': 'bad query'})
+        return httpx.Response(200, json={'data': [{'paperId': f'{abs(hash(query)):040x}'[:40], 'title': query}]})
+    if request.url.path.endswith('/paper/batch'):
+        return httpx.Response(200, json=[{'paperId': paper_id, 'title': 'T'}
+                                         for paper_id in json.loads(request.content)['ids']])
+    return httpx.Response(404)
+
+
+def test_failures_are_not_reported_as_misses():
+    async def run():
+        scholar = make_scholar(search_handler)
+        try:
+            return await scholar.resolve_bibliography(['A missing paper title', 'A broken paper title',
+                                                       'An existing paper title'])
+        finally:
+            await scholar.aclose()
+
+    result = asyncio.run(run())
+    assert [r['status'] for r in result['results']] == ['not_found', 'failed', 'resolved']
+    assert result['not_found'] == 1 and result['resolved'] == 1
+    assert result['unresolved'] == ['A broken paper title']
+
+
+def test_rate_limited_batch_returns_unresolved_entries_at_the_deadline():
+    from ratelimit import AdaptiveRateLimiter
+    from resilience import deadline
+
+    titles = [f'Paper title number {i}' for i in range(20)]
+
+    async def run():
+        scholar = make_scholar(search_handler, rate_limiter=AdaptiveRateLimiter(rate=5.0, burst=1))
+        scholar.BIBLIOGRAPHY_BATCH_RESERVE = 0.5
+        try:
+            with deadline(2.0):
+                return await scholar.resolve_bibliography(titles)
+        finally:
+            await scholar.aclose()
+
+    result = asyncio.run(run())
+    statuses = [r['status'] for r in result['results']]
+    assert 'not_found' not in statuses
+    assert 0 < result['resolved'] < len(titles)
+    assert result['resolved'] + len(result['unresolved']) == len(titles)
+    assert set(result['unresolved']) == {r['input'] for r in result['results'] if r['status'] != 'resolved'}
+
+
+def test_bibliography_timeout_scales_with_titles(monkeypatch):
+    import shcolar_server
+    from ratelimit import AdaptiveRateLimiter
+
+    monkeypatch.setattr(shcolar_server, 'TOOL_TIMEOUT', 60.0)
+    monkeypatch.setattr(shcolar_server, 'BIBLIOGRAPHY_TIMEOUT', 300.0)
+    scholar = Scholar(base_url='https://api.semanticscholar.org', rate_limiter=AdaptiveRateLimiter(rate=1.0))
+    timeout = shcolar_server.bibliography_timeout
+    assert timeout(scholar, ['10.1234/a', '10.1234/b']) == 60.0
+    assert timeout(scholar, [f'Title number {i}' for i in range(30)] + ['title number 0']) == 90.0
+    assert timeout(scholar, [f'Title number {i}' for i in range(500)]) == 300.0
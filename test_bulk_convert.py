@@ -0,0 +1,76 @@
+"""
+批量 BibTeX 转换：条目切分、按输入顺序返回，以及 MCP 工具的文件访问限制
+
+用法:
+    python -m pytest -q test_bulk_convert.py
+"""
+import asyncio
+import json
+
+import pytest
+
+import bulk_convert
+import shcolar_server
+from bulk_convert import convert_entries, iter_bibtex_entries
+
+
+def make_entries(n: int):
+    return [f"@article{{key{i},\n  author = {{Smith, John}},\n  title = {{Title {i}}},\n"
+            f"  journal = {{J}},\n  year = {{2020}}\n}}" for i in range(n)]
+
+
+def test_iter_bibtex_entries_splits_on_brace_depth():
+    text = "comment\n@article{a, title = {x {y}}}\n@book(b, title = \"z\")\n"
+    assert list(iter_bibtex_entries(text.splitlines(keepends=True))) == [
+        '@article{a, title = {x {y}}}', '@book(b, title = "z")']
+
+
+def test_single_chunk_converts_in_process(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("不应为单块输入启动进程池")
+    monkeypatch.setattr(bulk_convert, 'ProcessPoolExecutor', fail)
+    results = list(convert_entries(make_entries(3), workers=8))
+    assert [r['key'] for r in results] == ['key0', 'key1', 'key2']
+    assert all(r['error'] is None for r in results)
+
+
+def test_shared_pool_keeps_input_order():
+    entries = make_entries(50) + ['@article{broken, title = {unclosed']
+    results = list(convert_entries(entries, workers=2, chunk_size=8, pool=bulk_convert.shared_pool()))
+    assert [r['index'] for r in results] == list(range(51))
+    assert results[49]['gbt7714'].startswith('Smith J')
+    assert results[50]['error']
+    assert bulk_convert.shared_pool() is bulk_convert.shared_pool()
+
+
+def call_tool(**kwargs):
+    tool = shcolar_server.convert_bibtex_bibliography
+    return json.loads(asyncio.run(getattr(tool, 'fn', tool)(**kwargs)))
+
+
+def test_tool_file_access_disabled_without_bib_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(shcolar_server, 'BIB_DIR', '')
+    secret = tmp_path / 'secret.bib'
+    secret.write_text(make_entries(1)[0], encoding='utf-8')
+    assert 'error' in call_tool(path=str(secret))
+    assert 'error' in call_tool(bibtex=make_entries(1)[0], output_path=str(tmp_path / 'out.jsonl'))
+    assert not (tmp_path / 'out.jsonl').exists()
+
+
+@pytest.mark.parametrize('name', ['../outside.bib', '/etc/passwd', 'link/outside.bib'])
+def test_tool_rejects_paths_outside_bib_dir(monkeypatch, tmp_path, name):
+    root = tmp_path / 'bib'
+    root.mkdir()
+    (tmp_path / 'outside.bib').write_text(make_entries(1)[0], encoding='utf-8')
+    (root / 'link').symlink_to(tmp_path)
+    monkeypatch.setattr(shcolar_server, 'BIB_DIR', str(root))
+    assert 'error' in call_tool(path=name)
+    assert 'error' in call_tool(bibtex=make_entries(1)[0], output_path=name)
+
+
+def test_tool_reads_and_writes_inside_bib_dir(monkeypatch, tmp_path):
+    (tmp_path / 'refs.bib').write_text('\n'.join(make_entries(2)), encoding='utf-8')
+    monkeypatch.setattr(shcolar_server, 'BIB_DIR', str(tmp_path))
+    assert call_tool(path='refs.bib')['total'] == 2
+    assert call_tool(path='refs.bib', output_path='out/../refs.jsonl')['total'] == 2
+    assert len((tmp_path / 'refs.jsonl').read_text(encoding='utf-8').splitlines()) == 2
@@ -0,0 +1,82 @@
+"""
+响应缓存：按最近访问淘汰、跨进程等待租约持有者的结果，以及 Scholar 在线程中读写缓存
+
+用法:
+    python -m pytest -q test_cache.py
+"""
+import asyncio
+import threading
+
+import httpx
+
+from cache import ResponseCache
+
+
+def test_eviction_keeps_recently_accessed_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_bytes=20000)
+    value = {'text': 'x' * 90}
+    for i in range(600):
+        cache.set(f'k{i}', '/paper/x', value)
+        if i % 100 == 0:
+            assert cache.get('k0') == value
+    stats = cache.stats()
+    assert stats['bytes'] <= cache.max_bytes
+    assert cache.get('k0') == value
+    assert cache.get('k1') is None
+    assert cache.get('k599') == value
+    cache.close()
+
+
+def test_wait_for_sees_value_written_by_lease_holder(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    holder, waiter = ResponseCache(path), ResponseCache(path)
+    assert holder.claim('key')
+    assert not waiter.claim('key')
+
+    def finish():
+        holder.set('key', '/paper/x', {'paperId': 'p'})
+        holder.release('key')
+
+    async def main():
+        threading.Timer(0.1, finish).start()
+        return await waiter.wait_for('key', timeout=5)
+
+    assert asyncio.run(main()) == {'paperId': 'p'}
+    assert asyncio.run(waiter.wait_for('missing', timeout=1)) is None
+    holder.close()
+    waiter.close()
+
+
+def test_scholar_reads_and_writes_cache_off_the_event_loop(tmp_path):
+    from shcolar_server import Scholar
+
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    threads = []
+    for name in ('lookup', 'set'):
+        method = getattr(cache, name)
+
+        def traced(*args, _method=method, **kwargs):
+            threads.append(threading.get_ident())
+            return _method(*args, **kwargs)
+        setattr(cache, name, traced)
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={'paperId': 'a' * 40, 'title': 'T'})
+
+    async def main():
+        scholar = Scholar(base_url='https://api.semanticscholar.org', coalesce_requests=False, cache=cache)
+        scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            first = await scholar.get_paper_details('a' * 40)
+            second = await scholar.get_paper_details('a' * 40)
+            return first, second, threading.get_ident()
+        finally:
+            await scholar.aclose()
+
+    first, second, loop_thread = asyncio.run(main())
+    assert first == second and first['title'] == 'T'
+    assert len(calls) == 1
+    assert threads and loop_thread not in threads
+    cache.close()
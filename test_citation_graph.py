@@ -0,0 +1,198 @@
+"""
+本地引用图：CSR 合并与查询，以及 Scholar 按查询需要的方向补齐引用关系
+
+用法:
+    python -m pytest -q test_citation_graph.py
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+
+import httpx
+import pytest
+
+pytest.importorskip('numpy')
+
+import citation_graph  # noqa: E402
+from citation_graph import CitationGraph  # noqa: E402
+from paper_store import PaperStore  # noqa: E402
+from cache import ResponseCache  # noqa: E402
+from shcolar_server import Scholar  # noqa: E402
+
+
+def pid(i: int) -> str:
+    return hashlib.sha1(str(i).encode()).hexdigest()
+
+
+def test_overlaps_survive_flush_and_reopen(tmp_path):
+    graph = CitationGraph(str(tmp_path))
+    graph.add_edges(pid(1), [{'paperId': pid(10)}, {'paperId': pid(11)}, {'paperId': pid(12), 'title': 'T12'}])
+    graph.add_edges(pid(2), [{'paperId': pid(10)}, {'paperId': pid(11)}])
+    graph.add_edges(pid(10), [{'paperId': pid(3)}], kind='citations')
+    before = (graph.coupling(pid(1), pid(2))['count'], graph.co_citation(pid(10), pid(11))['count'],
+              [r['paperId'] for r in graph.related(pid(1))])
+    assert before[:2] == (2, 2)
+    graph.mark_complete(pid(1), 'references')
+    graph.close()
+
+    reopened = CitationGraph(str(tmp_path))
+    assert (reopened.coupling(pid(1), pid(2))['count'], reopened.co_citation(pid(10), pid(11))['count'],
+            [r['paperId'] for r in reopened.related(pid(1))]) == before
+    assert reopened.paper(pid(12))['title'] == 'T12'
+    assert reopened.is_complete(pid(1), 'references')
+    assert not reopened.is_complete(pid(1), 'citations')
+    assert sorted(reopened.neighbors(pid(10), 'citations')) == sorted([pid(1), pid(2), pid(3)])
+
+
+N = 3000
+# 论文 i 引用 i+1..i+5；论文 0 与 1 被所有 i >= 2 的论文引用（施引文献超过一页）
+REFERENCES = {i: [j for j in range(i + 1, i + 6) if j < N] for i in range(N)}
+for i in range(2, N):
+    REFERENCES[i] += [0, 1]
+CITATIONS = {i: [] for i in range(N)}
+for i, refs in REFERENCES.items():
+    for j in refs:
+        CITATIONS[j].append(i)
+INDEX = {pid(i): i for i in range(N)}
+
+
+def make_scholar(tmp_path, calls, **kwargs):
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        match = re.search(r'/paper/([0-9a-f]{40})/(references|citations)$', request.url.path)
+        if match:
+            node, kind = INDEX[match.group(1)], match.group(2)
+            offset, limit = int(request.url.params['offset']), int(request.url.params['limit'])
+            items = (REFERENCES if kind == 'references' else CITATIONS)[node]
+            key = 'citedPaper' if kind == 'references' else 'citingPaper'
+            body = {'offset': offset, 'data': [{key: {'paperId': pid(j)}} for j in items[offset:offset + limit]]}
+            if offset + limit < len(items):
+                body['next'] = offset + limit
+            return httpx.Response(200, json=body)
+        if request.url.path.endswith('/paper/batch'):
+            kind = request.url.params['fields'].split('.')[0]
+            adjacency = REFERENCES if kind == 'references' else CITATIONS
+            count_field = 'referenceCount' if kind == 'references' else 'citationCount'
+            return httpx.Response(200, json=[{'paperId': paper_id, count_field: len(adjacency[INDEX[paper_id]]),
+                                              kind: [{'paperId': pid(j)} for j in adjacency[INDEX[paper_id]]]}
+                                             for paper_id in json.loads(request.content)['ids']])
+        return httpx.Response(404)
+
+    scholar = Scholar(base_url='https://api.semanticscholar.org', coalesce_requests=False,
+                      citation_graph=CitationGraph(str(tmp_path)), **kwargs)
+    scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return scholar
+
+
+def run(scholar, coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await scholar.aclose()
+    return asyncio.run(main())
+
+
+def test_coupling_fetches_references_of_papers_seen_as_neighbours(tmp_path):
+    calls = []
+    scholar = make_scholar(tmp_path, calls)
+    # 10 和 11 先作为 9 的参考文献进入引用图（计数非零），但它们自己的参考文献还没有获取
+    scholar.citation_graph.add_edges(pid(9), [{'paperId': pid(10)}, {'paperId': pid(11)}])
+    result = run(scholar, scholar.graph_overlap(pid(10), pid(11), kind='coupling'))
+    assert result['count'] == len(set(REFERENCES[10]) & set(REFERENCES[11]))
+    assert 'incomplete' not in result
+
+
+def test_co_citation_paginates_past_one_page(tmp_path):
+    calls = []
+    scholar = make_scholar(tmp_path, calls)
+    result = run(scholar, scholar.graph_overlap(pid(0), pid(1), kind='cocitation'))
+    assert result['count'] == len(set(CITATIONS[0]) & set(CITATIONS[1])) > scholar.EDGE_PAGE_MAX
+    assert 'incomplete' not in result
+
+    # 已完整获取的方向不再请求上游
+    calls.clear()
+    scholar = make_scholar(tmp_path, calls)
+    run(scholar, scholar.graph_overlap(pid(0), pid(1), kind='cocitation'))
+    assert calls == []
+
+
+def test_truncation_is_reported(tmp_path):
+    calls = []
+    scholar = make_scholar(tmp_path, calls)
+    scholar.GRAPH_EDGE_LIMIT = 1500
+    result = run(scholar, scholar.graph_overlap(pid(0), pid(1), kind='cocitation'))
+    assert {item['status'] for item in result['incomplete']} == {'truncated'}
+    assert not scholar.citation_graph.is_complete(pid(0), 'citations')
+
+
+def test_related_fills_in_the_second_hop(tmp_path):
+    calls = []
+    scholar = make_scholar(tmp_path, calls)
+    result = run(scholar, scholar.related_papers(pid(100), k=3, method='coupling'))
+    # 100 的参考文献为 101..105、0、1；期望值按施引文献逐一累加
+    expected = {}
+    for reference in REFERENCES[100]:
+        for other in CITATIONS[reference]:
+            if other != 100:
+                expected[other] = expected.get(other, 0) + 1
+    best = max(expected.values())
+    assert result['related'][0]['coupling'] == best
+    assert INDEX[result['related'][0]['paperId']] in {i for i, count in expected.items() if count == best}
+    assert any(request.url.path.endswith('/paper/batch') for request in calls)
+
+
+def test_flags_expire_and_nested_lists_shorter_than_the_count_are_partial(tmp_path, monkeypatch):
+    graph = CitationGraph(str(tmp_path), edge_ttl={'citations': 60})
+    graph.mark_complete(pid(1), 'citations')
+    graph.mark_complete(pid(1), 'references')
+    assert graph.add_nested([{'paperId': pid(2), 'citationCount': 5, 'citations': [{'paperId': pid(3)}]},
+                             {'paperId': pid(4), 'citationCount': 1, 'citations': [{'paperId': pid(3)}]}, None],
+                            'citations') == 2
+    assert graph.stale([pid(1), pid(2), pid(4), pid(5)], 'citations') == [pid(2), pid(5)]
+    assert graph.stale([pid(1), pid(2), pid(4), pid(5)], 'citations', partial=True) == [pid(5)]
+    graph.flush()
+    now = time.time()
+    monkeypatch.setattr(citation_graph.time, 'time', lambda: now + 120)
+    reopened = CitationGraph(str(tmp_path), edge_ttl={'citations': 60})
+    # 施引文献的标记已超过有效期，参考文献的仍然有效
+    assert reopened.stale([pid(1), pid(2), pid(4)], 'citations', partial=True) == [pid(1), pid(2), pid(4)]
+    assert reopened.is_complete(pid(1), 'references')
+
+
+def test_related_second_hop_is_fetched_once_off_the_loop_and_bypasses_the_store(tmp_path, monkeypatch):
+    threads = set()
+    for name in ('add_edges', 'add_papers', 'add_nested', 'stale', 'is_complete', 'mark_complete',
+                 'neighbors', 'related', 'paper'):
+        method = getattr(CitationGraph, name)
+
+        def wrapper(self, *args, _method=method, **kwargs):
+            threads.add(threading.get_ident())
+            return _method(self, *args, **kwargs)
+        monkeypatch.setattr(CitationGraph, name, wrapper)
+
+    calls = []
+    store = PaperStore()
+    scholar = make_scholar(tmp_path, calls, paper_store=store,
+                           cache=ResponseCache(str(tmp_path / 'responses.sqlite3')))
+
+    async def main():
+        try:
+            loop_thread = threading.get_ident()
+            first = await scholar.related_papers(pid(100), k=3, method='coupling')
+            batches = sum(request.url.path.endswith('/paper/batch') for request in calls)
+            second = await scholar.related_papers(pid(100), k=3, method='coupling')
+            return loop_thread, first, second, batches
+        finally:
+            await scholar.aclose()
+
+    loop_thread, first, second, batches = asyncio.run(main())
+    assert batches == 1
+    assert sum(request.url.path.endswith('/paper/batch') for request in calls) == 1
+    assert first['related'] == second['related']
+    assert threads and loop_thread not in threads
+    # 第二跳的嵌套列表不进入论文库
+    assert store.get(pid(0), ['citations']) is None
@@ -0,0 +1,82 @@
+"""
+引用图爬取：DOI 种子先换成 paperId，种子作为邻居出现时不会再次扩展；节点预算与被引数截断
+
+用法:
+    python -m pytest -q test_crawl.py
+"""
+import asyncio
+import json
+
+import httpx
+
+from shcolar_server import Scholar
+
+A, B, C, D = ('a' * 40, 'b' * 40, 'c' * 40, 'd' * 40)
+ALIASES = {'DOI:10.1234/seed': A}
+REFERENCES = {A: [B], B: [A, C, D], C: [A], D: []}
+CITATIONS = {A: [B, C], B: [A], C: [B], D: [B]}
+CITATION_COUNTS = {A: 10, B: 8, C: 5, D: 1}
+
+
+def crawl(**kwargs):
+    batches = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path.endswith('/paper/batch')
+        ids = json.loads(request.content)['ids']
+        batches.append(ids)
+        fields = request.url.params['fields'].split(',')
+        papers = []
+        for paper_id in ids:
+            paper_id = ALIASES.get(paper_id, paper_id)
+            paper = {'paperId': paper_id, 'title': f'T-{paper_id[0]}', 'citationCount': CITATION_COUNTS[paper_id]}
+            for key, adjacency in (('references', REFERENCES), ('citations', CITATIONS)):
+                if f'{key}.paperId' in fields:
+                    paper[key] = [{'paperId': other, 'citationCount': CITATION_COUNTS[other]}
+                                  for other in adjacency[paper_id]]
+            papers.append(paper)
+        return httpx.Response(200, json=papers)
+
+    async def main():
+        scholar = Scholar(base_url='https://api.semanticscholar.org', coalesce_requests=False)
+        scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await scholar.crawl_citation_graph('10.1234/seed', **kwargs)
+        finally:
+            await scholar.aclose()
+
+    return asyncio.run(main()), batches
+
+
+def test_doi_seed_is_resolved_before_it_can_be_requeued():
+    result, batches = crawl(depth=3, direction='references')
+    assert result['seed'] == A
+    assert batches[0] == ['DOI:10.1234/seed']
+    # B 引用了种子 A：A 不再作为新节点被请求
+    assert all(A not in ids for ids in batches[1:])
+    assert [node['paperId'] for node in result['nodes']] == [A, B, C, D]
+    assert [node['depth'] for node in result['nodes']] == [0, 1, 2, 2]
+    assert [A, B] in result['edges'] and [B, A] in result['edges']
+
+
+def test_node_budget_and_citation_cutoff():
+    result, _ = crawl(depth=3, direction='both', max_nodes=3)
+    assert {node['paperId'] for node in result['nodes']} == {A, B, C}
+
+    result, _ = crawl(depth=3, direction='references', min_citation_count=2)
+    assert {node['paperId'] for node in result['nodes']} == {A, B, C}
+
+
+def test_unknown_seed_reports_an_error():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=[None])
+
+    async def main():
+        scholar = Scholar(base_url='https://api.semanticscholar.org', coalesce_requests=False)
+        scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await scholar.crawl_citation_graph('10.1234/missing')
+        finally:
+            await scholar.aclose()
+
+    assert asyncio.run(main()) == {"error": "未查找到相关论文", "nodes": [], "edges": []}
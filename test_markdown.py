@@ -0,0 +1,139 @@
+"""
+utils 中的 Markdown / LaTeX 后处理：process_markdown 与改写前的实现逐字一致，
+process_markdown_stream 在任意切分点（包括 \\begin{...} 环境内部）得到与整篇处理相同的结果
+
+用法:
+    python -m pytest -q test_markdown.py
+"""
+import random
+import re
+
+from utils import markdown_postprocess, process_markdown, process_markdown_stream, replace_latex_math
+
+
+# --- 改写前的实现，作为对照基线 ---
+
+def baseline_replace_latex_math(latex_text):
+    result = latex_text
+    result = re.sub(r'\\\((.*?)\\\)', r'$\1$', result)
+    result = re.sub(r'\\\[(.*?)\\\]', r'$$\1$$', result)
+    for env in ('equation', 'align', 'gather', 'multline'):
+        result = re.sub(r'\\begin\{%s\}(.*?)\\end\{%s\}' % (env, env), r'$$\1$$', result, flags=re.DOTALL)
+    result = result.replace("$ ", "$")
+    result = result.replace(" $", "$")
+    result = result.replace("\\]", "$$")
+    result = result.replace("\\[", "$$")
+    return result
+
+
+def baseline_format_math_formulas(line):
+    def replace_math(match):
+        math_expr = match.group(1)
+        start_pos, end_pos = match.start(), match.end()
+        if start_pos == 0:
+            return math_expr
+        prev_char = line[start_pos - 1]
+        next_char = line[end_pos] if end_pos < len(line) else ''
+        if prev_char != ' ' and prev_char not in '({\\[（【{「《':
+            math_expr = ' ' + math_expr
+        if (next_char != ' ' and next_char != '' and next_char not in ',.;:!?，。；：！？)）]】}」》'
+                and next_char not in '({\\[（【{「《'):
+            math_expr = math_expr + ' '
+        return math_expr
+
+    return re.sub(r' +', ' ', re.sub(r'(\$[^$]+\$)', replace_math, line))
+
+
+def baseline_markdown_postprocess(content):
+    lines = content.split('\n')
+    processed_lines = []
+    for i, line in enumerate(lines):
+        current_line = line.rstrip()
+        if current_line.startswith('##'):
+            if processed_lines and processed_lines[-1] != '':
+                processed_lines.append('')
+            processed_lines.append(current_line)
+            continue
+        if re.match(r'^\s*table\s*\d+', current_line, re.IGNORECASE):
+            processed_lines.append(current_line)
+            if i < len(lines) - 1 and lines[i + 1].strip() != '':
+                processed_lines.append('')
+            continue
+        processed_lines.append(baseline_format_math_formulas(current_line))
+    cleaned_lines = []
+    prev_empty = False
+    for line in processed_lines:
+        if line == '':
+            if not prev_empty:
+                cleaned_lines.append(line)
+                prev_empty = True
+        else:
+            cleaned_lines.append(line)
+            prev_empty = False
+    return '\n'.join(cleaned_lines)
+
+
+def random_document(rng: random.Random) -> str:
+    """随机生成结构完整的文档：标题、table 行、空行、行内公式、行间公式以及跨行的公式环境"""
+    words = ['alpha', 'beta', '公式', 'x,', 'y.', '(see', 'ref)', '  ', 'Table', '：']
+    inline = ['\\(x^2\\)', '$a+b$', '\\( y \\)', '$ z $']
+
+    def sentence():
+        parts = []
+        for _ in range(rng.randint(1, 8)):
+            parts.append(rng.choice(words + inline))
+            parts.append(rng.choice(['', ' ', '  ']))
+        return ''.join(parts)
+
+    lines = []
+    for _ in range(rng.randint(1, 25)):
+        kind = rng.random()
+        if kind < 0.1:
+            lines.append('## ' + sentence())
+        elif kind < 0.2:
+            lines.append(rng.choice(['table 1 results', '  TABLE2: x ', 'Table 3']))
+        elif kind < 0.35:
+            lines.append(rng.choice(['', '   ']))
+        elif kind < 0.45:
+            lines.append(sentence() + '\\[ E = mc^2 \\]' + sentence())
+        elif kind < 0.6:
+            env = rng.choice(['equation', 'align', 'gather', 'multline'])
+            body = '\n'.join(sentence() for _ in range(rng.randint(0, 3)))
+            lines.append(f'{sentence()}\\begin{{{env}}}{body}\\end{{{env}}}{sentence()}')
+        else:
+            lines.append(sentence())
+    return '\n'.join(lines)
+
+
+def test_process_markdown_matches_the_previous_implementation():
+    for seed in range(300):
+        document = random_document(random.Random(seed))
+        assert replace_latex_math(document) == baseline_replace_latex_math(document), seed
+        assert markdown_postprocess(document) == baseline_markdown_postprocess(document), seed
+        assert process_markdown(document) == baseline_markdown_postprocess(baseline_replace_latex_math(document)), seed
+
+
+def split_at(text, cuts):
+    bounds = [0, *sorted(cuts), len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def test_stream_matches_whole_document_for_arbitrary_splits():
+    for seed in range(300):
+        rng = random.Random(seed)
+        document = random_document(rng)
+        cuts = rng.sample(range(len(document) + 1), min(len(document) + 1, rng.randint(1, 12)))
+        assert ''.join(process_markdown_stream(split_at(document, cuts))) == process_markdown(document), seed
+
+
+def test_stream_splits_inside_an_environment():
+    document = ('intro \\(a\\) text\nbefore\\begin{align}x &= 1\\\\\ny &= 2\\end{align}after\n'
+                '## heading\ntable 1\nrow $b$c\n\\begin{equation}\nE\n\\end{equation}')
+    expected = process_markdown(document)
+    assert '$$x &= 1\\\\\ny &= 2$$' in expected
+    # 逐字符切分，以及在 \begin{ 的中间、环境正文内和 \end{ 的中间切分
+    assert ''.join(process_markdown_stream(document)) == expected
+    begin = document.index('\\begin{align}')
+    end = document.index('\\end{align}')
+    for cuts in ([begin + 3], [begin + 10, end - 4], [end + 2, end + 7], [begin + 14, begin + 20, end + 9]):
+        assert ''.join(process_markdown_stream(split_at(document, cuts))) == expected
@@ -0,0 +1,132 @@
+"""
+指标：计数器与直方图、Prometheus 文本格式、接口路径归一化，以及 track_tool 按返回值记录调用结果
+
+用法:
+    python -m pytest -q test_metrics.py
+"""
+import asyncio
+import json
+import threading
+
+import pytest
+
+from metrics import TOOL_LATENCY, MetricsRegistry, normalize_endpoint, track_tool
+
+
+def test_counter_and_histogram_render_in_prometheus_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter('test_requests_total', 'requests', ('endpoint', 'status'))
+    latency = registry.histogram('test_seconds', 'latency', ('endpoint',), buckets=(0.1, 1.0))
+    requests.inc(endpoint='paper/batch', status='200')
+    requests.inc(2, endpoint='paper/batch', status='200')
+    requests.inc(endpoint='paper/{id}', status='404')
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, endpoint='paper/batch')
+    # 同名指标重复注册时返回已有的对象
+    assert registry.counter('test_requests_total', 'requests', ('endpoint', 'status')) is requests
+    assert requests.value(endpoint='paper/batch', status='200') == 3
+
+    assert registry.render().splitlines() == [
+        '# HELP test_requests_total requests',
+        '# TYPE test_requests_total counter',
+        'test_requests_total{endpoint="paper/batch",status="200"} 3',
+        'test_requests_total{endpoint="paper/{id}",status="404"} 1',
+        '# HELP test_seconds latency',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{endpoint="paper/batch",le="0.1"} 1',
+        'test_seconds_bucket{endpoint="paper/batch",le="1"} 2',
+        'test_seconds_bucket{endpoint="paper/batch",le="+Inf"} 3',
+        'test_seconds_sum{endpoint="paper/batch"} 5.550000',
+        'test_seconds_count{endpoint="paper/batch"} 3',
+    ]
+    snapshot = registry.snapshot()
+    assert snapshot['test_requests_total'] == {'paper/batch,200': 3, 'paper/{id},404': 1}
+    assert snapshot['test_seconds']['paper/batch']['count'] == 3
+    assert snapshot['test_seconds']['paper/batch']['mean'] == pytest.approx(1.85)
+
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    histogram = MetricsRegistry().histogram('q_seconds', 'q', buckets=(1.0, 2.0, 4.0))
+    for value in [0.5] * 50 + [1.5] * 40 + [3.0] * 10:
+        histogram.observe(value)
+    stats = histogram.snapshot()['total']
+    assert stats['p50'] == pytest.approx(1.0)
+    assert 1.0 < stats['p95'] <= 4.0
+    assert stats['p99'] <= 4.0
+
+
+@pytest.mark.parametrize('endpoint, label', [
+    ('graph/v1/paper/search', 'paper/search'),
+    ('graph/v1/paper/batch', 'paper/batch'),
+    ('graph/v1/paper/abc123/references', 'paper/{id}/references'),
+    ('graph/v1/paper/DOI:10.1/x.y/citations', 'paper/{id}/citations'),
+    ('graph/v1/author/42/papers', 'author/{id}/papers'),
+    ('graph/v1/paper/abc123', 'paper/{id}'),
+])
+def test_endpoints_are_normalised_to_bounded_labels(endpoint, label):
+    assert normalize_endpoint(endpoint) == label
+
+
+@pytest.mark.parametrize('result, outcome', [
+    ({'paperId': 'p'}, 'ok'),
+    ([{'paperId': 'p'}], 'ok'),
+    ({'error': '未查找到相关论文', 'related': []}, 'error'),
+    ({}, 'empty'),
+    ([], 'empty'),
+    ({'related': [{'paperId': 'p'}], 'incomplete': [{'paperId': 'q', 'status': 'failed'}]}, 'partial'),
+    ({'results': [], 'unresolved': ['a title']}, 'partial'),
+])
+def test_track_tool_derives_the_outcome_from_the_result(result, outcome):
+    tool = f'test_tool_{outcome}'
+    before = TOOL_LATENCY.snapshot().get(f'{tool},{outcome}', {}).get('count', 0)
+    with track_tool(tool) as call:
+        call.check(result)
+    assert TOOL_LATENCY.snapshot()[f'{tool},{outcome}']['count'] == before + 1
+
+
+def test_track_tool_outcome_can_be_set_directly_and_exceptions_are_recorded():
+    with track_tool('test_tool_direct'):
+        pass
+    with track_tool('test_tool_direct') as call:
+        call.outcome = 'cancelled'
+    with pytest.raises(RuntimeError):
+        with track_tool('test_tool_direct'):
+            raise RuntimeError('boom')
+    snapshot = TOOL_LATENCY.snapshot()
+    assert {key for key in snapshot if key.startswith('test_tool_direct,')} == {
+        'test_tool_direct,ok', 'test_tool_direct,cancelled', 'test_tool_direct,exception'}
+
+
+def test_server_stats_reads_storage_off_the_event_loop(tmp_path, monkeypatch):
+    import shcolar_server
+    from cache import ResponseCache
+    from ratelimit import SharedRateLimiter
+    from title_index import TitleIndex
+
+    limiter = SharedRateLimiter(str(tmp_path / 'ratelimit.sqlite'), 'test', rate=5.0)
+    scholar = shcolar_server.Scholar(base_url='https://api.semanticscholar.org', coalesce_requests=False,
+                                     cache=ResponseCache(str(tmp_path / 'responses.sqlite')),
+                                     title_index=TitleIndex(str(tmp_path / 'titles.sqlite')), rate_limiter=limiter)
+    threads = []
+
+    def traced(method):
+        def wrapper(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return method(*args, **kwargs)
+        return wrapper
+    monkeypatch.setattr(ResponseCache, 'stats', traced(ResponseCache.stats))
+    monkeypatch.setattr(TitleIndex, '__len__', traced(TitleIndex.__len__))
+    # 速率直接取缓存值，不访问共享库
+    monkeypatch.setattr(limiter, '_conn', None)
+    monkeypatch.setattr(shcolar_server, '_scholar', scholar)
+
+    async def main():
+        try:
+            return threading.get_ident(), json.loads(await shcolar_server.server_stats())
+        finally:
+            await scholar.aclose()
+
+    loop_thread, stats = asyncio.run(main())
+    assert stats['rate_limit'] == 5.0 and stats['title_index'] == 0
+    assert stats['response_cache'] is not None
+    assert len(threads) == 2 and loop_thread not in threads
@@ -0,0 +1,134 @@
+"""
+离线索引：从合成的 papers / abstracts / citations 分片导入，再检索与按 ID 查询
+
+用法:
+    python -m pytest -q test_offline_index.py
+"""
+import gzip
+import json
+
+import pytest
+
+from offline_index import OfflineIndex, ingest
+
+PAPERS = [
+    {'corpusid': 1, 'url': 'https://www.semanticscholar.org/p/' + 'a' * 40, 'title': 'Attention Is All You Need',
+     'authors': [{'authorId': '1', 'name': 'Ashish Vaswani'}], 'year': 2017, 'venue': 'NeurIPS',
+     'externalids': {'DOI': '10.5555/Attention.1', 'ArXiv': '1706.03762', 'CorpusId': 1},
+     'publicationtypes': ['Conference'], 'citationcount': 100000, 'referencecount': 1},
+    {'corpusid': 2, 'url': 'https://www.semanticscholar.org/p/' + 'b' * 40, 'title': 'Deep Residual Learning',
+     'authors': [{'authorId': '2', 'name': 'Kaiming He'}], 'year': 2016, 'venue': 'CVPR',
+     'externalids': {'CorpusId': 2}, 'citationcount': 150000, 'referencecount': 0},
+    {'corpusid': 3, 'url': 'https://www.semanticscholar.org/p/' + 'c' * 40,
+     'title': 'Attention Mechanisms in Residual Networks', 'authors': [], 'year': 2020,
+     'externalids': {'CorpusId': 3}, 'citationcount': 5, 'referencecount': 1},
+    # 没有 paperId 的记录跳过
+    {'corpusid': 4, 'title': 'No Identifier'},
+]
+ABSTRACTS = [{'corpusid': 1, 'abstract': 'The dominant sequence transduction models.'}]
+CITATIONS = [{'citingcorpusid': 1, 'citedcorpusid': 2}, {'citingcorpusid': 3, 'citedcorpusid': 1}]
+
+
+def write_jsonl(path, records, extra_lines=()):
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+        for line in extra_lines:
+            f.write(line + '\n')
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('dump')
+    path = str(directory / 'index.sqlite3')
+    stats = ingest(path, [
+        write_jsonl(directory / 'papers-0.jsonl.gz', PAPERS, extra_lines=['{not json', '']),
+        write_jsonl(directory / 'abstracts-0.jsonl', ABSTRACTS),
+        write_jsonl(directory / 'citations-0.jsonl', CITATIONS),
+    ], batch_size=2)
+    assert stats == {'papers': 3, 'abstracts': 1, 'citations': 2, 'skipped': 1}
+    offline = OfflineIndex(path)
+    yield offline
+    offline.close()
+
+
+def test_search_matches_all_words_in_title_or_authors(index):
+    results = index.search('attention', limit=5, fields='title,year')
+    assert sorted(r['paperId'] for r in results) == ['a' * 40, 'c' * 40]
+    assert index.search('Attention: all you NEED', fields='title,year') == [
+        {'paperId': 'a' * 40, 'title': 'Attention Is All You Need', 'year': 2017}]
+    assert [r['paperId'] for r in index.search('residual learning he')] == ['b' * 40]
+    assert index.search('attention transformer') == []
+    assert index.search('   ') == []
+    assert len(index.search('attention', limit=1)) == 1
+
+
+def test_get_by_doi_and_other_ids(index):
+    paper = index.get('DOI:10.5555/attention.1', fields='title,abstract,externalIds,citationStyles')
+    assert paper['paperId'] == 'a' * 40
+    assert paper['abstract'] == 'The dominant sequence transduction models.'
+    assert paper['externalIds']['ArXiv'] == '1706.03762'
+    assert paper['citationStyles']['bibtex'].startswith('@InProceedings{Vaswani2017Attention,')
+    assert index.get('10.5555/ATTENTION.1', fields='title')['paperId'] == 'a' * 40
+    assert index.get('ARXIV:1706.03762', fields='title')['paperId'] == 'a' * 40
+    assert index.get('CorpusId:2', fields='title')['title'] == 'Deep Residual Learning'
+    assert index.get('DOI:10.9999/missing') is None
+
+
+def test_get_many_keeps_order_with_missing_ids(index):
+    results = index.get_many(['b' * 40, 'DOI:10.9999/missing', 'CorpusId:1', 'not-an-id', 'CorpusId:4'],
+                             fields='title')
+    assert [r and r['paperId'] for r in results] == ['b' * 40, None, 'a' * 40, None, None]
+
+
+def test_edges_come_from_citations_dump(index):
+    assert index.can_serve('references.title')
+    paper = index.get('a' * 40, fields='references.title,citations')
+    assert paper['references'] == [{'paperId': 'b' * 40, 'title': 'Deep Residual Learning'}]
+    assert [c['paperId'] for c in paper['citations']] == ['c' * 40]
+
+
+def test_scholar_tops_up_short_offline_results_from_the_api(index):
+    import asyncio
+    import threading
+
+    import httpx
+
+    from shcolar_server import Scholar
+
+    threads = []
+    search = index.search
+
+    def traced(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return search(*args, **kwargs)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.params['limit'] == '5':
+            return httpx.Response(400)
+        return httpx.Response(200, json={'data': [{'paperId': 'c' * 40, 'title': 'Dup'},
+                                                  {'paperId': 'd' * 40, 'title': 'Remote'}]})
+
+    async def main():
+        scholar = Scholar(base_url='https://api.semanticscholar.org', coalesce_requests=False, offline_index=index)
+        scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        index.search = traced
+        try:
+            full = await scholar.search_papers('attention', limit=2, fields='title')
+            short = await scholar.search_papers('attention', limit=3, fields='title')
+            failed = await scholar.search_papers('attention', limit=5, fields='title')
+            return full, short, failed, threading.get_ident()
+        finally:
+            del index.search
+            await scholar.aclose()
+
+    full, short, failed, loop_thread = asyncio.run(main())
+    assert sorted(p['paperId'] for p in full) == ['a' * 40, 'c' * 40]
+    # 离线结果在前，上游结果去重后补齐到 limit
+    assert sorted(p['paperId'] for p in short[:2]) == ['a' * 40, 'c' * 40]
+    assert [p['paperId'] for p in short[2:]] == ['d' * 40]
+    # 上游失败时仍返回离线结果
+    assert sorted(p['paperId'] for p in failed) == ['a' * 40, 'c' * 40]
+    assert threads and loop_thread not in threads
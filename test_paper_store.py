@@ -0,0 +1,135 @@
+"""
+论文库：按字段合并记录，以及有界论文库容量小于一次 batch 时结果不丢失
+
+用法:
+    python -m pytest -q test_paper_store.py
+"""
+import asyncio
+import json
+
+import httpx
+
+from paper_store import PaperStore
+from shcolar_server import Scholar
+
+
+def make_handler(calls):
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if request.url.path.endswith('/paper/batch'):
+            fields = request.url.params['fields'].split(',')
+            ids = json.loads(request.content)['ids']
+            return httpx.Response(200, json=[{'paperId': paper_id, **{f: f'{f}-{paper_id}' for f in fields}}
+                                             for paper_id in ids])
+        return httpx.Response(404)
+    return handler
+
+
+def run_batch(store: PaperStore, batches):
+    calls = []
+
+    async def run():
+        scholar = Scholar(base_url='https://api.semanticscholar.org', paper_store=store, coalesce_requests=False)
+        scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(make_handler(calls)))
+        try:
+            return [await scholar.batch_get_papers(ids, fields=fields) for ids, fields in batches]
+        finally:
+            await scholar.aclose()
+
+    return asyncio.run(run()), calls
+
+
+def test_put_merges_fields():
+    store = PaperStore()
+    store.put({'paperId': 'a', 'title': 'T'}, ['title'])
+    store.put({'paperId': 'a', 'year': 2020}, ['year'], alias='DOI:10.1/a')
+    assert store.missing_fields('a', ['title', 'year', 'venue']) == ['venue']
+    assert store.get('DOI:10.1/a', ['title', 'year']) == {'paperId': 'a', 'title': 'T', 'year': 2020}
+    assert store.get('a', ['venue']) is None
+    assert store.held('a', ['title', 'venue']) == {'paperId': 'a', 'title': 'T'}
+
+
+def test_batch_larger_than_store_keeps_every_paper():
+    ids = [f'p{i}' for i in range(119)]
+    (papers,), _ = run_batch(PaperStore(50), [(ids, 'title,year')])
+    assert [paper['paperId'] for paper in papers] == ids
+    assert all(paper['title'] == f"title-{paper['paperId']}" for paper in papers)
+
+
+def test_batch_fetches_only_missing_fields_and_merges():
+    store = PaperStore(50)
+    (first, second), calls = run_batch(store, [(['p1', 'p2'], 'title'), (['p1', 'p2', 'p1'], 'title,year')])
+    assert calls[-1].url.params['fields'] == 'year'
+    assert second[0] == {'paperId': 'p1', 'title': 'title-p1', 'year': 'year-p1'}
+    assert second[2] == second[0] and second[2] is not second[0]
+
+
+AUTHORS = [{'authorId': '1', 'name': 'Ada', 'affiliations': ['A']}, {'authorId': '2', 'name': 'Bo', 'affiliations': []}]
+REFERENCES = [{'paperId': 'r1', 'title': 'R1', 'citationCount': 3}, {'paperId': 'r2', 'title': 'R2', 'citationCount': 5}]
+FULL = {'title': 'T', 'year': 2020, 'abstract': 'A', 'citationCount': 1, 'venue': 'V',
+        'citationStyles': {'bibtex': '@article{t, title = {T}}'}}
+DEFAULT_SUBFIELDS = {'authors': ['authorId', 'name'], 'references': ['paperId', 'title']}
+
+
+def nested_handler(calls):
+    """按请求的（子）字段返回嵌套记录；不带子字段的 authors / references 返回上游的默认子字段"""
+    nested = {'authors': AUTHORS, 'references': REFERENCES}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        subfields: dict = {}
+        for field in request.url.params['fields'].split(','):
+            key, _, sub = field.partition('.')
+            subfields.setdefault(key, set()).update([sub] if sub else DEFAULT_SUBFIELDS.get(key, []))
+        papers = []
+        for paper_id in json.loads(request.content)['ids']:
+            paper = {'paperId': paper_id}
+            for key, subs in subfields.items():
+                if key in nested:
+                    id_key = 'authorId' if key == 'authors' else 'paperId'
+                    paper[key] = [{k: v for k, v in item.items() if k in subs or k == id_key}
+                                  for item in nested[key]]
+                else:
+                    paper[key] = FULL[key]
+            papers.append(paper)
+        return httpx.Response(200, json=papers)
+    return handler
+
+
+def test_subfields_of_one_key_accumulate_instead_of_overwriting():
+    store = PaperStore()
+    calls = []
+
+    async def run():
+        scholar = Scholar(base_url='https://api.semanticscholar.org', paper_store=store, coalesce_requests=False)
+        scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(nested_handler(calls)))
+        try:
+            results = [(await scholar.batch_get_papers(['p1'], fields=fields))[0]
+                       for fields in ('title,authors.name', 'authors.affiliations', 'title,authors.name')]
+            # 爬取时只缓存了参考文献的 paperId / citationCount，随后按默认字段获取详情
+            await scholar.batch_get_papers(['p2'], fields='references.paperId,references.citationCount')
+            results.append(await scholar.get_paper_details('p2'))
+            return results
+        finally:
+            await scholar.aclose()
+
+    first, second, third, details = asyncio.run(run())
+    assert [a['name'] for a in first['authors']] == ['Ada', 'Bo']
+    assert [a['affiliations'] for a in second['authors']] == [['A'], []]
+    # 库中的 authors 同时带有两次获取的子字段
+    assert third['title'] == 'T' and third['authors'] == AUTHORS
+    # 第三次调用所需字段都已持有，不再请求上游
+    assert len(calls) == 4
+    assert calls[1].url.params['fields'] == 'authors.affiliations'
+    assert [r['title'] for r in details['references']] == ['R1', 'R2']
+    assert store.get('p2', ['references.citationCount'])['references'][1]['citationCount'] == 5
+
+
+def test_unalignable_lists_keep_only_the_latest_subfields():
+    store = PaperStore()
+    store.put({'paperId': 'a', 'references': [{'paperId': 'r1', 'title': 'R1'}]}, ['references.title'])
+    store.put({'paperId': 'a', 'references': [{'paperId': 'r1', 'year': 1}, {'paperId': 'r2', 'year': 2}]},
+              ['references.year'])
+    assert store.missing_fields('a', ['references.title', 'references.year']) == ['references.title',
+                                                                                 'references.year']
+    assert store.get('a', ['references.year'])['references'][1] == {'paperId': 'r2', 'year': 2}
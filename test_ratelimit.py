@@ -0,0 +1,105 @@
+"""
+多进程共享限流器：预约在线程中执行，不阻塞事件循环；共享库被锁住时按可重试处理
+
+用法:
+    python -m pytest -q test_ratelimit.py
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+
+import httpx
+import pytest
+
+from ratelimit import SharedRateLimiter
+from resilience import RetryPolicy
+from shcolar_server import Scholar
+
+
+def hold_write_lock(path: str) -> sqlite3.Connection:
+    """模拟另一个 worker 进程持有共享库的写锁"""
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.execute('BEGIN IMMEDIATE')
+    return conn
+
+
+def test_acquire_does_not_block_event_loop(tmp_path):
+    path = str(tmp_path / 'ratelimit.sqlite')
+    limiter = SharedRateLimiter(path, 'test', rate=100.0, burst=10, busy_timeout=0.5)
+    other = hold_write_lock(path)
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        task = asyncio.create_task(ticker())
+        try:
+            with pytest.raises(sqlite3.OperationalError):
+                await limiter.acquire()
+        finally:
+            task.cancel()
+
+    asyncio.run(main())
+    other.rollback()
+    # 等待写锁的 0.5 秒内事件循环仍在调度其他协程
+    assert len(ticks) >= 10
+    # 写锁释放后恢复正常
+    assert asyncio.run(limiter.acquire()) is not None
+    limiter.close()
+    other.close()
+
+
+def test_locked_store_is_a_retryable_attempt(tmp_path):
+    path = str(tmp_path / 'ratelimit.sqlite')
+    limiter = SharedRateLimiter(path, 'test', rate=100.0, burst=10, busy_timeout=0.05)
+    other = hold_write_lock(path)
+    threading.Timer(0.2, other.rollback).start()
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={'paperId': 'a' * 40, 'title': 'T'})
+
+    async def main():
+        scholar = Scholar(base_url='https://api.semanticscholar.org', coalesce_requests=False,
+                          rate_limiter=limiter, retry_policy=RetryPolicy(max_attempts=20, base_delay=0.05,
+                                                                         max_delay=0.1))
+        scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await scholar.get_paper_details('a' * 40)
+        finally:
+            await scholar.aclose()
+
+    result = asyncio.run(main())
+    assert result['title'] == 'T'
+    assert len(calls) == 1
+    limiter.close()
+    other.close()
+
+
+def test_rate_is_read_without_touching_the_store(tmp_path):
+    path = str(tmp_path / 'ratelimit.sqlite')
+    limiter = SharedRateLimiter(path, 'test', rate=8.0, burst=10, cooldown=0)
+    other = SharedRateLimiter(path, 'test', rate=8.0, burst=10, cooldown=0)
+    assert limiter.rate == 8.0
+    # 另一个 worker 收到 429；本进程在下一次预约时读到降低后的共享速率
+    other.on_throttle()
+    assert other.rate == 4.0
+    assert limiter.rate == 8.0
+    assert asyncio.run(limiter.acquire()) is not None
+    assert limiter.rate == 4.0
+    # 共享库被锁住时读取速率也不会等待
+    lock = hold_write_lock(path)
+    started = time.monotonic()
+    assert limiter.rate == 4.0
+    assert time.monotonic() - started < 0.05
+    lock.rollback()
+    lock.close()
+    other.on_success()
+    assert other.rate == 4.4
+    limiter.close()
+    other.close()
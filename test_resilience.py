@@ -0,0 +1,144 @@
+"""
+重试策略与熔断器：可重试状态码、Retry-After（秒数 / HTTP 日期）、退避受截止时间约束，
+以及熔断器 打开 -> 半开 -> 关闭 的状态转换
+
+用法:
+    python -m pytest -q test_resilience.py
+"""
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, RetryPolicy, deadline, remaining
+
+
+@pytest.mark.parametrize('status, retryable', [
+    (408, True), (425, True), (429, True), (500, True), (502, True), (503, True), (504, True),
+    (400, False), (401, False), (403, False), (404, False), (422, False), (501, False),
+])
+def test_retryable_statuses(status, retryable):
+    assert RetryPolicy().is_retryable_status(status) is retryable
+
+
+def test_retry_after_seconds_and_http_date():
+    policy = RetryPolicy(max_retry_after=60)
+
+    def parse(value):
+        headers = {} if value is None else {'Retry-After': value}
+        return policy.retry_after(httpx.Response(429, headers=headers))
+
+    assert parse('7') == 7.0
+    assert parse('1.5') == 1.5
+    # 超过上限时截断，负数按 0 处理
+    assert parse('3600') == 60
+    assert parse('-5') == 0.0
+    assert 25 <= parse(formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert parse(formatdate(time.time() - 30, usegmt=True)) == 0.0
+    assert parse(None) is None
+    assert parse('soon') is None
+
+
+def test_backoff_is_jittered_below_the_exponential_ceiling():
+    policy = RetryPolicy(base_delay=0.5, max_delay=4)
+    for attempt, ceiling in [(1, 0.5), (2, 1), (3, 2), (4, 4), (10, 4)]:
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert max(delays) > ceiling / 2
+
+
+def test_deadline_nests_to_the_earlier_one():
+    assert remaining() is None
+    with deadline(10):
+        with deadline(100):
+            assert 9 < remaining() <= 10
+        with deadline(1):
+            assert remaining() <= 1
+        # 0 / None 表示不设截止时间，沿用外层的
+        with deadline(0):
+            assert 9 < remaining() <= 10
+    assert remaining() is None
+
+
+def scholar_with(responses, **kwargs):
+    from shcolar_server import Scholar
+
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        status, headers = responses[min(len(calls), len(responses)) - 1]
+        return httpx.Response(status, headers=headers, json={'paperId': 'p'} if status == 200 else {})
+
+    scholar = Scholar(base_url='https://api.semanticscholar.org', coalesce_requests=False,
+                      retry_policy=RetryPolicy(base_delay=0.01, max_delay=0.02), **kwargs)
+    scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return scholar, calls
+
+
+def fetch(scholar, seconds=None):
+    async def main():
+        try:
+            with deadline(seconds):
+                started = time.monotonic()
+                result = await scholar._fetch('graph/v1/paper/p')
+                return result, time.monotonic() - started
+        finally:
+            await scholar.aclose()
+    return asyncio.run(main())
+
+
+def test_only_retryable_statuses_are_retried():
+    scholar, calls = scholar_with([(503, {}), (429, {'Retry-After': '0'}), (200, {})])
+    result, _ = fetch(scholar)
+    assert result == {'paperId': 'p'} and len(calls) == 3
+
+    scholar, calls = scholar_with([(404, {}), (200, {})])
+    result, _ = fetch(scholar)
+    assert result == {} and len(calls) == 1
+
+
+def test_retry_wait_longer_than_the_remaining_deadline_gives_up_at_once():
+    # Retry-After 要求等待 30 秒，而调用只剩 1 秒：不等待，直接放弃
+    scholar, calls = scholar_with([(429, {'Retry-After': '30'}), (200, {})])
+    result, elapsed = fetch(scholar, seconds=1)
+    assert result == {} and len(calls) == 1
+    assert elapsed < 0.5
+
+    # 等待时间在截止时间之内时照常重试
+    scholar, calls = scholar_with([(429, {'Retry-After': '0.05'}), (200, {})])
+    result, _ = fetch(scholar, seconds=1)
+    assert result == {'paperId': 'p'} and len(calls) == 2
+
+
+def test_circuit_breaker_opens_half_opens_and_closes(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow() and not breaker.ready
+
+    # 冷却时间过后进入半开状态，只放行一个探测请求
+    now[0] += 30
+    assert breaker.ready
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow() and not breaker.ready
+    # 探测被取消时归还名额
+    breaker.release()
+    assert breaker.allow()
+    # 探测失败重新打开
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    now[0] += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+    assert breaker.allow() and breaker.allow()
@@ -0,0 +1,71 @@
+"""
+输出格式：字段投影、紧凑输出，以及按大小预算截断时只截断顶层结果列表、不破坏论文记录
+
+用法:
+    python -m pytest -q test_response_format.py
+"""
+import json
+
+from response_format import dumps, fit_to_budget, render_response, upstream_fields
+
+
+def paper(i, abstract_len=2000, authors=6):
+    return {'paperId': f'p{i}', 'title': f'Paper {i}', 'abstract': 'x' * abstract_len,
+            'authors': [{'authorId': str(a), 'name': f'Author {a}'} for a in range(authors)],
+            'citationStyles': {'bibtex': '@article{k, title={T}}'}, 'gbt7714': f'Author 0. Paper {i}[J].'}
+
+
+def size(obj, compact=False):
+    return len(dumps(obj, compact).encode('utf-8'))
+
+
+def test_compact_output_and_projection():
+    result = {'main_paper': paper(0), 'references': [paper(1), None]}
+    compact = render_response(result, fields='title,authors.name', compact=True)
+    assert '\n' not in compact and json.loads(compact) == {
+        'main_paper': {'paperId': 'p0', 'title': 'Paper 0', 'authors': [{'name': f'Author {a}'} for a in range(6)]},
+        'references': [{'paperId': 'p1', 'title': 'Paper 1',
+                        'authors': [{'name': f'Author {a}'} for a in range(6)]}, None],
+    }
+    assert len(compact) < len(render_response(result, fields='title,authors.name'))
+    assert upstream_fields('title,authors.name,gbt7714,paperId') == 'title,authors'
+    assert upstream_fields('', default='title') == 'title'
+
+
+def test_budget_trims_abstracts_and_citation_styles_before_dropping_papers():
+    result = {'main_paper': paper(0), 'references': [paper(i) for i in range(1, 6)]}
+    fitted = fit_to_budget(result, 4000)
+    assert size(fitted) <= 4000
+    assert len(fitted['references']) == 5
+    assert all(len(p.get('abstract', '')) <= 301 for p in fitted['references'])
+    assert fitted['truncated']['abstract_max_chars'] in (300, 0)
+    # 原对象不被修改
+    assert len(result['references'][0]['abstract']) == 2000
+
+
+def test_budget_truncates_top_level_result_lists_but_never_author_lists():
+    result = {'main_paper': paper(0, authors=200), 'references': [paper(i, authors=30) for i in range(1, 41)]}
+    fitted = fit_to_budget(result, 12000, compact=True)
+    assert size(fitted, compact=True) <= 12000
+    omitted = fitted['truncated']['omitted_items']
+    assert set(omitted) == {'references'}
+    assert len(fitted['references']) + omitted['references'] == 40
+    # 论文记录中的 authors 列表保持完整
+    assert len(fitted['main_paper']['authors']) == 200
+    assert all(len(p['authors']) == 30 for p in fitted['references'])
+    assert [p['paperId'] for p in fitted['references']] == [f'p{i}' for i in range(1, len(fitted['references']) + 1)]
+
+
+def test_budget_truncates_a_top_level_list_of_papers():
+    papers = [paper(i) for i in range(50)]
+    text = render_response(papers, max_tokens=1000)
+    fitted = json.loads(text)
+    assert len(text.encode('utf-8')) <= 4000
+    assert 0 < len(fitted) < 50
+    assert all(len(p['authors']) == 6 for p in fitted)
+
+
+def test_within_budget_is_returned_unchanged():
+    result = {'data': [paper(1)]}
+    assert fit_to_budget(result, 10 ** 6) is result
+    assert json.loads(render_response(result, max_bytes=10 ** 6)) == result
@@ -0,0 +1,49 @@
+"""
+启动时间预算：stdio 模式下 MCP 客户端为每个会话启动一个进程，导入 shcolar_server 的耗时直接计入首个响应
+
+- 导入时不加载 httpx、numpy、pdb 等重量级模块，也不创建 Scholar 客户端（首次工具调用时才创建）
+- 扣除 fastmcp 自身的导入时间后，导入 shcolar_server 不超过 SCHOLAR_IMPORT_BUDGET 秒
+
+用法:
+    python -m pytest -q test_startup.py
+    SCHOLAR_IMPORT_BUDGET=0.5 python -m pytest -q test_startup.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_BUDGET = float(os.environ.get("SCHOLAR_IMPORT_BUDGET", "0.25"))
+DEFERRED_MODULES = ('httpx', 'numpy', 'pdb', 'citation_graph')
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import fastmcp.server.server
+framework = time.perf_counter()
+import shcolar_server
+end = time.perf_counter()
+print(json.dumps({"framework": framework - start, "server": end - framework,
+                  "loaded": [name for name in %r if name in sys.modules],
+                  "client": shcolar_server._scholar is not None}))
+'''
+
+
+def probe() -> dict:
+    """在新的解释器中导入 shcolar_server，返回各阶段耗时与已加载的模块"""
+    env = dict(os.environ, SCHOLAR_WORKERS='1')
+    output = subprocess.run([sys.executable, '-c', PROBE % (DEFERRED_MODULES,)], cwd=os.path.dirname(__file__) or '.',
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_import_defers_heavy_work():
+    result = probe()
+    assert result['loaded'] == []
+    assert not result['client']
+
+
+def test_import_time_budget():
+    # 取多次中的最小值，减少机器负载带来的抖动
+    best = min(probe()['server'] for _ in range(3))
+    assert best < IMPORT_BUDGET, f"导入 shcolar_server 耗时 {best:.3f}s，超出预算 {IMPORT_BUDGET}s"
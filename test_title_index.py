@@ -0,0 +1,94 @@
+"""
+标题解析索引：精确 / 模糊匹配、排队写入，以及 Scholar 在请求路径之外写入索引
+
+用法:
+    python -m pytest -q test_title_index.py
+"""
+import asyncio
+import threading
+
+import httpx
+
+from title_index import TitleIndex
+
+TITLE = 'Attention Is All You Need'
+
+
+def test_queue_defers_writes_until_flush(tmp_path):
+    index = TitleIndex(str(tmp_path / 'titles.sqlite'))
+    assert index.queue([{'paperId': 'p1', 'title': TITLE}, None, {'paperId': 'p2'}]) == 1
+    assert index.pending == 1 and len(index) == 0
+    assert index.flush() == 1
+    assert index.pending == 0
+    assert index.lookup('attention is all you need!') == ('p1', TITLE, 1.0)
+    paper_id, _, score = index.lookup('Attention Is All You Need.')
+    assert paper_id == 'p1' and score == 1.0
+    assert index.resolve('Attention Is All We Need') is None
+    assert index.resolve('Attention is all you need (2017)', threshold=0.7) == 'p1'
+    index.close()
+
+
+def test_colliding_titles_are_kept_ambiguous_instead_of_overwritten(tmp_path):
+    path = str(tmp_path / 'titles.sqlite')
+    index = TitleIndex(path)
+    index.add_many([{'paperId': 'p1', 'title': 'Introduction to the Special Issue'},
+                    {'paperId': 'p2', 'title': 'Introduction to the special issue.'},
+                    {'paperId': 'p3', 'title': TITLE}])
+    assert index.add(TITLE, 'p3') is False
+    assert index.add('Attention is all you need!', 'p4') is True
+    index.close()
+    reopened = TitleIndex(path)
+    # 精确命中与模糊命中都不采用有歧义的标题，之后出现的 paperId 也不会覆盖它
+    assert reopened.lookup('Introduction to the Special Issue') is None
+    assert reopened.lookup(TITLE) is None
+    assert reopened.resolve('Attention Is All You Need (2017)', threshold=0.7) is None
+    assert reopened.add(TITLE, 'p3') is False
+    assert reopened.resolve(TITLE) is None
+    reopened.close()
+
+
+def test_close_flushes_pending_titles(tmp_path):
+    path = str(tmp_path / 'titles.sqlite')
+    index = TitleIndex(path)
+    index.queue([{'paperId': 'p1', 'title': TITLE}])
+    index.close()
+    reopened = TitleIndex(path)
+    assert reopened.resolve(TITLE) == 'p1'
+    reopened.close()
+
+
+def test_scholar_indexes_and_resolves_titles_off_the_event_loop(tmp_path):
+    from shcolar_server import Scholar
+
+    index = TitleIndex(str(tmp_path / 'titles.sqlite'))
+    threads = []
+    for name in ('add_many', 'lookup'):
+        method = getattr(index, name)
+
+        def traced(*args, _method=method, **kwargs):
+            threads.append(threading.get_ident())
+            return _method(*args, **kwargs)
+        setattr(index, name, traced)
+    searches = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        searches.append(request)
+        return httpx.Response(200, json={'data': [{'paperId': 'f' * 40, 'title': TITLE}]})
+
+    async def main():
+        scholar = Scholar(base_url='https://api.semanticscholar.org', coalesce_requests=False, title_index=index)
+        scholar._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            _, first = await scholar._match_title(TITLE)
+            await scholar._title_flush
+            _, second = await scholar._match_title(TITLE)
+            return first, second, threading.get_ident()
+        finally:
+            await scholar.aclose()
+
+    first, second, loop_thread = asyncio.run(main())
+    assert first['source'] != 'title_index'
+    assert second['source'] == 'title_index' and second['paperId'] == 'f' * 40
+    assert len(searches) == 1
+    assert threads and loop_thread not in threads
+    index.close()
@@ -0,0 +1,79 @@
+"""
+utils 中的 BibTeX 解析与 GB/T 7714 转换：嵌套花括号、引号、宏与 # 连接、文献类型映射以及格式错误的条目
+
+用法:
+    python -m pytest -q test_utils.py
+"""
+import pytest
+
+from utils import BibtexSyntaxError, bibtex_to_gbt7714, convert_bibtex_entry, parse_bibtex, parse_bibtex_entry
+
+
+def test_nested_braces_and_quoted_values():
+    entry_type, key, fields = parse_bibtex_entry('''@Article{Key2020,
+        title = {The {LaTeX} {{Companion}}: a {\\"u}ber guide},
+        journal = "Journal of {"}Quoted{"} Things",
+        author  = "Smith, John and {Research Group, The}",
+        note = {Line one
+                line    two},
+        year = 2020,
+    }''')
+    assert (entry_type, key) == ('article', 'Key2020')
+    assert fields['title'] == 'The LaTeX Companion: a \\"uber guide'
+    assert fields['journal'] == 'Journal of "Quoted" Things'
+    assert fields['author'] == 'Smith, John and Research Group, The'
+    assert fields['note'] == 'Line one line two'
+    assert fields['year'] == '2020'
+
+
+def test_macros_concatenation_and_parenthesised_entries():
+    entry_type, key, fields = parse_bibtex_entry(
+        '@inproceedings(k1, month = jan, booktitle = conf # " 2020", title = "A (B) C")', macros={'conf': 'ICML'})
+    assert (entry_type, key) == ('inproceedings', 'k1')
+    assert fields == {'month': 'January', 'booktitle': 'ICML 2020', 'title': 'A (B) C'}
+    assert parse_bibtex_entry('@string{conf = "NeurIPS"}') == ('string', '', {'conf': 'NeurIPS'})
+
+
+def test_field_list_without_entry_head():
+    assert parse_bibtex('title = {T}, year = {2001}') == {'title': 'T', 'year': '2001'}
+
+
+@pytest.mark.parametrize('bibtex, expected', [
+    ('@Book{b, author = {Donald E. Knuth}, title = {The Art of Computer Programming}, '
+     'publisher = {Addison-Wesley}, year = {1968}}',
+     'Knuth D E The Art of Computer Programming[M]. 1968.'),
+    ('@InProceedings{c, author = {He, Kaiming and Zhang, Xiangyu}, title = {Deep Residual Learning}, '
+     'booktitle = {CVPR}, pages = {770--778}, year = {2016}}',
+     'He K, Zhang X Deep Residual Learning[C]. CVPR, 2016, 770-778.'),
+    # Semantic Scholar 把会议论文标为 @Article，只有 booktitle 时按会议论文处理
+    ('@Article{d, author = {A B}, title = {T}, booktitle = {Proc}, year = {2020}}',
+     'B A T[C]. Proc, 2020.'),
+    ('@Article{e, author = {A B and C D and E F and G H}, title = {T.}, journal = {J}, volume = {3}, '
+     'number = {2}, pages = {1--9}, year = {2021}, doi = {10.1/x}}',
+     'B A, D C, F E, et al. T[J]. J, 2021, 3(2), 1-9. DOI:10.1/x'),
+    ('@PhDThesis{f, author = {Li Hua}, title = {Thesis}, school = {PKU}, year = {2019}}',
+     'Hua L Thesis[D]. 2019.'),
+])
+def test_entry_type_mapping(bibtex, expected):
+    assert bibtex_to_gbt7714(bibtex) == expected
+    assert convert_bibtex_entry(bibtex) == expected
+
+
+@pytest.mark.parametrize('bibtex', [
+    '@Article{k, title = {unclosed',
+    '@Article{k, title = "unclosed}',
+    '@Article{k, title {missing equals}}',
+    '@Article{k, title = }',
+    '@Article{k, title = {T}, = {no name}}',
+])
+def test_malformed_entries(bibtex):
+    with pytest.raises(BibtexSyntaxError):
+        convert_bibtex_entry(bibtex)
+    assert bibtex_to_gbt7714(bibtex).startswith('转换错误')
+
+
+def test_missing_entry_head_and_closing_brace():
+    with pytest.raises(BibtexSyntaxError):
+        parse_bibtex_entry('title = {T}')
+    # 条目末尾缺少的右花括号不影响已完整读出的字段
+    assert parse_bibtex_entry('@Article{k, title = {T}') == ('article', 'k', {'title': 'T'})
@@ -0,0 +1,220 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+# bottom-k MinHash 草图大小：每个标题保留哈希值最小的 k 个 trigram 作为候选键
+SKETCH_SIZE = 8
+# 模糊匹配时至少需要的 trigram Jaccard 相似度
+DEFAULT_THRESHOLD = 0.85
+# 每次模糊匹配最多验证的候选数
+MAX_CANDIDATES = 32
+# 太短的标题区分度太低，不写入索引
+MIN_TITLE_LENGTH = 8
+# flush 每个事务写入的论文数
+FLUSH_BATCH = 500
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_title(title: str) -> str:
+    """
+    规范化标题：Unicode 兼容分解并去掉重音符号、大小写折叠，标点统一为空格并合并连续空白
+    例如 "Schrödinger’s  Cat: A Study" -> "schrodinger s cat a study"
+    """
+    text = title or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(' ', text.casefold()).strip()
+
+
+def trigrams(normalized: str) -> Set[str]:
+    """规范化标题的字符 trigram 集合（首尾补空格，短词也能参与匹配）"""
+    padded = f'  {normalized} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def title_similarity(a: str, b: str) -> float:
+    """两个标题规范化后的 trigram Jaccard 相似度，取值 0~1"""
+    grams_a, grams_b = trigrams(normalize_title(a)), trigrams(normalize_title(b))
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def _sketch(grams: Set[str]) -> List[int]:
+    """
+    bottom-k MinHash 草图：trigram 哈希值中最小的 SKETCH_SIZE 个
+    两个标题的 Jaccard 相似度越高，草图中共享的键越多，高相似度的标题几乎必然至少共享一个
+    """
+    return sorted({zlib.crc32(gram.encode('utf-8')) for gram in grams})[:SKETCH_SIZE]
+
+
+class TitleIndex:
+    """
+    持久化的 标题 -> paperId 解析索引（SQLite，WAL 模式）
+    - 精确匹配：以规范化标题为主键；规范化后相同的标题指向不同论文时标记为有歧义，不再用于解析
+    - 模糊匹配：按 bottom-k MinHash 草图取共享键最多的候选，再用 trigram Jaccard 相似度验证
+    - 写入可以先 queue 排队（不访问数据库），再由 flush 在后台线程中批量写入，不占用请求路径
+    """
+
+    def __init__(self, path: str, threshold: float = DEFAULT_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS titles (
+                norm TEXT PRIMARY KEY,
+                paper_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                ambiguous INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS title_sketch (
+                key INTEGER NOT NULL,
+                norm TEXT NOT NULL,
+                PRIMARY KEY (key, norm)
+            ) WITHOUT ROWID;
+        ''')
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(titles)')}
+        if 'ambiguous' not in columns:
+            # 旧版本的索引没有 ambiguous 列
+            self._conn.execute('ALTER TABLE titles ADD COLUMN ambiguous INTEGER NOT NULL DEFAULT 0')
+        self._pending: List[Dict[str, str]] = []
+        self._pending_lock = threading.Lock()
+
+    def add_many(self, papers: Iterable[Optional[Dict]]) -> int:
+        """
+        把含 paperId 与 title 的论文记录写入索引，返回新写入或新标记为有歧义的条数
+        已有标题（或同一批中的标题）指向另一个 paperId 时不覆盖，而是把该标题标记为有歧义
+        """
+        rows: Dict[str, Tuple[str, str, int]] = {}
+        for paper in papers:
+            if not paper or not paper.get('paperId') or not paper.get('title'):
+                continue
+            norm = normalize_title(paper['title'])
+            if len(norm) < MIN_TITLE_LENGTH:
+                continue
+            previous = rows.get(norm)
+            ambiguous = int(previous is not None and (previous[2] or previous[0] != paper['paperId']))
+            rows[norm] = (paper['paperId'], paper['title'], ambiguous)
+        if not rows:
+            return 0
+        now = time.time()
+        with self._lock:
+            known = {
+                norm: (paper_id, ambiguous) for norm, paper_id, ambiguous in self._conn.execute(
+                    f"SELECT norm, paper_id, ambiguous FROM titles WHERE norm IN ({','.join('?' * len(rows))})",
+                    list(rows))
+            }
+            fresh = {}
+            for norm, (paper_id, title, ambiguous) in rows.items():
+                if norm in known:
+                    known_id, known_ambiguous = known[norm]
+                    if known_ambiguous or (known_id == paper_id and not ambiguous):
+                        continue
+                    ambiguous = 1
+                fresh[norm] = (paper_id, title, ambiguous)
+            if not fresh:
+                return 0
+            try:
+                self._conn.execute('BEGIN')
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO titles (norm, paper_id, title, updated_at, ambiguous) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [(norm, paper_id, title, now, ambiguous) for norm, (paper_id, title, ambiguous) in fresh.items()])
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO title_sketch (key, norm) VALUES (?, ?)',
+                    [(key, norm) for norm in fresh if norm not in known for key in _sketch(trigrams(norm))])
+                self._conn.execute('COMMIT')
+            except sqlite3.Error as e:
+                self._conn.execute('ROLLBACK')
+                logger.warning(f"标题索引写入失败: {e}")
+                return 0
+        return len(fresh)
+
+    def queue(self, papers: Iterable[Optional[Dict]]) -> int:
+        """登记待写入的论文（只保留 paperId 与 title），由 flush 批量写入；不访问数据库，返回登记条数"""
+        entries = [{'paperId': paper['paperId'], 'title': paper['title']} for paper in papers
+                   if paper and paper.get('paperId') and paper.get('title')]
+        if entries:
+            with self._pending_lock:
+                self._pending.extend(entries)
+        return len(entries)
+
+    @property
+    def pending(self) -> int:
+        """已登记、尚未写入的论文数"""
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """写入所有已登记的论文，返回写入条数"""
+        with self._pending_lock:
+            entries, self._pending = self._pending, []
+        return sum(self.add_many(entries[i:i + FLUSH_BATCH]) for i in range(0, len(entries), FLUSH_BATCH))
+
+    def add(self, title: str, paper_id: str) -> bool:
+        return self.add_many([{'title': title, 'paperId': paper_id}]) > 0
+
+    def lookup(self, title: str, threshold: float = None) -> Optional[Tuple[str, str, float]]:
+        """
+        解析标题，返回 (paperId, 索引中的原标题, 相似度)；没有足够相似的标题时返回 None
+        规范化后完全相同的标题相似度为 1.0；有歧义的标题不参与匹配，由调用方检索上游
+        """
+        threshold = self.threshold if threshold is None else threshold
+        norm = normalize_title(title)
+        if not norm:
+            return None
+        with self._lock:
+            row = self._conn.execute('SELECT paper_id, title, ambiguous FROM titles WHERE norm = ?',
+                                     (norm,)).fetchone()
+            if row is not None:
+                return None if row[2] else (row[0], row[1], 1.0)
+            if len(norm) < MIN_TITLE_LENGTH:
+                return None
+            grams = trigrams(norm)
+            keys = _sketch(grams)
+            candidates = self._conn.execute(
+                f'''SELECT t.norm, t.paper_id, t.title FROM titles t JOIN (
+                        SELECT norm, COUNT(*) AS hits FROM title_sketch
+                        WHERE key IN ({','.join('?' * len(keys))})
+                        GROUP BY norm ORDER BY hits DESC LIMIT {MAX_CANDIDATES}
+                    ) c ON c.norm = t.norm WHERE NOT t.ambiguous''', keys).fetchall()
+        best = None
+        for candidate_norm, paper_id, candidate_title in candidates:
+            candidate_grams = trigrams(candidate_norm)
+            score = len(grams & candidate_grams) / len(grams | candidate_grams)
+            if score >= threshold and (best is None or score > best[2]):
+                best = (paper_id, candidate_title, score)
+        return best
+
+    def resolve(self, title: str, threshold: float = None) -> Optional[str]:
+        """标题 -> paperId，未命中时返回 None"""
+        match = self.lookup(title, threshold)
+        return match[0] if match else None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM titles').fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM titles')
+            self._conn.execute('DELETE FROM title_sketch')
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -1,46 +1,209 @@
+import hashlib
 import re
-import pdb
+import threading
+from collections import OrderedDict
+
+# Markdown / LaTeX 后处理用的预编译正则
+# 一个交替模式一次扫描覆盖 \(..\)、\[..\] 以及 equation/align/gather/multline 环境
+_LATEX_MATH = re.compile(
+    r'\\\((?P<inline>[^\n]*?)\\\)'
+    r'|\\\[(?P<display>[^\n]*?)\\\]'
+    r'|\\begin\{(?P<env>equation|align|gather|multline)\}(?P<body>.*?)\\end\{(?P=env)\}',
+    re.DOTALL,
+)
+_LATEX_ENV_BEGIN = re.compile(r'\\begin\{(equation|align|gather|multline)\}')
+_TABLE_LINE = re.compile(r'^\s*table\s*\d+', re.IGNORECASE)
+_INLINE_MATH = re.compile(r'\$[^$]+\$')
+_MULTI_SPACE = re.compile(r' +')
+# 公式后是这些标点时不加空格
+_MATH_PUNCTUATION = frozenset(',.;:!?，。；：！？)）]】}」》')
+# 公式前后是这些左括号时不加空格
+_MATH_OPENERS = frozenset('({\\[（【{「《')
+
+
+def _replace_math(match):
+    kind = match.lastgroup
+    body = match.group(kind)
+    if '\\' in body:
+        # 公式内部嵌套的其他公式标记
+        body = _LATEX_MATH.sub(_replace_math, body)
+    if kind == 'inline':
+        return '$' + body + '$'
+    return '$$' + body + '$$'
+
+
 def replace_latex_math(latex_text:str):
-    """
+    r"""
     更健壮的替换函数，处理可能的嵌套和复杂情况
+    \(..\) 转为 $..$，\[..\] 与 equation/align/gather/multline 环境转为 $$..$$，
+    所有公式形式由同一个预编译模式一次扫描完成
     """
-    # 创建副本以避免修改原始字符串
-    result = latex_text
-    # 处理行内公式：\( ... \) 转换为 $ ... $
-    result = re.sub(r'\\\((.*?)\\\)', r'$\1$', result)
-    # 处理行内公式：$ ... $ 保持不变（已经是 Markdown 格式）
-    # 这里主要是处理其他格式的 LaTeX 公式
-    # 处理行间公式：\[ ... \] 转换为 $$ ... $$
-    result = re.sub(r'\\\[(.*?)\\\]', r'$$\1$$', result)
-    # 处理行间公式：$$ ... $$ 保持不变
-    # 这里主要是处理其他格式的 LaTeX 公式
-    # 处理环境公式：\begin{equation} ... \end{equation}
-    result = re.sub(r'\\begin\{equation\}(.*?)\\end\{equation\}', r'$$\1$$', result, flags=re.DOTALL)
-    # 处理环境公式：\begin{align} ... \end{align}
-    result = re.sub(r'\\begin\{align\}(.*?)\\end\{align\}', r'$$\1$$', result, flags=re.DOTALL)
-    # 处理环境公式：\begin{gather} ... \end{gather}
-    result = re.sub(r'\\begin\{gather\}(.*?)\\end\{gather\}', r'$$\1$$', result, flags=re.DOTALL)
-    # 处理环境公式：\begin{multline} ... \end{multline}
-    result = re.sub(r'\\begin\{multline\}(.*?)\\end\{multline\}', r'$$\1$$', result, flags=re.DOTALL)
-    result = result.replace("$ ","$")
-    result = result.replace(" $","$")
-    result = result.replace("\]","$$")
-    result = result.replace("\[","$$")
+    result = _LATEX_MATH.sub(_replace_math, latex_text) if '\\' in latex_text else latex_text
+    if '$' in result:
+        result = result.replace("$ ", "$").replace(" $", "$")
+    if '\\' in result:
+        result = result.replace("\\]", "$$").replace("\\[", "$$")
     return result
 
-def parse_bibtex(bibtex_str):
-    """解析BibTeX字符串，提取元数据"""
-    # 提取字段
-    fields = {}
 
-    # 匹配字段的正则表达式
-    field_pattern = r'(\w+)\s*=\s*{([^}]*)}'
+# BibTeX 解析用的预编译正则
+BIBTEX_ENTRY_HEAD = re.compile(r'@\s*(\w+)\s*([{(])')
+_BIB_BRACE = re.compile(r'[{}]')
+_BIB_QUOTE_OR_BRACE = re.compile(r'[{}"]')
+_BIB_NAME = re.compile(r'[^\s"#%\'(),={}]+')
+_BIB_SPACE = re.compile(r'\s+')
+_BIB_BRACES = str.maketrans('', '', '{}')
+
+# BibTeX 内置的月份宏
+BIBTEX_MACROS = {
+    'jan': 'January', 'feb': 'February', 'mar': 'March', 'apr': 'April',
+    'may': 'May', 'jun': 'June', 'jul': 'July', 'aug': 'August',
+    'sep': 'September', 'oct': 'October', 'nov': 'November', 'dec': 'December',
+}
+
+
+class BibtexSyntaxError(ValueError):
+    """BibTeX 条目格式错误"""
+
+
+def _skip_space(text, pos):
+    match = _BIB_SPACE.match(text, pos)
+    return match.end() if match else pos
+
 
-    matches = re.findall(field_pattern, bibtex_str)
-    for field_name, field_value in matches:
-        fields[field_name.lower()] = field_value.strip()
+def _read_braced(text, pos):
+    """读取从 pos 处 '{' 开始的平衡花括号内容，返回 (内容, 结束位置)"""
+    depth = 0
+    for match in _BIB_BRACE.finditer(text, pos):
+        if match.group() == '{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return text[pos + 1:match.start()], match.end()
+    raise BibtexSyntaxError(f"花括号未闭合（位置 {pos}）")
+
+
+def _read_quoted(text, pos):
+    """读取从 pos 处 '"' 开始的字符串，花括号内的引号不作为结束符"""
+    depth = 0
+    for match in _BIB_QUOTE_OR_BRACE.finditer(text, pos + 1):
+        char = match.group()
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+        elif depth == 0 and text[match.start() - 1] != '\\':
+            return text[pos + 1:match.start()], match.end()
+    raise BibtexSyntaxError(f"引号未闭合（位置 {pos}）")
+
+
+def _read_value(text, pos, macros):
+    """读取字段值：支持 {..}、".."、数字/宏，以及用 # 连接的多个部分"""
+    parts = []
+    while True:
+        pos = _skip_space(text, pos)
+        if pos >= len(text):
+            raise BibtexSyntaxError("字段值不完整")
+        char = text[pos]
+        if char == '{':
+            part, pos = _read_braced(text, pos)
+        elif char == '"':
+            part, pos = _read_quoted(text, pos)
+        else:
+            match = _BIB_NAME.match(text, pos)
+            if not match:
+                raise BibtexSyntaxError(f"无法识别的字段值（位置 {pos}）")
+            token = match.group(0)
+            part = macros.get(token.lower(), token)
+            pos = match.end()
+        parts.append(part)
+        pos = _skip_space(text, pos)
+        if pos < len(text) and text[pos] == '#':
+            pos += 1
+            continue
+        return ''.join(parts), pos
+
+
+def _parse_fields(text, pos, end_char, macros):
+    """从 pos 开始解析 name = value 列表，直到遇到 end_char 或文本结束"""
+    fields = {}
+    length = len(text)
+    while True:
+        pos = _skip_space(text, pos)
+        while pos < length and text[pos] == ',':
+            pos = _skip_space(text, pos + 1)
+        if pos >= length or text[pos] == end_char:
+            return fields, min(pos + 1, length)
+        match = _BIB_NAME.match(text, pos)
+        if not match:
+            raise BibtexSyntaxError(f"无法识别的字段名（位置 {pos}）")
+        name = match.group(0).lower()
+        pos = _skip_space(text, match.end())
+        if pos >= length or text[pos] != '=':
+            raise BibtexSyntaxError(f"字段 {name} 缺少 '='")
+        value, pos = _read_value(text, pos + 1, macros)
+        # 去掉保护大小写的花括号并合并空白
+        fields[name] = _BIB_SPACE.sub(' ', value.translate(_BIB_BRACES)).strip()
+
+
+def parse_bibtex_entry(bibtex_str, macros=None):
+    """
+    单遍解析一条 BibTeX 条目
+    
+    Returns:
+        tuple: (文献类型(小写), 引用键, 字段字典)
+    """
+    macros = {**BIBTEX_MACROS, **(macros or {})}
+    head = BIBTEX_ENTRY_HEAD.search(bibtex_str)
+    if not head:
+        raise BibtexSyntaxError("缺少 @type{key, 条目头")
+    entry_type = head.group(1).lower()
+    end_char = '}' if head.group(2) == '{' else ')'
+    pos = _skip_space(bibtex_str, head.end())
+    key_end = pos
+    while key_end < len(bibtex_str) and bibtex_str[key_end] not in ',' + end_char:
+        key_end += 1
+    key = bibtex_str[pos:key_end].strip()
+    if entry_type == 'string':
+        # @string{name = value}，引用键位置实际是宏定义
+        fields, _ = _parse_fields(bibtex_str, pos, end_char, macros)
+        return entry_type, '', fields
+    fields, _ = _parse_fields(bibtex_str, key_end, end_char, macros)
+    return entry_type, key, fields
 
-    return fields
+
+def parse_bibtex(bibtex_str):
+    """解析BibTeX字符串，提取元数据"""
+    try:
+        return parse_bibtex_entry(bibtex_str)[2]
+    except BibtexSyntaxError:
+        if BIBTEX_ENTRY_HEAD.search(bibtex_str):
+            raise
+    # 兼容只有字段列表、没有 @type{key, 头的输入
+    return _parse_fields(bibtex_str, 0, '}', BIBTEX_MACROS)[0]
+
+def _format_author(author):
+    """格式化单个作者：姓 + 名的首字母（不加点）"""
+    # 处理 "姓, 名" 格式或 "名 姓" 格式
+    if ',' in author:
+        # 格式：Last, First
+        parts = author.split(',')
+        last_name = parts[0].strip()
+        first_name = parts[1].strip()
+        # 处理中间名
+        first_parts = first_name.split()
+        if len(first_parts) > 1:
+            # 将中间名缩写，但不加点
+            return f"{last_name} {' '.join(name[0] for name in first_parts)}"
+        # 只有一个名字，取首字母但不加点
+        return f"{last_name} {first_name[0]}" if first_name else last_name
+    # 格式：First Last
+    parts = author.split()
+    if len(parts) >= 2:
+        # 将名字缩写，但不加点
+        return f"{parts[-1]} {' '.join(name[0] for name in parts[:-1])}"
+    return author
 
 def format_authors_bibtex(authors_str):
     """格式化作者姓名（从BibTeX格式转换）"""
@@ -52,82 +215,8 @@ def format_authors_bibtex(authors_str):
 
     # 如果作者数量超过3个，只显示前3个，然后加 "et al."
     if len(authors) > 3:
-        formatted_authors = []
-        for i, author in enumerate(authors[:3]):
-            # 处理 "姓, 名" 格式或 "名 姓" 格式
-            if ',' in author:
-                # 格式：Last, First
-                parts = author.split(',')
-                if len(parts) >= 2:
-                    last_name = parts[0].strip()
-                    first_name = parts[1].strip()
-                    # 处理中间名
-                    first_parts = first_name.split()
-                    if len(first_parts) > 1:
-                        # 将中间名缩写，但不加点
-                        abbreviated_first = ' '.join([name[0] for name in first_parts])
-                        formatted_author = f"{last_name} {abbreviated_first}"
-                    else:
-                        # 只有一个名字，取首字母但不加点
-                        formatted_author = f"{last_name} {first_name[0]}" if first_name else last_name
-                else:
-                    formatted_author = author
-            else:
-                # 格式：First Last
-                parts = author.split()
-                if len(parts) >= 2:
-                    last_name = parts[-1]
-                    first_names = parts[:-1]
-                    # 将名字缩写，但不加点
-                    abbreviated_first = ' '.join([name[0] for name in first_names])
-                    formatted_author = f"{last_name} {abbreviated_first}"
-                else:
-                    formatted_author = author
-
-            formatted_authors.append(formatted_author)
-
-        # 用逗号连接前3个作者，然后加 "et al."
-        return ", ".join(formatted_authors) + ", et al."
-    else:
-        formatted_authors = []
-        for author in authors:
-            # 处理 "姓, 名" 格式或 "名 姓" 格式
-            if ',' in author:
-                # 格式：Last, First
-                parts = author.split(',')
-                if len(parts) >= 2:
-                    last_name = parts[0].strip()
-                    first_name = parts[1].strip()
-                    # 处理中间名
-                    first_parts = first_name.split()
-                    if len(first_parts) > 1:
-                        # 将中间名缩写，但不加点
-                        abbreviated_first = ' '.join([name[0] for name in first_parts])
-                        formatted_author = f"{last_name} {abbreviated_first}"
-                    else:
-                        # 只有一个名字，取首字母但不加点
-                        formatted_author = f"{last_name} {first_name[0]}" if first_name else last_name
-                else:
-                    formatted_author = author
-            else:
-                # 格式：First Last
-                parts = author.split()
-                if len(parts) >= 2:
-                    last_name = parts[-1]
-                    first_names = parts[:-1]
-                    # 将名字缩写，但不加点
-                    abbreviated_first = ' '.join([name[0] for name in first_names])
-                    formatted_author = f"{last_name} {abbreviated_first}"
-                else:
-                    formatted_author = author
-
-            formatted_authors.append(formatted_author)
-
-        # 用逗号连接作者
-        if len(formatted_authors) == 1:
-            return formatted_authors[0]
-        else:
-            return ", ".join(formatted_authors[:-1]) + ", " + formatted_authors[-1]
+        return ", ".join(_format_author(author) for author in authors[:3]) + ", et al."
+    return ", ".join(_format_author(author) for author in authors)
 
 def format_title(title, entry_type):
     """格式化标题，并根据文献类型添加标识符"""
@@ -156,6 +245,55 @@ def format_title(title, entry_type):
 
     return title.strip('.') + identifier + '.'
 
+class _MarkdownLineRules:
+    """
+    逐行应用 markdown_postprocess 的规则，跨行状态（上一行是否为空行、是否刚输出 table 行）保存在实例中，
+    因此既可以处理整篇文档，也可以处理流式输入
+    """
+
+    def __init__(self):
+        self.started = False
+        self.prev_empty = False
+        self.after_table = False
+
+    def _emit(self, line, out):
+        # 连续多个空行只保留一个
+        if line == '':
+            if self.prev_empty:
+                return
+            self.prev_empty = True
+        else:
+            self.prev_empty = False
+        self.started = True
+        out.append(line)
+
+    def push(self, line, out):
+        """处理一行原始输入，把输出行追加到 out"""
+        if self.after_table:
+            # 确保table行后面有空行（除非是文档结尾）
+            self.after_table = False
+            if line.strip() != '':
+                self._emit('', out)
+
+        current_line = line.rstrip()
+
+        # 处理##开头的标题行，确保标题行前面有空行（除非是文档开头）
+        if current_line.startswith('##'):
+            if self.started and not self.prev_empty:
+                self._emit('', out)
+            self._emit(current_line, out)
+            return
+
+        # 处理table数字开头的行（兼容大小写和前后空格）
+        if _TABLE_LINE.match(current_line):
+            self._emit(current_line, out)
+            self.after_table = True
+            return
+
+        # 处理数学公式的空格格式
+        self._emit(format_math_formulas(current_line), out)
+
+
 def markdown_postprocess(content):
     """
     高级Markdown后处理函数：
@@ -169,46 +307,81 @@ def markdown_postprocess(content):
     Returns:
         str: 处理后的Markdown内容
     """
-    lines = content.split('\n')
-    processed_lines = []
+    rules = _MarkdownLineRules()
+    out = []
+    for line in content.split('\n'):
+        rules.push(line, out)
+    return '\n'.join(out)
+
+
+def process_markdown(content):
+    """
+    依次执行 replace_latex_math 与 markdown_postprocess：先用一次正则扫描替换公式（环境可以跨行），
+    再逐行扫描一遍应用 Markdown 规则；结果与分别调用两者相同
     
-    for i, line in enumerate(lines):
-        current_line = line.rstrip()
-        
-        # 处理##开头的标题行
-        if current_line.startswith('##'):
-            # 确保标题行前面有空行（除非是文档开头）
-            if processed_lines and processed_lines[-1] != '':
-                processed_lines.append('')
-            processed_lines.append(current_line)
-            continue
-        
-        # 处理table数字开头的行（使用正则匹配，兼容大小写和前后空格）
-        table_pattern = r'^\s*table\s*\d+'
-        if re.match(table_pattern, current_line, re.IGNORECASE):
-            processed_lines.append(current_line)
-            # 确保table行后面有空行（除非是文档结尾）
-            if i < len(lines) - 1 and lines[i+1].strip() != '':
-                processed_lines.append('')
-            continue
+    Args:
+        content (str): 含 LaTeX 公式的 Markdown 内容
         
-        # 处理数学公式的空格格式
-        processed_line = format_math_formulas(current_line)
-        processed_lines.append(processed_line)
-    
-    # 清理多余的空行（连续多个空行保留一个）
-    cleaned_lines = []
-    prev_empty = False
-    for line in processed_lines:
-        if line == '':
-            if not prev_empty:
-                cleaned_lines.append(line)
-                prev_empty = True
+    Returns:
+        str: 处理后的Markdown内容
+    """
+    return markdown_postprocess(replace_latex_math(content))
+
+
+def _safe_cut(buffer):
+    """
+    返回缓冲区中可以安全处理的前缀长度：到最后一个换行为止，
+    且不能切断尚未闭合的公式环境
+    """
+    cut = buffer.rfind('\n') + 1
+    while cut:
+        for match in _LATEX_ENV_BEGIN.finditer(buffer, 0, cut):
+            end = buffer.find('\\end{%s}' % match.group(1), match.end())
+            if end < 0 or end >= cut:
+                # 环境在切分点之后才闭合，退回到该环境所在行之前，再检查新的切分点
+                cut = buffer.rfind('\n', 0, match.start()) + 1
+                break
         else:
-            cleaned_lines.append(line)
-            prev_empty = False
+            return cut
+    return cut
+
+
+def process_markdown_stream(chunks):
+    """
+    process_markdown 的流式版本：输入任意切分的文本块，逐步产出处理后的文本，
+    拼接结果与 process_markdown 对整篇文档的处理结果一致，且不需要在内存中保留整篇文档
     
-    return '\n'.join(cleaned_lines)
+    Args:
+        chunks (Iterable[str]): 文本块
+        
+    Yields:
+        str: 处理后的文本片段
+    """
+    rules = _MarkdownLineRules()
+    buffer = ''
+    first = True
+    out = []
+    for chunk in chunks:
+        buffer += chunk
+        cut = _safe_cut(buffer)
+        if cut == 0:
+            continue
+        # 切分点是换行符之后，最后一个元素为空串，不属于本批
+        lines = replace_latex_math(buffer[:cut]).split('\n')[:-1]
+        buffer = buffer[cut:]
+        for line in lines:
+            rules.push(line, out)
+        if out:
+            text = '\n'.join(out)
+            yield text if first else '\n' + text
+            first = False
+            out.clear()
+    for line in replace_latex_math(buffer).split('\n'):
+        rules.push(line, out)
+    if out:
+        text = '\n'.join(out)
+        yield text if first else '\n' + text
+
 
 def format_math_formulas(line):
     """
@@ -220,11 +393,12 @@ def format_math_formulas(line):
     Returns:
         str: 格式化后的行
     """
-    # 匹配行内数学公式：$...$ 和 \(...\)
-    # 使用非贪婪匹配，避免跨公式匹配
-    math_pattern = r'(\$[^$]+\$)' 
+    if '$' not in line:
+        # 没有公式时只需合并多余空格
+        return _MULTI_SPACE.sub(' ', line) if '  ' in line else line
+
     def replace_math(match):
-        math_expr = match.group(1)
+        math_expr = match.group()
         start_pos = match.start()
         end_pos = match.end()
         
@@ -233,33 +407,23 @@ def format_math_formulas(line):
             return math_expr
         
         # 获取公式前后的字符
-        prev_char = line[start_pos - 1] if start_pos > 0 else ''
+        prev_char = line[start_pos - 1]
         next_char = line[end_pos] if end_pos < len(line) else ''
         
-        # 标点符号集合（公式后是这些符号时不加空格）
-        punctuation = ',.;:!?，。；：！？)）]】}」》'
-        
         # 处理公式前面的空格
-        if prev_char != ' ' and prev_char != '' and prev_char not in '({\[（【{「《':
-            math_with_space = ' ' + math_expr
-        else:
-            math_with_space = math_expr
+        if prev_char != ' ' and prev_char not in _MATH_OPENERS:
+            math_expr = ' ' + math_expr
         
         # 处理公式后面的空格
-        if (next_char != ' ' and next_char != '' and 
-            next_char not in punctuation and
-            next_char not in '({\[（【{「《'):
-            math_with_space = math_with_space + ' '
+        if (next_char != ' ' and next_char != '' and
+                next_char not in _MATH_PUNCTUATION and
+                next_char not in _MATH_OPENERS):
+            math_expr = math_expr + ' '
         
-        return math_with_space
-    
-    # 使用正则替换处理所有数学公式
-    formatted_line = re.sub(math_pattern, replace_math, line)
-    
-    # 清理可能出现的多余空格（连续多个空格变为一个）
-    formatted_line = re.sub(r' +', ' ', formatted_line)
+        return math_expr
     
-    return formatted_line
+    # 使用正则替换处理所有数学公式，再清理可能出现的多余空格（连续多个空格变为一个）
+    return _MULTI_SPACE.sub(' ', _INLINE_MATH.sub(replace_math, line))
 
 def format_journal_info(journal, volume, issue, pages, year, doi=None):
     """格式化期刊信息"""
@@ -290,44 +454,84 @@ def format_journal_info(journal, volume, issue, pages, year, doi=None):
 
     return result
 
-def bibtex_to_gbt7714(bibtex_str):
-    """将BibTeX转换为GB/T 7714格式"""
-    try:
-        fields = parse_bibtex(bibtex_str)
+# format_title 能识别的文献类型；article 以及其他类型仍按字段推断
+_SPECIFIC_ENTRY_TYPES = {'inproceedings', 'conference', 'book', 'phdthesis', 'mastersthesis', 'techreport', 'patent'}
+
+# bibtex_to_gbt7714 的结果缓存：条目哈希 -> 转换结果
+_GBT7714_CACHE = OrderedDict()
+_GBT7714_CACHE_SIZE = 4096
+_GBT7714_CACHE_LOCK = threading.Lock()
 
-        # 提取必要字段
-        authors = format_authors_bibtex(fields.get('author', ''))
 
-        # 确定文献类型
-        entry_type = 'article'  # 默认为期刊文章
-        if 'booktitle' in fields and 'journal' not in fields:
-            entry_type = 'inproceedings'  # 会议论文
+def _guess_entry_type(entry_type, fields):
+    """确定文献类型：条目头给出明确类型时直接使用，否则根据字段推断"""
+    if entry_type in _SPECIFIC_ENTRY_TYPES:
+        return entry_type
+    # Semantic Scholar 的会议论文常标为 @Article，只有 booktitle 时视为会议论文
+    if 'booktitle' in fields and 'journal' not in fields:
+        return 'inproceedings'
+    return 'article'
 
-        title = format_title(fields.get('title', ''), entry_type)
-        journal = fields.get('journal', '') or fields.get('booktitle', '')
-        volume = fields.get('volume', '')
-        issue = fields.get('number', '') or fields.get('issue', '')
-        pages = fields.get('pages', '')
-        year = fields.get('year', '')
-        doi = fields.get('doi', '')
 
-        # 构建GB/T 7714格式
-        gbt7714_parts = []
+def convert_bibtex_entry(bibtex_str, macros=None):
+    """将一条 BibTeX 转换为 GB/T 7714 格式，格式错误时抛出 BibtexSyntaxError"""
+    entry_type, _, fields = parse_bibtex_entry(bibtex_str, macros)
+    return format_gbt7714(_guess_entry_type(entry_type, fields), fields)
 
-        if authors:
-            gbt7714_parts.append(authors)
 
-        if title:
-            gbt7714_parts.append(title)
+def format_gbt7714(entry_type, fields):
+    """根据文献类型和字段字典生成 GB/T 7714 引用字符串"""
+    # 提取必要字段
+    authors = format_authors_bibtex(fields.get('author', ''))
 
-        journal_info = format_journal_info(journal, volume, issue, pages, year, doi)
-        if journal_info:
-            gbt7714_parts.append(journal_info)
+    title = format_title(fields.get('title', ''), entry_type)
+    journal = fields.get('journal', '') or fields.get('booktitle', '')
+    volume = fields.get('volume', '')
+    issue = fields.get('number', '') or fields.get('issue', '')
+    pages = fields.get('pages', '')
+    year = fields.get('year', '')
+    doi = fields.get('doi', '')
 
-        return " ".join(gbt7714_parts)
+    # 构建GB/T 7714格式
+    gbt7714_parts = []
 
+    if authors:
+        gbt7714_parts.append(authors)
+
+    if title:
+        gbt7714_parts.append(title)
+
+    journal_info = format_journal_info(journal, volume, issue, pages, year, doi)
+    if journal_info:
+        gbt7714_parts.append(journal_info)
+
+    return " ".join(gbt7714_parts)
+
+
+def bibtex_to_gbt7714(bibtex_str):
+    """将BibTeX转换为GB/T 7714格式（按条目哈希缓存结果）"""
+    digest = hashlib.blake2b(bibtex_str.encode('utf-8'), digest_size=16).digest()
+    with _GBT7714_CACHE_LOCK:
+        cached = _GBT7714_CACHE.get(digest)
+        if cached is not None:
+            _GBT7714_CACHE.move_to_end(digest)
+            return cached
+
+    try:
+        head = BIBTEX_ENTRY_HEAD.search(bibtex_str)
+        if head:
+            entry_type, _, fields = parse_bibtex_entry(bibtex_str)
+        else:
+            entry_type, fields = '', parse_bibtex(bibtex_str)
+        result = format_gbt7714(_guess_entry_type(entry_type, fields), fields)
     except Exception as e:
-        return f"转换错误: {str(e)}"
+        result = f"转换错误: {str(e)}"
+
+    with _GBT7714_CACHE_LOCK:
+        _GBT7714_CACHE[digest] = result
+        if len(_GBT7714_CACHE) > _GBT7714_CACHE_SIZE:
+            _GBT7714_CACHE.popitem(last=False)
+    return result
 
 if __name__=="__main__":
      print(bibtex_to_gbt7714( '@Article{Chen2021AnatomyAware3H,\n author = {Tianlang Chen and Chengjie Fang and Xiaohui Shen and Yiheng Zhu and Zhili Chen and Jiebo Luo},\n booktitle = {IEEE transactions on circuits and systems for video technology (Print)},\n journal = {IEEE Transactions on Circuits and Systems for Video Technology},\n pages = {198-209},\n title = {Anatomy-Aware 3D Human Pose Estimation With Bone-Based Pose Decomposition},\n volume = {32},\n year = {2021}\n}\n'))
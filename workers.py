@@ -0,0 +1,99 @@
+"""
+多 worker 部署：N 个进程共同提供 MCP 服务，共享响应缓存（SQLite WAL）与上游限流配额（SQLite 令牌桶）
+
+- sse：SSE 会话绑定在建立它的进程上，第 i 个 worker 监听 port + i，
+  由前端负载均衡按客户端粘滞分配（或直接把不同客户端配置到不同端口）
+- http：无状态的 Streamable HTTP，所有 worker 共享同一端口（uvicorn 多进程），任意 worker 都能处理任意请求
+
+各 worker 对同一数据的回源通过缓存中的租约合并，速率限制按上游地址共享，N 个进程合计不会超出配额。
+
+用法:
+    python workers.py --workers 4 --transport sse --port 8000
+    python workers.py --workers 4 --transport http --port 8000
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from typing import Dict, List
+
+from loguru import logger
+
+# worker 异常退出后重启前的等待时间（秒）
+RESTART_DELAY = 1.0
+
+
+def http_app():
+    """uvicorn 多进程模式下每个 worker 调用的应用工厂"""
+    from shcolar_server import mcp
+    return mcp.http_app(transport='http', stateless_http=True)
+
+
+def serve_sse(host: str, port: int):
+    from shcolar_server import mcp
+    mcp.run(transport='sse', host=host, port=port, show_banner=False)
+
+
+def run_sse_workers(host: str, port: int, workers: int):
+    """启动 workers 个 SSE 进程（端口 port..port+workers-1），异常退出的 worker 会被重启"""
+    context = multiprocessing.get_context('spawn')
+    processes: Dict[int, multiprocessing.Process] = {}
+    stopping = False
+
+    def start(index: int):
+        process = context.Process(target=serve_sse, args=(host, port + index), name=f'scholar-sse-{index}')
+        process.start()
+        processes[index] = process
+        logger.info(f"worker {index} (pid {process.pid}) SSE 地址: http://{host}:{port + index}/sse")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for index in range(workers):
+        start(index)
+    try:
+        while not stopping:
+            time.sleep(0.5)
+            for index, process in list(processes.items()):
+                if not process.is_alive() and not stopping:
+                    logger.warning(f"worker {index} 退出 (exit code {process.exitcode})，{RESTART_DELAY} 秒后重启")
+                    time.sleep(RESTART_DELAY)
+                    start(index)
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join(timeout=10)
+
+
+def run_http_workers(host: str, port: int, workers: int):
+    import uvicorn
+
+    logger.info(f"{workers} 个 worker 共享 Streamable HTTP 地址: http://{host}:{port}/mcp")
+    uvicorn.run('workers:http_app', factory=True, host=host, port=port, workers=workers, log_level='warning')
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="多进程运行 Scholar MCP 服务")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker 进程数（默认 CPU 核数）")
+    parser.add_argument('--transport', choices=('sse', 'http'), default='sse', help="传输方式")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000, help="监听端口（sse 模式下为第一个 worker 的端口）")
+    args = parser.parse_args(argv)
+
+    # 在启动 worker 之前设置，worker 进程据此使用共享的限流器与回源租约
+    os.environ['SCHOLAR_WORKERS'] = str(max(1, args.workers))
+    if args.transport == 'http':
+        run_http_workers(args.host, args.port, args.workers)
+    else:
+        run_sse_workers(args.host, args.port, args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())